@@ -1,4 +1,6 @@
 import os
+import tempfile
+from pathlib import Path
 from dotenv import load_dotenv
 from typing import List
 
@@ -19,3 +21,104 @@ REDIS_DSN = os.getenv("REDIS_DSN", "redis://localhost:6379/0")
 
 SECRET_ADMIN_AUTH = os.getenv("SECRET_ADMIN_AUTH", "Администратор 1999")
 SECRET_SUBSCRIBER_AUTH = os.getenv("SECRET_SUBSCRIBER_AUTH", "Подписаться")
+
+
+# Размер LRU-кэша загруженных 3D-моделей матрешек (по числу разных файлов)
+MATRYOSHKA_MODEL_CACHE_SIZE = int(os.getenv("MATRYOSHKA_MODEL_CACHE_SIZE", "4"))
+
+# Пул off-screen плоттеров: сколько держать «тёплыми» и через сколько рендеров пересоздавать
+MATRYOSHKA_PLOTTER_POOL_SIZE = int(os.getenv("MATRYOSHKA_PLOTTER_POOL_SIZE", "2"))
+MATRYOSHKA_PLOTTER_MAX_USES = int(os.getenv("MATRYOSHKA_PLOTTER_MAX_USES", "100"))
+
+# Таблица заранее отрендеренных уровней заливки матрешек
+MATRYOSHKA_SPRITE_DIR = os.getenv(
+    "MATRYOSHKA_SPRITE_DIR", os.path.join(tempfile.gettempdir(), "storekeeper_sprites")
+)
+MATRYOSHKA_PRECOMPUTE_SPRITES = os.getenv(
+    "MATRYOSHKA_PRECOMPUTE_SPRITES", "false"
+).lower() in ("1", "true", "yes")
+
+# Число процессов для параллельного рендера матрешек (1 — рендер в процессе бота)
+MATRYOSHKA_RENDER_WORKERS = int(os.getenv("MATRYOSHKA_RENDER_WORKERS", "1"))
+
+# Сколько отчетов может строиться одновременно (остальные ждут в очереди)
+REPORT_JOB_CONCURRENCY = int(os.getenv("REPORT_JOB_CONCURRENCY", "2"))
+
+# Способ рендера матрешек: depth — быстрая заливка по буферу глубины,
+# mesh — отсечение 3D-модели, template — 2D-шаблон без GL (pyvista не нужен)
+MATRYOSHKA_RENDERER = os.getenv("MATRYOSHKA_RENDERER", "depth")
+
+# Каталог ресурсов (шрифты, шаблоны, 3D-модели) — не зависит от рабочего каталога процесса
+RESOURCES_DIR = Path(__file__).resolve().parent.parent.parent / "resources"
+
+# Шрифт подписей на изображениях матрешек
+MATRYOSHKA_FONT_PATH = os.getenv("MATRYOSHKA_FONT_PATH", str(RESOURCES_DIR / "arialmt.ttf"))
+
+# 3D-модель матрешки; если файла нет, отчеты рисуются по 2D-шаблону
+MATRYOSHKA_MODEL_PATH = os.getenv(
+    "MATRYOSHKA_MODEL_PATH", str(RESOURCES_DIR / "bear3.glb")
+)
+
+# 2D-шаблон матрешки для рендера без pyvista/VTK (MATRYOSHKA_RENDERER=template)
+MATRYOSHKA_TEMPLATE_PATH = os.getenv(
+    "MATRYOSHKA_TEMPLATE_PATH", str(RESOURCES_DIR / "matryoshka_template.png")
+)
+
+# Кодирование изображений отчета: PNG, JPEG или WEBP; 0 — без ограничения размера
+REPORT_IMAGE_FORMAT = os.getenv("REPORT_IMAGE_FORMAT", "JPEG")
+REPORT_IMAGE_QUALITY = int(os.getenv("REPORT_IMAGE_QUALITY", "85"))
+REPORT_IMAGE_COMPRESS_LEVEL = int(os.getenv("REPORT_IMAGE_COMPRESS_LEVEL", "6"))
+REPORT_IMAGE_MAX_WIDTH = int(os.getenv("REPORT_IMAGE_MAX_WIDTH", "2560"))
+REPORT_IMAGE_MAX_HEIGHT = int(os.getenv("REPORT_IMAGE_MAX_HEIGHT", "2560"))
+
+# Раскладка матрешек в отчете: grid — сетка, vertical/horizontal — полосы
+MATRYOSHKA_LAYOUT = os.getenv("MATRYOSHKA_LAYOUT", "grid")
+# Сколько магазинов помещается на одно изображение отчета
+MATRYOSHKA_STORES_PER_IMAGE = int(os.getenv("MATRYOSHKA_STORES_PER_IMAGE", "8"))
+# Число столбцов сетки (0 — подбирается автоматически) и предельный размер холста
+MATRYOSHKA_GRID_COLUMNS = int(os.getenv("MATRYOSHKA_GRID_COLUMNS", "2"))
+MATRYOSHKA_GRID_MAX_WIDTH = int(os.getenv("MATRYOSHKA_GRID_MAX_WIDTH", "2560"))
+MATRYOSHKA_GRID_MAX_HEIGHT = int(os.getenv("MATRYOSHKA_GRID_MAX_HEIGHT", "2560"))
+
+# Рассылка отчета: сколько получателей обслуживается одновременно
+# и лимиты Telegram (сообщений в секунду на бота и на один чат)
+REPORT_SEND_CONCURRENCY = int(os.getenv("REPORT_SEND_CONCURRENCY", "8"))
+REPORT_SEND_RATE = float(os.getenv("REPORT_SEND_RATE", "30"))
+REPORT_SEND_CHAT_RATE = float(os.getenv("REPORT_SEND_CHAT_RATE", "1"))
+REPORT_SEND_CHAT_BURST = float(os.getenv("REPORT_SEND_CHAT_BURST", "3"))
+
+# Повторная доставка отчета: задержка base * 2^попытка (не больше max), число попыток
+REPORT_RETRY_BASE_DELAY = float(os.getenv("REPORT_RETRY_BASE_DELAY", "60"))
+REPORT_RETRY_MAX_DELAY = float(os.getenv("REPORT_RETRY_MAX_DELAY", "3600"))
+REPORT_RETRY_MAX_ATTEMPTS = int(os.getenv("REPORT_RETRY_MAX_ATTEMPTS", "5"))
+REPORT_RETRY_INTERVAL = float(os.getenv("REPORT_RETRY_INTERVAL", "30"))
+
+# Блокировка ежедневного отчета между репликами бота (секунды). Держатель
+# продлевает ее, пока строит и рассылает отчет; если он упал, блокировка
+# истекает через это время и отчет может отправить другая реплика
+REPORT_LOCK_TTL = int(os.getenv("REPORT_LOCK_TTL", "300"))
+
+# Сколько хранится отметка об отправленном за день отчете (секунды)
+REPORT_SENT_MARKER_TTL = int(os.getenv("REPORT_SENT_MARKER_TTL", str(2 * 24 * 3600)))
+
+# За сколько минут до рассылки отчет строится заранее (0 — строить в момент рассылки)
+REPORT_PREPARE_LEAD_MINUTES = int(os.getenv("REPORT_PREPARE_LEAD_MINUTES", "20"))
+
+# Сколько секунд рассылка ждет незавершенную подготовку, прежде чем строить отчет сама
+REPORT_PREPARE_WAIT = float(os.getenv("REPORT_PREPARE_WAIT", "600"))
+
+# Сколько строк выручки читается из БД за одну порцию при выгрузке отчета
+REPORT_STREAM_CHUNK_SIZE = int(os.getenv("REPORT_STREAM_CHUNK_SIZE", "5000"))
+
+# Сколько байт xlsx-выгрузки держать в памяти, прежде чем сбросить файл на диск
+REPORT_SPOOL_MAX_SIZE = int(os.getenv("REPORT_SPOOL_MAX_SIZE", str(8 * 1024 * 1024)))
+
+# Добавлять графики выручки в ежедневный отчет и /report
+REPORT_INCLUDE_CHARTS = os.getenv("REPORT_INCLUDE_CHARTS", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Графики отчета: "per_store" — по графику на магазин, "overview" — один сводный график
+REPORT_CHART_MODE = os.getenv("REPORT_CHART_MODE", "per_store")
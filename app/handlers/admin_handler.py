@@ -1,8 +1,14 @@
 from aiogram import Router, types
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
-from app.core.config import ADMIN_CHAT_IDS
+from app.core.config import (
+    ADMIN_CHAT_IDS,
+    MATRYOSHKA_LAYOUT,
+    MATRYOSHKA_MODEL_PATH,
+    MATRYOSHKA_STORES_PER_IMAGE,
+    REPORT_INCLUDE_CHARTS,
+)
 from app.utils.permissions import is_admin_chat
 from app.core.states import (
     AssignStates,
@@ -18,10 +24,17 @@ from app.services.store_service import StoreService
 from app.services.user_service import UserService
 from app.services.revenue_service import RevenueService
 from app.utils.menu import get_main_keyboard
-from app.utils.matryoshka import create_matryoshka_collection
+from app.utils.image_encoding import report_encoding
+from app.utils.matryoshka import choose_renderer, create_matryoshka_collection
+from app.utils.report_delivery import (
+    SpooledInputFile,
+    answer_report_photos,
+    build_chart_photos,
+    build_report_photos,
+)
+from app.utils.report_jobs import ReportProgress, report_job, run_report_stage
+from app.utils.report_period import REPORT_PERIOD_HELP, ReportPeriod
 import logging
-import os
-from pathlib import Path
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -30,7 +43,9 @@ logger = logging.getLogger(__name__)
 
 
 @router.message(Command("report"))
-async def cmd_report(message: types.Message, state: FSMContext):
+async def cmd_report(
+    message: types.Message, state: FSMContext, command: CommandObject = None
+):
     if not await is_admin_chat(message.chat.id):
         await message.answer(
             "У вас нет прав администратора для выполнения этой команды."
@@ -39,63 +54,141 @@ async def cmd_report(message: types.Message, state: FSMContext):
 
     await state.clear()
 
-    stores_per_image = 3
+    try:
+        period = ReportPeriod.parse(command.args if command else None)
+    except ValueError as e:
+        await message.answer(f"{e }\n\n{REPORT_PERIOD_HELP }")
+        return
+
+    stores_per_image = MATRYOSHKA_STORES_PER_IMAGE
 
     msg = await message.answer("Генерируется отчет, подождите...")
+    progress = ReportProgress(msg)
 
-    resources_dir = Path(__file__).parent.parent.parent / "resources"
-    resources_dir.mkdir(exist_ok=True)
-    template_path = str(resources_dir / "bear3.glb")
-    print(template_path)
+    template_path = MATRYOSHKA_MODEL_PATH
+    renderer = choose_renderer(template_path)
 
-    if not os.path.exists(template_path):
+    if renderer == "template":
         logger.warning(
-            f"Шаблон матрешки не найден по пути: {template_path }, создаем базовый шаблон"
+            f"3D-модель матрешки недоступна ({template_path }), используется 2D-шаблон"
         )
-        from PIL import Image, ImageDraw
 
-        img = Image.new("RGBA", (300, 500), (255, 255, 255, 0))
-        draw = ImageDraw.Draw(img)
+    async with report_job(progress):
+        await progress.update("Формируется Excel-отчет...")
 
-        draw.ellipse((50, 100, 250, 450), outline=(0, 0, 0), width=3)
-        img.save(template_path)
+        async with get_session() as session:
+            service = RevenueService(session)
+
+            shops_data = await service.get_matryoshka_data()
+
+            shops_data.sort(key=lambda x: x["fill_percent"], reverse=True)
+
+            charts = {}
+            if shops_data:
+                excel_file = await service.export_report_stream(period)
+                if REPORT_INCLUDE_CHARTS:
+                    await progress.update("Рисуются графики...")
+                    try:
+                        charts = await service.render_report_charts(period)
+                    except Exception:
+                        excel_file.close()
+                        raise
+
+        if not shops_data:
+            await progress.delete()
+            await message.answer("Нет данных для построения отчета.")
+            return
 
-    async with get_session() as session:
-        service = RevenueService(session)
+        await progress.update("Рисуются матрешки...")
+
+        try:
+            matryoshka_buffers = await run_report_stage(
+                create_matryoshka_collection,
+                template_path,
+                shops_data,
+                layout=MATRYOSHKA_LAYOUT,
+                max_per_image=stores_per_image,
+                renderer=renderer,
+            )
+        except Exception:
+            excel_file.close()
+            raise
+
+    await progress.update("Отправка отчета...")
+
+    with excel_file:
+        await message.answer_document(
+            SpooledInputFile(excel_file, filename="revenue_report.xlsx"),
+            caption=f"Подробный отчет по выручке магазинов ({period .title })",
+        )
+
+    photos = build_report_photos(
+        matryoshka_buffers, shops_data, stores_per_image, report_encoding.extension
+    ) + build_chart_photos(charts)
+    await answer_report_photos(message, photos)
 
-        excel_bytes, _ = await service.export_report()
+    await progress.delete()
 
-        shops_data = await service.get_matryoshka_data()
 
-        shops_data.sort(key=lambda x: x["fill_percent"], reverse=True)
+EXPORT_FORMATS = ("csv", "parquet")
 
-    if not shops_data:
-        await msg.delete()
-        await message.answer("Нет данных для построения отчета.")
+
+@router.message(Command("export"))
+async def cmd_export(
+    message: types.Message, state: FSMContext, command: CommandObject = None
+):
+    """Выгрузить строки выручки в CSV или Parquet для BI-инструментов"""
+    if not await is_admin_chat(message.chat.id):
+        await message.answer(
+            "У вас нет прав администратора для выполнения этой команды."
+        )
         return
 
-    matryoshka_buffers = create_matryoshka_collection(
-        template_path, shops_data, layout="vertical", max_per_image=stores_per_image
-    )
+    await state.clear()
 
-    await message.answer_document(
-        types.BufferedInputFile(excel_bytes, filename="revenue_report.xlsx"),
-        caption="Подробный отчет по выручке магазинов",
+    usage = (
+        "Использование: /export csv|parquet [период]\n"
+        "Период: 2024-05, 05.2024, 01.05.2024 15.05.2024 или all "
+        "(по умолчанию текущий месяц)"
     )
+    args = (command.args if command else None) or ""
+    export_format, _, period_text = args.strip().partition(" ")
+    export_format = export_format.lower()
 
-    for i, matryoshka_buf in enumerate(matryoshka_buffers, 1):
+    if export_format not in EXPORT_FORMATS:
+        await message.answer(usage)
+        return
 
-        stores_in_image = shops_data[(i - 1) * stores_per_image : i * stores_per_image]
-        stores_names = ", ".join([s["title"] for s in stores_in_image])
+    try:
+        period = ReportPeriod.parse(period_text)
+    except ValueError as e:
+        await message.answer(f"{e }\n\n{usage }")
+        return
+
+    msg = await message.answer("Формируется выгрузка, подождите...")
+    progress = ReportProgress(msg)
+
+    try:
+        async with report_job(progress):
+            async with get_session() as session:
+                service = RevenueService(session)
+                if export_format == "csv":
+                    export_file = await service.export_report_csv(period)
+                else:
+                    export_file = await service.export_report_parquet(period)
+    except RuntimeError as e:
+        logger.error(f"Ошибка выгрузки {export_format }: {e }")
+        await progress.delete()
+        await message.answer(f"Не удалось сформировать выгрузку: {e }")
+        return
 
-        await message.answer_photo(
-            types.BufferedInputFile(
-                matryoshka_buf.getvalue(), filename=f"report_matryoshka_{i }.png"
-            ),
-            caption=f"📊 Выполнение плана: {stores_names }",
+    with export_file:
+        await message.answer_document(
+            SpooledInputFile(export_file, filename=f"revenue.{export_format }"),
+            caption=f"Выручка магазинов по дням ({period .title })",
         )
 
-    await msg.delete()
+    await progress.delete()
 
 
 @router.message(Command("assign"))
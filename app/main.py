@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import logging
 import sys
 from pathlib import Path
@@ -9,15 +10,24 @@ from aiogram import types
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from app.core.config import BOT_TOKEN, REDIS_DSN
+from app.core.config import (
+    BOT_TOKEN,
+    REDIS_DSN,
+    MATRYOSHKA_MODEL_PATH,
+    MATRYOSHKA_PRECOMPUTE_SPRITES,
+)
 from app.core.database import engine, Base
 from app.handlers.auth_handler import router as auth_router
 from app.handlers.revenue_handler import router as revenue_router
 from app.handlers.admin_handler import router as admin_router
 from app.handlers.plan_handler import router as plan_router
 from app.utils.scheduler import schedule_daily_report
+from app.utils.delivery_queue import run_retry_worker
+from app.utils.matryoshka import choose_renderer, precompute_sprites
 from app.middleware import UpdateChatIdMiddleware
 
+logger = logging.getLogger(__name__)
+
 
 async def on_startup():
 
@@ -25,6 +35,30 @@ async def on_startup():
         await conn.run_sync(Base.metadata.create_all)
 
 
+async def precompute_matryoshka_sprites():
+    """Фоновый предрендер уровней заливки матрешки, чтобы отчеты не ждали 3D-рендера"""
+    renderer = choose_renderer(MATRYOSHKA_MODEL_PATH)
+    if renderer == "template":
+        logger.info(
+            f"3D-модель матрешки недоступна ({MATRYOSHKA_MODEL_PATH }), "
+            f"предрендер спрайтов не нужен"
+        )
+        return
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None,
+        functools.partial(precompute_sprites, MATRYOSHKA_MODEL_PATH, renderer=renderer),
+    )
+
+
+async def cancel_background_tasks(tasks: list) -> None:
+    """Останавливает фоновые задачи при завершении бота"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
 async def main():
 
     storage = RedisStorage.from_url(REDIS_DSN)
@@ -44,6 +78,8 @@ async def main():
 
     schedule_daily_report(bot)
 
+    background_tasks = [asyncio.create_task(run_retry_worker(bot))]
+
     async def global_error_handler(exception: Exception, update: object = None) -> bool:
 
         logging.getLogger("aiogram").error("Exception %s, update %s", exception, update)
@@ -51,8 +87,17 @@ async def main():
 
     dp.errors.register(global_error_handler)
 
-    await on_startup()
-    await dp.start_polling(bot)
+    try:
+        await on_startup()
+
+        if MATRYOSHKA_PRECOMPUTE_SPRITES:
+            background_tasks.append(
+                asyncio.create_task(precompute_matryoshka_sprites())
+            )
+
+        await dp.start_polling(bot)
+    finally:
+        await cancel_background_tasks(background_tasks)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,14 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 from datetime import date
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import func, delete
+from sqlalchemy import case, func, delete, and_
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import aliased
 from app.models.revenue import Revenue
+from app.models.store import Store
+from app.models.monthly_plan import MonthlyPlan
 
 
 class RevenueRepository:
@@ -84,3 +88,167 @@ class RevenueRepository:
         result = await self.session.execute(query)
         total = result.scalar()
         return total or 0.0
+
+    async def get_month_stats(
+        self, first_day: date, last_day: date, day: date
+    ) -> List[Row]:
+        """
+        Статистика всех магазинов за месяц одним запросом.
+
+        Сумма за месяц считается через GROUP BY, план берется из monthly_plans
+        (LEFT JOIN) с откатом к Store.plan, выручка за день — последняя запись
+        магазина за указанную дату.
+
+        Returns:
+            List[Row]: Строки (store_id, store_name, total, plan, day_amount)
+        """
+        month_totals = (
+            select(
+                Revenue.store_id.label("store_id"),
+                func.sum(Revenue.amount).label("total"),
+            )
+            .where(Revenue.date >= first_day, Revenue.date <= last_day)
+            .group_by(Revenue.store_id)
+            .subquery()
+        )
+        day_ids = (
+            select(func.max(Revenue.id).label("id"))
+            .where(Revenue.date == day)
+            .group_by(Revenue.store_id)
+            .subquery()
+        )
+        day_revenue = aliased(Revenue)
+
+        query = (
+            select(
+                Store.id.label("store_id"),
+                Store.name.label("store_name"),
+                func.coalesce(month_totals.c.total, 0.0).label("total"),
+                func.coalesce(MonthlyPlan.plan_amount, Store.plan, 0.0).label("plan"),
+                day_revenue.amount.label("day_amount"),
+            )
+            .outerjoin(month_totals, month_totals.c.store_id == Store.id)
+            .outerjoin(
+                MonthlyPlan,
+                and_(
+                    MonthlyPlan.store_id == Store.id,
+                    MonthlyPlan.month_year == first_day,
+                ),
+            )
+            .outerjoin(
+                day_revenue,
+                and_(
+                    day_revenue.store_id == Store.id,
+                    day_revenue.id.in_(select(day_ids.c.id)),
+                ),
+            )
+            .order_by(Store.id)
+        )
+
+        result = await self.session.execute(query)
+        return result.all()
+
+    async def stream_report_rows(
+        self,
+        chunk_size: int = 5000,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Строки детального отчета порциями по chunk_size.
+
+        Один запрос с JOIN на магазины возвращает только нужные колонки,
+        без ORM-объектов, а результат читается курсором по частям.
+        start и end ограничивают период включительно (None — без ограничения).
+
+        Yields:
+            Sequence[Row]: Строки (store_name, date, amount, plan)
+        """
+        query = (
+            select(
+                Store.name.label("store_name"),
+                Revenue.date.label("date"),
+                Revenue.amount.label("amount"),
+                Store.plan.label("plan"),
+            )
+            .join(Store, Revenue.store_id == Store.id)
+            .order_by(Store.name, Revenue.date)
+            .execution_options(yield_per=chunk_size)
+        )
+        if start is not None:
+            query = query.where(Revenue.date >= start)
+        if end is not None:
+            query = query.where(Revenue.date <= end)
+
+        result = await self.session.stream(query)
+        async for partition in result.partitions(chunk_size):
+            yield partition
+
+    async def get_date_bounds(self) -> Tuple[Optional[date], Optional[date]]:
+        """Первая и последняя дата, за которые есть выручка"""
+        result = await self.session.execute(
+            select(func.min(Revenue.date), func.max(Revenue.date))
+        )
+        first, last = result.one()
+        return first, last
+
+    async def get_period_summary(
+        self, start: date, end: date, month_weights: Sequence[Tuple[date, float]]
+    ) -> List[Row]:
+        """
+        Сводка по всем магазинам за период одним запросом.
+
+        План периода — сумма планов месяцев, которые затрагивает период,
+        взвешенных долей дней месяца в периоде: план из monthly_plans,
+        а для месяцев без него — Store.plan.
+
+        Args:
+            start: Первый день периода
+            end: Последний день периода
+            month_weights: Первые дни месяцев периода и доли дней в периоде
+
+        Returns:
+            List[Row]: Строки (store_name, total, plan)
+        """
+        totals = (
+            select(
+                Revenue.store_id.label("store_id"),
+                func.sum(Revenue.amount).label("total"),
+            )
+            .where(Revenue.date >= start, Revenue.date <= end)
+            .group_by(Revenue.store_id)
+            .subquery()
+        )
+        weights = dict(month_weights)
+        month_weight = case(weights, value=MonthlyPlan.month_year, else_=0.0)
+        planned = (
+            select(
+                MonthlyPlan.store_id.label("store_id"),
+                func.sum(MonthlyPlan.plan_amount * month_weight).label("amount"),
+                func.sum(month_weight).label("weight"),
+            )
+            .where(MonthlyPlan.month_year.in_(list(weights)))
+            .group_by(MonthlyPlan.store_id)
+            .subquery()
+        )
+        # Доля периода, приходящаяся на месяцы без плана в monthly_plans
+        weight_without_plan = sum(weights.values()) - func.coalesce(
+            planned.c.weight, 0.0
+        )
+
+        query = (
+            select(
+                Store.name.label("store_name"),
+                func.coalesce(totals.c.total, 0.0).label("total"),
+                (
+                    func.coalesce(planned.c.amount, 0.0)
+                    + func.coalesce(Store.plan, 0.0) * weight_without_plan
+                ).label("plan"),
+            )
+            .outerjoin(totals, totals.c.store_id == Store.id)
+            .outerjoin(planned, planned.c.store_id == Store.id)
+            .order_by(Store.name)
+        )
+
+        result = await self.session.execute(query)
+        return result.all()
@@ -1,4 +1,5 @@
-from typing import Optional, List
+from typing import Optional, List, Sequence
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -97,6 +98,18 @@ class UserRepository:
         )
         return result.scalars().all()
 
+    async def get_report_recipient_rows(self, roles: Sequence[str]) -> List[Row]:
+        """
+        Получатели отчетов: только (chat_id, role, first_name, last_name)
+        пользователей с заданными ролями и известным chat_id, без связей.
+        """
+        result = await self.session.execute(
+            select(User.chat_id, User.role, User.first_name, User.last_name)
+            .where(User.chat_id.is_not(None), User.role.in_(roles))
+            .order_by(User.id)
+        )
+        return result.all()
+
     async def update_store(self, user: User, store_id: int) -> User:
         user.store_id = store_id
         self.session.add(user)
@@ -1,19 +1,46 @@
+import asyncio
 import logging
 import datetime
-import io
 import calendar
-import pandas as pd
-from typing import Dict, List, Optional, Tuple, Any, Union
+import tempfile
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Any, Union
 from sqlalchemy import select, func, and_
+from app.core.config import REPORT_CHART_MODE, REPORT_STREAM_CHUNK_SIZE
 from app.core.database import AsyncSession
 from app.models.revenue import Revenue
 from app.models.store import Store
 from app.models.monthly_plan import MonthlyPlan
 from app.repositories.revenue_repository import RevenueRepository
 from app.repositories.monthly_plan_repository import MonthlyPlanRepository
+from app.utils.charts import (
+    OVERVIEW_CHART_KEY,
+    build_revenue_overview,
+    group_store_series,
+    render_revenue_chart,
+)
+from app.utils.columnar_export import (
+    REPORT_COLUMNS,
+    ParquetStreamWriter,
+    encode_csv_rows,
+    parquet_available,
+    spooled_file,
+)
+from app.utils.report_jobs import run_report_stage
+from app.utils.report_period import ReportPeriod
+from app.utils.xlsx_stream import StreamingWorkbook
 
 logger = logging.getLogger(__name__)
 
+# Листы Excel-отчета: выручка по дням и сводка по магазинам
+SHEET_TITLES = ("Выручка по дням", "Сводка по магазинам")
+
+
+def plan_percent(total: float, plan: Optional[float]) -> Optional[float]:
+    """Процент выполнения плана с одним знаком; None, если плана нет"""
+    if not plan or plan <= 0:
+        return None
+    return round(total / plan * 100, 1)
+
 
 class RevenueService:
     def __init__(self, session: AsyncSession):
@@ -34,25 +61,44 @@ class RevenueService:
 
         return (70, 130, 180, 200)
 
-    async def export_report(self) -> Tuple[bytes, Dict[str, bytes]]:
+    async def resolve_period(self, period: Optional[ReportPeriod]) -> ReportPeriod:
         """
-        Экспортирует отчет о выручке магазинов в формате Excel и генерирует графики.
-
-        Returns:
-            Tuple[bytes, Dict[str, bytes]]: Кортеж из байтов файла Excel и словаря изображений
+        Подставляет границы периода: по умолчанию текущий месяц,
+        для «всей истории» — первая и последняя дата с выручкой.
         """
+        if period is None:
+            return ReportPeriod.current_month()
+        if period.is_bounded:
+            return period
+
+        first, last = await self.repo.get_date_bounds()
+        if first is None:
+            return ReportPeriod.current_month()
+        return ReportPeriod(period.start or first, period.end or last)
+
+    async def export_report(
+        self,
+        period: Optional[ReportPeriod] = None,
+        include_charts: bool = False,
+        chart_mode: Optional[str] = None,
+    ) -> Tuple[bytes, Dict[str, bytes]]:
+        """
+        Экспортирует отчет о выручке магазинов в формате Excel.
 
-        data = await self._get_revenue_for_report()
-
-        df = pd.DataFrame(data)
-
-        if not df.empty:
-
-            df["date"] = pd.to_datetime(df["date"])
+        Обертка над export_report_stream для вызывающего кода, которому
+        нужны байты файла; графики рисуются только по запросу.
 
-            df = df.sort_values(["store_name", "date"])
+        Args:
+            period: Период отчета, по умолчанию текущий месяц
+            include_charts: Построить графики выручки
+            chart_mode: "per_store" — отдельный график на магазин,
+                "overview" — один сводный график (по умолчанию REPORT_CHART_MODE)
 
-        excel_buffer = io.BytesIO()
+        Returns:
+            Tuple[bytes, Dict[str, bytes]]: Байты файла Excel и словарь изображений
+            (пустой, если графики не запрошены)
+        """
+        period = await self.resolve_period(period)
 
         use_english_names = False
         try:
@@ -67,101 +113,238 @@ class RevenueService:
         except:
             pass
 
-        with pd.ExcelWriter(excel_buffer, engine="openpyxl") as writer:
+        sheet_titles = ("Details", "Summary") if use_english_names else SHEET_TITLES
+        with await self.export_report_stream(
+            period, sheet_titles=sheet_titles
+        ) as excel_file:
+            excel_bytes = excel_file.read()
 
-            sheet1_name = "Details" if use_english_names else "Выручка по дням"
-            sheet2_name = "Summary" if use_english_names else "Сводка по магазинам"
+        images = {}
+        if include_charts:
+            images = await self.render_report_charts(period, chart_mode)
 
-            if df.empty:
-                pd.DataFrame(columns=["Магазин", "Дата", "Выручка", "План"]).to_excel(
-                    writer, sheet_name=sheet1_name, index=False
-                )
-            else:
+        return excel_bytes, images
 
-                daily_df = df.copy()
-                daily_df.columns = ["Магазин", "Дата", "Выручка", "План"]
-                daily_df.to_excel(writer, sheet_name=sheet1_name, index=False)
+    async def render_report_charts(
+        self,
+        period: Optional[ReportPeriod] = None,
+        chart_mode: Optional[str] = None,
+    ) -> Dict[str, bytes]:
+        """
+        Строит графики выручки для отчета.
 
-            if df.empty:
-                pd.DataFrame(
-                    columns=["Магазин", "Общая выручка", "План", "% выполнения"]
-                ).to_excel(writer, sheet_name=sheet2_name, index=False)
-            else:
+        Args:
+            period: Период отчета, по умолчанию текущий месяц
+            chart_mode: "per_store" — отдельный график на магазин,
+                "overview" — один сводный график (по умолчанию REPORT_CHART_MODE)
 
-                summary_df = (
-                    df.groupby("store_name")
-                    .agg({"amount": "sum", "plan": "first"})
-                    .reset_index()
+        Returns:
+            Dict[str, bytes]: Подпись графика -> изображение PNG
+        """
+        period = await self.resolve_period(period)
+        data = await self._get_revenue_for_report(period)
+
+        if (chart_mode or REPORT_CHART_MODE) == "overview":
+            overview = await self.render_revenue_overview(period, data)
+            return {OVERVIEW_CHART_KEY: overview} if overview else {}
+        return await self.render_store_charts(data=data)
+
+    async def render_revenue_overview(
+        self,
+        period: Optional[ReportPeriod] = None,
+        data: Optional[List[Dict[str, Any]]] = None,
+        summary: Optional[List[Dict[str, Any]]] = None,
+    ) -> Optional[bytes]:
+        """
+        Строит один сводный график по всем магазинам: выручка по дням
+        и накопленное выполнение плана периода.
+
+        Args:
+            period: Период отчета, по умолчанию текущий месяц
+            data: Уже полученные строки выручки
+            summary: Уже полученная сводка по магазинам (планы периода)
+
+        Returns:
+            Optional[bytes]: Изображение PNG или None, если данных нет
+        """
+        period = await self.resolve_period(period)
+        if data is None:
+            data = await self._get_revenue_for_report(period)
+        if not data:
+            return None
+        if summary is None:
+            summary = await self._get_report_summary(period)
+
+        plans = {item["store_name"]: item["plan"] for item in summary}
+        try:
+            return await run_report_stage(build_revenue_overview, data, plans)
+        except Exception as e:
+            logger.error(f"Error generating charts: {e }")
+            return None
+
+    async def render_store_charts(
+        self,
+        period: Optional[ReportPeriod] = None,
+        data: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, bytes]:
+        """
+        Строит графики динамики выручки по магазинам.
+
+        Графики рисуются параллельно в пуле потоков отчетов.
+
+        Args:
+            period: Период отчета, по умолчанию текущий месяц
+            data: Уже полученные строки выручки; если не переданы, читаются из БД
+
+        Returns:
+            Dict[str, bytes]: Название магазина -> изображение PNG
+        """
+        if data is None:
+            data = await self._get_revenue_for_report(await self.resolve_period(period))
+
+        series = group_store_series(data)
+        try:
+            charts = await asyncio.gather(
+                *(
+                    run_report_stage(render_revenue_chart, store_name, dates, amounts)
+                    for store_name, (dates, amounts) in series.items()
                 )
+            )
+        except Exception as e:
+            logger.error(f"Error generating charts: {e }")
+            return {}
+
+        return dict(zip(series, charts))
+
+    async def export_report_stream(
+        self,
+        period: Optional[ReportPeriod] = None,
+        chunk_size: int = REPORT_STREAM_CHUNK_SIZE,
+        sheet_titles: Tuple[str, str] = SHEET_TITLES,
+    ) -> tempfile.SpooledTemporaryFile:
+        """
+        Экспортирует отчет в Excel потоково, с постоянным расходом памяти.
+
+        Строки выручки читаются из БД порциями и сразу дописываются
+        в книгу write_only; файл собирается во временном файле.
+
+        Args:
+            period: Период отчета, по умолчанию текущий месяц
+            chunk_size: Количество строк в порции
+            sheet_titles: Названия листов с выручкой по дням и со сводкой
+
+        Returns:
+            tempfile.SpooledTemporaryFile: Файл xlsx; закрывает его вызывающий код
+        """
+        period = await self.resolve_period(period)
+        summary = await self._get_report_summary(period)
+
+        workbook = StreamingWorkbook()
+        details_title, summary_title = sheet_titles
+        details = workbook.create_sheet(
+            details_title, ["Магазин", "Дата", "Выручка", "План"]
+        )
+
+        async for rows in self.repo.stream_report_rows(
+            chunk_size, period.start, period.end
+        ):
+            # Сериализация строк openpyxl — работа процессора, выносим из цикла событий
+            await run_report_stage(details.append_rows, rows)
 
-                summary_df["percent"] = (
-                    summary_df["amount"] / summary_df["plan"] * 100
-                ).round(1)
-
-                summary_df.columns = [
-                    "Магазин",
-                    "Общая выручка",
-                    "План",
-                    "% выполнения",
-                ]
-                summary_df.to_excel(writer, sheet_name=sheet2_name, index=False)
-
-        excel_buffer.seek(0)
-        excel_bytes = excel_buffer.getvalue()
-
-        image_dict = {}
-
-        if not df.empty:
-            try:
-                import matplotlib.pyplot as plt
-                import matplotlib
-
-                matplotlib.use("Agg")
-
-                stores = df["store_name"].unique()
-
-                for store_name in stores:
-
-                    store_data = df[df["store_name"] == store_name]
-
-                    plt.figure(figsize=(10, 6))
-                    plt.plot(
-                        store_data["date"],
-                        store_data["amount"],
-                        marker="o",
-                        linestyle="-",
-                    )
-                    plt.xlabel("Дата", fontsize=14)
-                    plt.ylabel("Выручка", fontsize=14)
-                    plt.title(f'Динамика выручки магазина "{store_name }"', fontsize=16)
-                    plt.xticks(fontsize=12)
-                    plt.yticks(fontsize=12)
-                    plt.grid(True)
-                    plt.tight_layout()
-
-                    img_buffer = io.BytesIO()
-                    plt.savefig(img_buffer, format="png")
-                    img_buffer.seek(0)
-                    image_dict[store_name] = img_buffer.getvalue()
-                    plt.close()
-
-                if use_english_names and "Store1" not in image_dict:
-
-                    plt.figure(figsize=(10, 6))
-                    plt.text(
-                        0.5, 0.5, "Нет данных", ha="center", va="center", fontsize=14
-                    )
-                    plt.axis("off")
-                    img_buffer = io.BytesIO()
-                    plt.savefig(img_buffer, format="png")
-                    img_buffer.seek(0)
-                    image_dict["Store1"] = img_buffer.getvalue()
-                    plt.close()
-
-            except Exception as e:
-                logger.error(f"Error generating charts: {e }")
-
-        return excel_bytes, image_dict
+        summary_sheet = workbook.create_sheet(
+            summary_title,
+            ["Магазин", "Общая выручка", "План", "% выполнения"],
+        )
+        summary_sheet.append_rows(
+            (
+                item["store_name"],
+                item["total"],
+                item["plan"],
+                plan_percent(item["total"], item["plan"]),
+            )
+            for item in summary
+        )
+
+        return await run_report_stage(workbook.save)
+
+    async def iter_report_csv(
+        self,
+        period: Optional[ReportPeriod] = None,
+        chunk_size: int = REPORT_STREAM_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """
+        Отдает строки выручки за период в виде CSV порциями.
+
+        Args:
+            period: Период отчета, по умолчанию текущий месяц
+            chunk_size: Количество строк в порции
+
+        Yields:
+            bytes: Порция CSV; первая порция — заголовок
+        """
+        period = await self.resolve_period(period)
+
+        yield encode_csv_rows([], header=REPORT_COLUMNS)
+        async for rows in self.repo.stream_report_rows(
+            chunk_size, period.start, period.end
+        ):
+            yield encode_csv_rows(rows)
+
+    async def export_report_csv(
+        self,
+        period: Optional[ReportPeriod] = None,
+        chunk_size: int = REPORT_STREAM_CHUNK_SIZE,
+    ) -> tempfile.SpooledTemporaryFile:
+        """
+        Экспортирует строки выручки за период в CSV.
+
+        Returns:
+            tempfile.SpooledTemporaryFile: Файл CSV; закрывает его вызывающий код
+        """
+        output = spooled_file(".csv")
+        try:
+            async for chunk in self.iter_report_csv(period, chunk_size):
+                output.write(chunk)
+        except Exception:
+            output.close()
+            raise
+
+        output.seek(0)
+        return output
+
+    async def export_report_parquet(
+        self,
+        period: Optional[ReportPeriod] = None,
+        chunk_size: int = REPORT_STREAM_CHUNK_SIZE,
+    ) -> tempfile.SpooledTemporaryFile:
+        """
+        Экспортирует строки выручки за период в Parquet, по Arrow-батчу на порцию.
+
+        Returns:
+            tempfile.SpooledTemporaryFile: Файл Parquet; закрывает его вызывающий код
+
+        Raises:
+            RuntimeError: Если pyarrow не установлен
+        """
+        if not parquet_available():
+            raise RuntimeError("Для выгрузки в Parquet нужен пакет pyarrow")
+
+        period = await self.resolve_period(period)
+
+        output = spooled_file(".parquet")
+        try:
+            writer = ParquetStreamWriter(output)
+            async for rows in self.repo.stream_report_rows(
+                chunk_size, period.start, period.end
+            ):
+                await run_report_stage(writer.write_rows, rows)
+            await run_report_stage(writer.close)
+        except Exception:
+            output.close()
+            raise
+
+        output.seek(0)
+        return output
 
     async def get_matryoshka_data(self) -> List[Dict[str, Any]]:
         """
@@ -217,6 +400,42 @@ class RevenueService:
 
         return result
 
+    async def get_data_fingerprint(self) -> Tuple[Any, ...]:
+        """
+        Отпечаток данных, от которых зависит отчет: выручка, планы и магазины.
+
+        Любая вставка, удаление или правка суммы меняет хотя бы одно из
+        агрегатов, поэтому по совпадению отпечатков можно не строить отчет заново.
+
+        Returns:
+            Tuple[Any, ...]: Дата и агрегаты (количество, суммы, максимальный id)
+        """
+        revenue = select(
+            func.count(Revenue.id),
+            func.coalesce(func.sum(Revenue.amount), 0.0),
+            func.coalesce(func.sum(Revenue.amount * Revenue.id), 0.0),
+            func.coalesce(func.max(Revenue.id), 0),
+        )
+        plans = select(
+            func.count(MonthlyPlan.id),
+            func.coalesce(func.sum(MonthlyPlan.plan_amount * MonthlyPlan.id), 0.0),
+        )
+        stores = select(
+            func.count(Store.id),
+            func.coalesce(func.sum(Store.plan * Store.id), 0.0),
+        )
+
+        revenue_row = (await self.session.execute(revenue)).one()
+        plans_row = (await self.session.execute(plans)).one()
+        stores_row = (await self.session.execute(stores)).one()
+
+        return (
+            datetime.date.today().isoformat(),
+            *tuple(revenue_row),
+            *tuple(plans_row),
+            *tuple(stores_row),
+        )
+
     async def add_revenue(self, store_id: int, date_str: str, amount: float) -> Revenue:
         """
         Добавляет запись о выручке для магазина.
@@ -387,80 +606,115 @@ class RevenueService:
 
         return total
 
-    async def _get_revenue_for_report(self) -> List[Dict[str, Any]]:
+    async def iter_revenue_for_report(
+        self,
+        period: Optional[ReportPeriod] = None,
+        chunk_size: int = REPORT_STREAM_CHUNK_SIZE,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
         """
-        Получает данные о выручке для отчета.
+        Отдает данные о выручке для отчета порциями.
 
-        Returns:
-            List[Dict[str, Any]]: Список словарей с данными о выручке
-        """
-        query = select(Revenue).join(Store, Revenue.store_id == Store.id)
-        result = await self.session.execute(query)
-        revenues = result.scalars().all()
+        Args:
+            period: Период отчета, None — вся история
+            chunk_size: Количество строк в порции
 
-        data = []
-        for rev in revenues:
-            store = await self._get_store_by_id(rev.store_id)
-            data.append(
+        Yields:
+            List[Dict[str, Any]]: Порция словарей с данными о выручке
+        """
+        period = period or ReportPeriod.all_time()
+        async for rows in self.repo.stream_report_rows(
+            chunk_size, period.start, period.end
+        ):
+            yield [
                 {
-                    "store_name": (
-                        store.name if store else f"Магазин ID:{rev .store_id }"
-                    ),
+                    "store_name": row.store_name,
                     "date": (
-                        rev.date.isoformat()
-                        if isinstance(rev.date, datetime.date)
-                        else rev.date
+                        row.date.isoformat()
+                        if isinstance(row.date, datetime.date)
+                        else row.date
                     ),
-                    "amount": rev.amount,
-                    "plan": store.plan if store else None,
+                    "amount": row.amount,
+                    "plan": row.plan,
                 }
-            )
+                for row in rows
+            ]
+
+    async def _get_revenue_for_report(
+        self, period: Optional[ReportPeriod] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Получает данные о выручке для отчета.
+
+        Args:
+            period: Период отчета, None — вся история
 
+        Returns:
+            List[Dict[str, Any]]: Список словарей с данными о выручке
+        """
+        data = []
+        async for chunk in self.iter_revenue_for_report(period):
+            data.extend(chunk)
         return data
 
-    async def _get_revenue_stats(self) -> List[Dict[str, Any]]:
+    async def _get_report_summary(self, period: ReportPeriod) -> List[Dict[str, Any]]:
         """
-        Получает статистику по выручке для всех магазинов.
+        Получает сводку по магазинам за период (агрегация в БД).
+
+        План неполного месяца берется пропорционально числу дней периода,
+        чтобы процент выполнения за часть месяца не занижался.
+
+        Args:
+            period: Период отчета с границами
 
         Returns:
-            List[Dict[str, Any]]: Список словарей со статистикой выручки
+            List[Dict[str, Any]]: Выручка и план периода по каждому магазину
         """
-        query = select(Store)
-        result = await self.session.execute(query)
-        stores = result.scalars().all()
-
-        stats = []
-        today = datetime.date.today()
+        rows = await self.repo.get_period_summary(
+            period.start, period.end, period.month_weights()
+        )
+        return [
+            {"store_name": row.store_name, "total": row.total, "plan": row.plan}
+            for row in rows
+        ]
+
+    async def get_month_stats(
+        self, month: Optional[int] = None, year: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Получает статистику всех магазинов за месяц одним SQL-запросом.
 
-        for store in stores:
+        Args:
+            month: Номер месяца (1-12), если не указан, используется текущий месяц
+            year: Год, если не указан, используется текущий год
 
-            total = await self.get_month_total(store.id)
-            plan = await self.get_monthly_plan(store.id, today.month, today.year)
+        Returns:
+            List[Dict[str, Any]]: Сумма за месяц, план месяца и выручка за сегодня
+            по каждому магазину
+        """
+        today = datetime.date.today()
+        month = month or today.month
+        year = year or today.year
 
-            today_query = (
-                select(Revenue)
-                .where(Revenue.store_id == store.id, Revenue.date == today)
-                .order_by(Revenue.id.desc())
-                .limit(1)
-            )
-            today_result = await self.session.execute(today_query)
-            today_revenue = today_result.scalar_one_or_none()
+        first_day = datetime.date(year, month, 1)
+        last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
 
-            if today_revenue:
+        rows = await self.repo.get_month_stats(first_day, last_day, today)
 
-                display_amount = today_revenue.amount
+        stats = []
+        for row in rows:
+            if row.day_amount is not None:
+                display_amount = row.day_amount
                 display_date = today.isoformat()
             else:
-
                 display_amount = 0.0
                 display_date = None
 
             stats.append(
                 {
-                    "store_id": store.id,
-                    "store_name": store.name,
-                    "total": total,
-                    "plan": plan,
+                    "store_id": row.store_id,
+                    "store_name": row.store_name,
+                    "total": row.total,
+                    "plan": row.plan,
                     "last_revenue": {
                         "amount": display_amount,
                         "date": display_date,
@@ -470,6 +724,15 @@ class RevenueService:
 
         return stats
 
+    async def _get_revenue_stats(self) -> List[Dict[str, Any]]:
+        """
+        Получает статистику по выручке для всех магазинов за текущий месяц.
+
+        Returns:
+            List[Dict[str, Any]]: Список словарей со статистикой выручки
+        """
+        return await self.get_month_stats()
+
     async def _get_store_by_id(self, store_id: int) -> Optional[Store]:
         """
         Вспомогательный метод для получения магазина по ID.
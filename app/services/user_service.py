@@ -1,13 +1,49 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
-from typing import Optional, List
+from typing import Any, Dict, Iterable, Optional, List
 from app.repositories.user_repository import UserRepository
 from app.models.user import User
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Роли пользователей, которые получают ежедневный отчет
+REPORT_RECIPIENT_ROLES = {"admin": "db_admin", "subscriber": "subscriber"}
+
+
+def merge_report_recipients(
+    admin_chat_ids: Iterable[int], rows: Iterable[Any]
+) -> Dict[int, Dict[str, str]]:
+    """
+    Объединяет администраторов из конфига с получателями из БД.
+
+    Args:
+        admin_chat_ids: chat_id администраторов из конфига
+        rows: Записи с полями chat_id, role, first_name, last_name
+
+    Returns:
+        Dict[int, Dict[str, str]]: chat_id -> {"role", "name"};
+        запись из БД заменяет администратора из конфига с тем же chat_id
+    """
+    recipients = {}
+
+    for chat_id in admin_chat_ids:
+        recipients[chat_id] = {
+            "role": "config_admin",
+            "name": f"Config Admin {chat_id }",
+        }
+
+    for row in rows:
+        role = REPORT_RECIPIENT_ROLES.get(row.role)
+        if row.chat_id and role:
+            recipients[row.chat_id] = {
+                "role": role,
+                "name": f"{row .first_name } {row .last_name }",
+            }
+
+    return recipients
+
 
 class UserService:
     def __init__(self, session: AsyncSession):
@@ -51,6 +87,21 @@ class UserService:
         """Получить всех пользователей"""
         return await self.repo.get_all()
 
+    async def get_report_recipients(
+        self, admin_chat_ids: Iterable[int]
+    ) -> Dict[int, Dict[str, str]]:
+        """
+        Получатели ежедневного отчета без загрузки пользователей целиком.
+
+        Args:
+            admin_chat_ids: chat_id администраторов из конфига
+
+        Returns:
+            Dict[int, Dict[str, str]]: chat_id -> {"role", "name"}
+        """
+        rows = await self.repo.get_report_recipient_rows(list(REPORT_RECIPIENT_ROLES))
+        return merge_report_recipients(admin_chat_ids, rows)
+
     async def update_first_name(self, user: User, first_name: str) -> User:
         """Обновить имя пользователя"""
         return await self.repo.update_first_name(user, first_name)
@@ -1,5 +1,7 @@
 import json
 import logging
+import time
+from fnmatch import fnmatch
 from typing import Any, Dict, List, Optional, Union
 from app.core.config import REDIS_DSN
 import redis.asyncio as redis
@@ -8,29 +10,105 @@ import redis.asyncio as redis
 logger = logging.getLogger(__name__)
 
 
-try:
-    redis_client = redis.from_url(REDIS_DSN, decode_responses=True)
-    logger.info("Redis connection initialized")
-except Exception as e:
-    logger.error(f"Failed to initialize Redis connection: {e }")
+class RedisMock:
+    """
+    Замена Redis в памяти процесса, если подключение не удалось.
+
+    Строки хранятся с учетом SET NX и срока жизни, поэтому блокировки
+    и кэш ведут себя так же, как с одной репликой на настоящем Redis.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, str] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
 
-    class RedisMock:
-        async def get(self, key: str) -> Optional[str]:
-            logger.warning(f"Mock Redis GET operation: {key }")
+    def _expire(self, key: str, ms: Optional[float]) -> None:
+        if ms:
+            self._expires[key] = time.monotonic() + ms / 1000
+        else:
+            self._expires.pop(key, None)
+
+    async def get(self, key: str) -> Optional[str]:
+        logger.warning(f"Mock Redis GET operation: {key }")
+        return self._data[key] if self._alive(key) else None
+
+    async def set(
+        self,
+        key: str,
+        value: str,
+        ex: Optional[int] = None,
+        px: Optional[int] = None,
+        nx: bool = False,
+        **_kwargs: Any,
+    ) -> Optional[bool]:
+        logger.warning(f"Mock Redis SET operation: {key }, TTL: {ex or px }")
+        if nx and self._alive(key):
             return None
+        self._data[key] = str(value)
+        self._expire(key, px if px else (ex * 1000 if ex else None))
+        return True
 
-        async def set(self, key: str, _value: str, ex: Optional[int] = None) -> bool:
-            logger.warning(f"Mock Redis SET operation: {key }, TTL: {ex }")
-            return True
+    async def incr(self, key: str) -> int:
+        logger.warning(f"Mock Redis INCR operation: {key }")
+        value = int(self._data[key]) + 1 if self._alive(key) else 1
+        self._data[key] = str(value)
+        return value
+
+    async def eval(self, _script: str, _numkeys: int, *args: Any) -> int:
+        """Скрипты блокировки: снять (key, token) или продлить (key, token, ms)"""
+        logger.warning(f"Mock Redis EVAL operation: {args [:1]}")
+        key, token = args[0], args[1]
+        if not self._alive(key) or self._data[key] != str(token):
+            return 0
+        if len(args) > 2:
+            self._expire(key, float(args[2]))
+        else:
+            await self.delete(key)
+        return 1
+
+    async def delete(self, *keys: str) -> int:
+        logger.warning(f"Mock Redis DELETE operation: {keys }")
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                deleted += 1
+        return deleted
+
+    async def keys(self, pattern: str) -> List[str]:
+        logger.warning(f"Mock Redis KEYS operation: {pattern }")
+        return [key for key in list(self._data) if self._alive(key) and fnmatch(key, pattern)]
+
+    async def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        logger.warning(f"Mock Redis ZADD operation: {key }")
+        return len(mapping)
+
+    async def zrangebyscore(self, key: str, _min: float, _max: float) -> List[str]:
+        logger.warning(f"Mock Redis ZRANGEBYSCORE operation: {key }")
+        return []
+
+    async def zrem(self, key: str, *members: str) -> int:
+        logger.warning(f"Mock Redis ZREM operation: {key }")
+        return 0
 
-        async def delete(self, *keys: str) -> int:
-            logger.warning(f"Mock Redis DELETE operation: {keys }")
-            return len(keys)
+    async def rpush(self, key: str, *values: str) -> int:
+        logger.warning(f"Mock Redis RPUSH operation: {key }")
+        return len(values)
 
-        async def keys(self, pattern: str) -> List[str]:
-            logger.warning(f"Mock Redis KEYS operation: {pattern }")
-            return []
 
+try:
+    redis_client = redis.from_url(REDIS_DSN, decode_responses=True)
+    logger.info("Redis connection initialized")
+except Exception as e:
+    logger.error(f"Failed to initialize Redis connection: {e }")
     redis_client = RedisMock()
     logger.warning("Using Redis mock for testing")
 
@@ -0,0 +1,212 @@
+"""
+Графики выручки магазинов.
+
+Графики строятся через объектный API matplotlib (Figure + FigureCanvasAgg),
+без глобального состояния pyplot, поэтому несколько графиков можно рисовать
+параллельно в пуле потоков отчетов.
+
+Сводный режим рисует все магазины одной фигурой из малых графиков
+с общими осями: данные сводятся в массив NumPy «магазины × дни»,
+и на весь отчет приходится одна компоновка и одно кодирование PNG.
+"""
+
+import datetime
+import io
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Ключ сводного графика в словаре изображений отчета
+OVERVIEW_CHART_KEY = "Все магазины"
+
+
+def group_store_series(
+    data: Sequence[Dict[str, Any]],
+) -> Dict[str, Tuple[List[datetime.date], List[float]]]:
+    """
+    Группирует строки выручки по магазинам.
+
+    Args:
+        data: Строки с полями store_name, date (ISO-строка или date), amount
+
+    Returns:
+        Dict[str, Tuple[List[datetime.date], List[float]]]: Магазин -> даты
+        и выручка, по возрастанию даты; магазины по алфавиту
+    """
+    series: Dict[str, Tuple[List[datetime.date], List[float]]] = {}
+    for row in sorted(data, key=lambda r: (r["store_name"], str(r["date"]))):
+        day = row["date"]
+        if isinstance(day, str):
+            day = datetime.date.fromisoformat(day)
+        dates, amounts = series.setdefault(row["store_name"], ([], []))
+        dates.append(day)
+        amounts.append(row["amount"])
+    return series
+
+
+def render_revenue_chart(
+    store_name: str, dates: Sequence, amounts: Sequence[float]
+) -> bytes:
+    """
+    Рисует динамику выручки одного магазина.
+
+    Args:
+        store_name: Название магазина
+        dates: Даты выручки
+        amounts: Выручка по датам
+
+    Returns:
+        bytes: Изображение PNG
+    """
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+
+    ax = figure.add_subplot()
+    ax.plot(dates, amounts, marker="o", linestyle="-")
+    ax.set_xlabel("Дата", fontsize=14)
+    ax.set_ylabel("Выручка", fontsize=14)
+    ax.set_title(f'Динамика выручки магазина "{store_name }"', fontsize=16)
+    ax.tick_params(labelsize=12)
+    ax.grid(True)
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def _as_date(value: Any) -> datetime.date:
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def pivot_store_series(
+    data: Sequence[Dict[str, Any]],
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Сводит строки выручки в матрицу «магазины × дни».
+
+    Args:
+        data: Строки с полями store_name, date (ISO-строка или date), amount
+
+    Returns:
+        Tuple[List[str], np.ndarray, np.ndarray]: Магазины по алфавиту,
+        непрерывный ряд дней (datetime64[D]) и выручка; дни без записей — NaN
+    """
+    stores = sorted({row["store_name"] for row in data})
+    if not stores:
+        return [], np.array([], dtype="datetime64[D]"), np.empty((0, 0))
+
+    store_index = {name: i for i, name in enumerate(stores)}
+    row_dates = np.array([_as_date(row["date"]) for row in data], dtype="datetime64[D]")
+    days = np.arange(row_dates.min(), row_dates.max() + 1)
+
+    rows = np.fromiter(
+        (store_index[row["store_name"]] for row in data), dtype=np.intp, count=len(data)
+    )
+    columns = (row_dates - days[0]).astype(np.intp)
+    amounts = np.fromiter(
+        (row["amount"] for row in data), dtype=np.float64, count=len(data)
+    )
+
+    values = np.zeros((len(stores), len(days)))
+    np.add.at(values, (rows, columns), amounts)
+    present = np.zeros(values.shape, dtype=bool)
+    present[rows, columns] = True
+    values[~present] = np.nan
+
+    return stores, days, values
+
+
+def render_revenue_overview(
+    stores: Sequence[str],
+    days: np.ndarray,
+    values: np.ndarray,
+    plans: np.ndarray,
+    columns: int = 3,
+) -> bytes:
+    """
+    Рисует выручку всех магазинов одной фигурой из малых графиков.
+
+    На каждом графике столбцы — выручка по дням (общая шкала для всех
+    магазинов), линия — накопленная выручка в процентах от плана
+    (тоже общая шкала, пунктир — 100%).
+
+    Args:
+        stores: Названия магазинов (строки матрицы)
+        days: Дни (столбцы матрицы)
+        values: Выручка «магазины × дни», NaN — нет записи
+        plans: План периода по каждому магазину
+        columns: Число графиков в строке
+
+    Returns:
+        bytes: Изображение PNG
+    """
+    count = len(stores)
+    columns = max(1, min(columns, count))
+    rows = math.ceil(count / columns)
+
+    cumulative = np.nancumsum(values, axis=1)
+    plans = np.asarray(plans, dtype=np.float64)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(plans > 0, cumulative / plans * 100, np.nan)
+    percent_top = 110.0
+    if np.isfinite(percent).any():
+        percent_top = max(percent_top, float(np.nanmax(percent)) * 1.05)
+
+    figure = Figure(figsize=(4.5 * columns, 3 * rows), constrained_layout=True)
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(rows, columns, sharex=True, sharey=True, squeeze=False)
+
+    for index, ax in enumerate(axes.flat):
+        if index >= count:
+            ax.set_visible(False)
+            continue
+
+        ax.bar(days, np.nan_to_num(values[index]), color="steelblue", width=0.8)
+        ax.set_title(stores[index], fontsize=11)
+        ax.grid(True, alpha=0.3)
+        ax.tick_params(axis="x", labelrotation=45, labelsize=8)
+        # Под графиком пустая ячейка сетки — подписи дат нужны и здесь
+        if index + columns >= count:
+            ax.tick_params(axis="x", labelbottom=True)
+
+        progress = ax.twinx()
+        progress.plot(days, percent[index], color="darkorange", linewidth=2)
+        progress.axhline(100, color="gray", linestyle="--", linewidth=0.8)
+        progress.set_ylim(0, percent_top)
+        if index % columns != columns - 1 and index != count - 1:
+            progress.tick_params(labelright=False)
+
+    figure.suptitle("Выручка по дням и выполнение плана, %", fontsize=14)
+    figure.supylabel("Выручка за день")
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def build_revenue_overview(
+    data: Sequence[Dict[str, Any]], plans: Dict[str, float], columns: int = 3
+) -> Optional[bytes]:
+    """
+    Сводный график по строкам выручки (синхронный CPU-этап).
+
+    Args:
+        data: Строки выручки отчета
+        plans: План периода по названию магазина
+        columns: Число графиков в строке
+
+    Returns:
+        Optional[bytes]: Изображение PNG или None, если данных нет
+    """
+    stores, days, values = pivot_store_series(data)
+    if not stores:
+        return None
+
+    store_plans = np.array([plans.get(name) or 0.0 for name in stores])
+    return render_revenue_overview(stores, days, values, store_plans, columns)
@@ -0,0 +1,103 @@
+"""
+Выгрузка строк отчета в CSV и Parquet.
+
+Оба формата пишутся порциями по мере чтения строк из БД: CSV — простым
+кодированием текста, Parquet — Arrow-батчами через ParquetWriter. В отличие
+от xlsx здесь почти нет работы процессора, и выгрузка упирается в ввод-вывод.
+"""
+
+import csv
+import io
+import tempfile
+from typing import Any, Iterable, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet необязателен, CSV работает без pyarrow
+    pa = None
+    pq = None
+
+from app.core.config import REPORT_SPOOL_MAX_SIZE
+
+REPORT_COLUMNS = ["store_name", "date", "amount", "plan"]
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def encode_csv_rows(
+    rows: Iterable[Sequence[Any]], header: Optional[Sequence[str]] = None
+) -> bytes:
+    """
+    Кодирует порцию строк в CSV (UTF-8).
+
+    Args:
+        rows: Строки значений
+        header: Заголовок, пишется перед строками (только для первой порции)
+
+    Returns:
+        bytes: Закодированная порция
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(header)
+    for row in rows:
+        writer.writerow(
+            [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+        )
+    return buffer.getvalue().encode("utf-8")
+
+
+def spooled_file(suffix: str) -> tempfile.SpooledTemporaryFile:
+    return tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_SIZE, suffix=suffix)
+
+
+class ParquetStreamWriter:
+    """
+    Пишет строки отчета в Parquet по одному Arrow-батчу на порцию.
+
+    Args:
+        output: Файловый объект для записи (открыт в двоичном режиме)
+    """
+
+    def __init__(self, output: Any):
+        if pa is None:
+            raise RuntimeError("Для выгрузки в Parquet нужен пакет pyarrow")
+
+        self.schema = pa.schema(
+            [
+                ("store_name", pa.string()),
+                ("date", pa.date32()),
+                ("amount", pa.float64()),
+                ("plan", pa.float64()),
+            ]
+        )
+        self.rows = 0
+        self._writer = pq.ParquetWriter(output, self.schema, compression="snappy")
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]) -> int:
+        """
+        Записывает порцию строк одним батчем.
+
+        Returns:
+            int: Сколько строк записано
+        """
+        if not rows:
+            return 0
+        columns = list(zip(*rows))
+        batch = pa.RecordBatch.from_arrays(
+            [
+                pa.array(values, type=field.type)
+                for values, field in zip(columns, self.schema)
+            ],
+            schema=self.schema,
+        )
+        self._writer.write_batch(batch)
+        self.rows += len(rows)
+        return len(rows)
+
+    def close(self) -> None:
+        self._writer.close()
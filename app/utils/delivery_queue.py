@@ -0,0 +1,327 @@
+"""
+Очередь повторной доставки отчетов на Redis.
+
+Если отправка отчета получателю не удалась, в очередь кладется задание
+с chat_id и теми частями отчета, которые получатель еще не получил.
+Файлы, уже загруженные в Telegram, хранятся по file_id, и повтор стоит
+одного запроса к Bot API. Если загрузить файл не удалось ни разу
+(например, Telegram был недоступен всю рассылку), его содержимое
+сохраняется один раз под отдельным ключом с TTL, а задания всех
+получателей ссылаются на этот ключ.
+
+Задания хранятся в отсортированном множестве (score — время следующей
+попытки), задержка растет экспоненциально. После исчерпания попыток
+задание переносится в список «мертвых» писем для ручного разбора.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+
+from app.core.config import (
+    REPORT_RETRY_BASE_DELAY,
+    REPORT_RETRY_INTERVAL,
+    REPORT_RETRY_MAX_ATTEMPTS,
+    REPORT_RETRY_MAX_DELAY,
+)
+from app.utils.cache import redis_client
+from app.utils.rate_limit import TelegramRateLimiter
+from app.utils.report_delivery import (
+    DeliveryError,
+    ReportArtifact,
+    ReportDocument,
+    ReportPhoto,
+    deliver_report,
+)
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "report_delivery:pending"
+DEAD_KEY = "report_delivery:dead"
+BLOB_KEY_PREFIX = "report_delivery:blob:"
+
+# Недоставленные части получателя: chat_id, документ, изображения, ошибка
+FailedDelivery = Tuple[int, Optional[ReportDocument], List[ReportPhoto], str]
+
+
+def retry_delay(attempt: int) -> float:
+    """Задержка перед попыткой номер attempt (с нуля): base * 2^attempt"""
+    return min(REPORT_RETRY_MAX_DELAY, REPORT_RETRY_BASE_DELAY * (2**attempt))
+
+
+def blob_ttl() -> int:
+    """Сколько хранить содержимое файлов: все попытки повтора плюс запас"""
+    delays = sum(retry_delay(attempt) for attempt in range(REPORT_RETRY_MAX_ATTEMPTS))
+    return int(delays + REPORT_RETRY_MAX_DELAY)
+
+
+async def _store_blobs(
+    artifacts: Iterable[ReportArtifact], blob_keys: Dict[int, str]
+) -> None:
+    """
+    Сохраняет содержимое еще не загруженных в Telegram файлов.
+
+    Каждый файл сохраняется один раз: его ключ запоминается в blob_keys
+    (по id объекта) и переиспользуется в заданиях остальных получателей.
+    """
+    for artifact in artifacts:
+        if artifact.file_id or id(artifact) in blob_keys:
+            continue
+        key = f"{BLOB_KEY_PREFIX }{uuid .uuid4 ().hex }"
+        await redis_client.set(
+            key, base64.b64encode(artifact.data).decode("ascii"), ex=blob_ttl()
+        )
+        blob_keys[id(artifact)] = key
+
+
+def _dump_artifact(artifact: ReportArtifact, blob_keys: Dict[int, str]) -> Dict[str, Any]:
+    if artifact.file_id:
+        return {"file_id": artifact.file_id, "caption": artifact.caption}
+    # Файл еще не загружен в Telegram — в задании только ключ содержимого
+    return {
+        "blob": blob_keys[id(artifact)],
+        "filename": artifact.filename,
+        "caption": artifact.caption,
+    }
+
+
+class _ArtifactLoader:
+    """
+    Восстанавливает части отчета из заданий одного прохода очереди.
+
+    Содержимое каждого файла читается из Redis один раз за проход, а после
+    первой успешной загрузки в Telegram остальные задания отправляют файл
+    по полученному file_id.
+    """
+
+    def __init__(self):
+        self.blobs: Dict[str, bytes] = {}
+        self.uploaded: Dict[str, str] = {}
+        self.blob_keys: Dict[int, str] = {}
+
+    async def load(self, cls: type, data: Dict[str, Any]) -> ReportArtifact:
+        file_id = data.get("file_id") or self.uploaded.get(data.get("blob"))
+        if file_id:
+            artifact = cls(b"", "", data["caption"])
+            artifact.remember(file_id)
+            # id() мог достаться от уже удаленного объекта
+            self.blob_keys.pop(id(artifact), None)
+            return artifact
+
+        key = data["blob"]
+        if key not in self.blobs:
+            encoded = await redis_client.get(key)
+            if encoded is None:
+                raise KeyError(f"Содержимое файла отчета истекло: {key }")
+            self.blobs[key] = base64.b64decode(encoded)
+
+        artifact = cls(self.blobs[key], data["filename"], data["caption"])
+        self.blob_keys[id(artifact)] = key
+        return artifact
+
+    async def artifacts(
+        self, item: Dict[str, Any]
+    ) -> Tuple[Optional[ReportDocument], List[ReportPhoto]]:
+        document = None
+        if item.get("document"):
+            document = await self.load(ReportDocument, item["document"])
+
+        photos = [await self.load(ReportPhoto, data) for data in item.get("photos", [])]
+        return document, photos
+
+    def remember_uploads(self, artifacts: Iterable[Optional[ReportArtifact]]) -> None:
+        for artifact in artifacts:
+            key = self.blob_keys.get(id(artifact))
+            if key and artifact.file_id:
+                self.uploaded[key] = artifact.file_id
+
+
+def make_item(
+    chat_id: int,
+    document: Optional[ReportDocument],
+    photos: List[ReportPhoto],
+    attempt: int = 0,
+    error: str = "",
+    blob_keys: Optional[Dict[int, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Задание повторной доставки недоставленных частей отчета.
+
+    Args:
+        chat_id: Получатель
+        document: Документ, если получатель его еще не получил
+        photos: Изображения, которые получатель еще не получил
+        attempt: Номер следующей попытки
+        error: Текст последней ошибки
+        blob_keys: Ключи сохраненного содержимого файлов без file_id
+    """
+    blob_keys = blob_keys or {}
+    return {
+        "chat_id": chat_id,
+        "document": (
+            _dump_artifact(document, blob_keys) if document is not None else None
+        ),
+        "photos": [_dump_artifact(photo, blob_keys) for photo in photos],
+        "attempt": attempt,
+        "error": error,
+    }
+
+
+async def enqueue(item: Dict[str, Any], now: Optional[float] = None) -> bool:
+    """
+    Кладет задание в очередь с задержкой по номеру попытки.
+
+    Returns:
+        bool: True, если задание сохранено
+    """
+    due = (now if now is not None else time.time()) + retry_delay(item["attempt"])
+    try:
+        await redis_client.zadd(PENDING_KEY, {json.dumps(item): due})
+        return True
+    except Exception as e:
+        logger.error(
+            f"Не удалось поставить доставку в очередь (chat_id: {item ['chat_id']}): {e }"
+        )
+        return False
+
+
+async def enqueue_failed_deliveries(failures: Sequence[FailedDelivery]) -> int:
+    """
+    Ставит в очередь недоставленные части отчета после рассылки.
+
+    Обычно файлы к этому моменту уже загружены в Telegram хотя бы одному
+    получателю, и в задания попадают только file_id. Содержимое остальных
+    файлов сохраняется один раз на всю рассылку, а не в каждое задание.
+
+    Returns:
+        int: Сколько заданий поставлено в очередь
+    """
+    blob_keys: Dict[int, str] = {}
+    enqueued = 0
+    for chat_id, document, photos, error in failures:
+        parts = ([document] if document is not None else []) + list(photos)
+        try:
+            await _store_blobs(parts, blob_keys)
+        except Exception as e:
+            logger.error(
+                f"Не удалось сохранить файлы отчета для повтора (chat_id: {chat_id }): {e }"
+            )
+            continue
+        item = make_item(chat_id, document, photos, error=error, blob_keys=blob_keys)
+        if await enqueue(item):
+            enqueued += 1
+    return enqueued
+
+
+async def enqueue_failed_delivery(
+    chat_id: int,
+    document: Optional[ReportDocument],
+    photos: List[ReportPhoto],
+    error: str = "",
+) -> bool:
+    """Ставит в очередь недоставленные части отчета одного получателя"""
+    return bool(await enqueue_failed_deliveries([(chat_id, document, photos, error)]))
+
+
+async def _dead_letter(item: Union[Dict[str, Any], str]) -> None:
+    try:
+        value = item if isinstance(item, str) else json.dumps(item)
+        await redis_client.rpush(DEAD_KEY, value)
+    except Exception as e:
+        logger.error(f"Не удалось сохранить недоставленный отчет: {e }")
+
+
+async def process_due(
+    bot: Bot,
+    limiter: Optional[TelegramRateLimiter] = None,
+    now: Optional[float] = None,
+) -> Tuple[int, int]:
+    """
+    Повторяет доставки, срок которых наступил.
+
+    Задание забирается из очереди через ZREM: если задание уже забрал
+    другой процесс, оно пропускается.
+
+    Returns:
+        Tuple[int, int]: Число успешных и неудачных повторов
+    """
+    now = now if now is not None else time.time()
+    try:
+        members = await redis_client.zrangebyscore(PENDING_KEY, 0, now)
+    except Exception as e:
+        logger.error(f"Не удалось прочитать очередь доставки: {e }")
+        return 0, 0
+
+    loader = _ArtifactLoader()
+    delivered = failed = 0
+    for member in members:
+        try:
+            if not await redis_client.zrem(PENDING_KEY, member):
+                continue
+        except Exception as e:
+            logger.error(f"Не удалось забрать задание из очереди доставки: {e }")
+            break
+
+        try:
+            item = json.loads(member)
+            chat_id = item["chat_id"]
+            document, photos = await loader.artifacts(item)
+        except Exception as e:
+            # Задание уже забрано из очереди — сохраняем его для ручного разбора
+            logger.error(f"Некорректное задание доставки перенесено в недоставленные: {e }")
+            failed += 1
+            await _dead_letter(member)
+            continue
+
+        try:
+            await deliver_report(bot, chat_id, document, photos, limiter)
+            loader.remember_uploads([document, *photos])
+            delivered += 1
+            logger.info(
+                f"✅ Отчет доставлен повторно: chat_id {chat_id }, попытка {item ['attempt'] + 1 }"
+            )
+        except DeliveryError as delivery_error:
+            failed += 1
+            loader.remember_uploads([document, *photos])
+            send_error = delivery_error.error
+            # В следующий раз отправляются только недоставленные части
+            item = make_item(
+                chat_id,
+                delivery_error.document,
+                delivery_error.photos,
+                attempt=item["attempt"] + 1,
+                error=str(send_error),
+                blob_keys=loader.blob_keys,
+            )
+            # Бот заблокирован пользователем — повторять бессмысленно
+            if (
+                isinstance(send_error, TelegramForbiddenError)
+                or item["attempt"] >= REPORT_RETRY_MAX_ATTEMPTS
+            ):
+                logger.error(
+                    f"❌ Отчет не доставлен после {item ['attempt']} попыток: "
+                    f"chat_id {chat_id }: {send_error }"
+                )
+                await _dead_letter(item)
+            else:
+                await enqueue(item, now)
+
+    return delivered, failed
+
+
+async def run_retry_worker(bot: Bot, interval: float = REPORT_RETRY_INTERVAL) -> None:
+    """Фоновый цикл повторной доставки отчетов"""
+    limiter = TelegramRateLimiter()
+    while True:
+        try:
+            await process_due(bot, limiter)
+        except Exception as e:
+            logger.error(f"Ошибка обработки очереди доставки: {e }")
+        await asyncio.sleep(interval)
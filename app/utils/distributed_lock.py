@@ -0,0 +1,131 @@
+"""
+Распределенная блокировка на Redis.
+
+Блокировка берется командой SET NX PX, поэтому истекает сама, если держатель
+упал. Каждое взятие получает возрастающий токен (fencing token) из INCR:
+держатель, у которого блокировка истекла и перешла другому процессу,
+узнает об этом по несовпадению токена и прекращает работу.
+
+Время жизни блокировки короткое: пока держатель работает, keep_alive()
+продлевает ее в фоне, а если держатель упал, блокировка быстро истекает
+и не мешает другим репликам.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from app.utils.cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Снять блокировку, только если она все еще наша
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Продлить блокировку, только если она все еще наша
+_EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """
+    Блокировка с истечением и fencing-токеном.
+
+    Args:
+        key: Ключ блокировки в Redis
+        ttl_ms: Время жизни блокировки в миллисекундах
+        fence_key: Счетчик fencing-токенов. Блокировки с меняющимся ключом
+            (например, по дням) должны делить один счетчик, иначе каждый
+            ключ оставляет в Redis вечный счетчик. По умолчанию — "<key>:fence"
+    """
+
+    def __init__(self, key: str, ttl_ms: int, fence_key: Optional[str] = None):
+        self.key = key
+        self.ttl_ms = ttl_ms
+        self.fence_key = fence_key or f"{key }:fence"
+        self.token: Optional[int] = None
+        self._renewal: Optional[asyncio.Task] = None
+
+    async def acquire(self) -> Optional[int]:
+        """
+        Пытается взять блокировку.
+
+        Returns:
+            Optional[int]: Fencing-токен или None, если блокировка занята.
+            Ошибки Redis пробрасываются вызывающему коду.
+        """
+        token = int(await redis_client.incr(self.fence_key))
+        acquired = await redis_client.set(
+            self.key, str(token), nx=True, px=self.ttl_ms
+        )
+        if not acquired:
+            return None
+        self.token = token
+        return token
+
+    async def is_held(self) -> bool:
+        """Проверяет, что блокировка все еще принадлежит этому держателю"""
+        if self.token is None:
+            return False
+        value = await redis_client.get(self.key)
+        return value is not None and str(value) == str(self.token)
+
+    async def extend(self, ttl_ms: Optional[int] = None) -> bool:
+        if self.token is None:
+            return False
+        result = await redis_client.eval(
+            _EXTEND_SCRIPT, 1, self.key, str(self.token), ttl_ms or self.ttl_ms
+        )
+        return bool(result)
+
+    def keep_alive(self, interval: Optional[float] = None) -> None:
+        """
+        Продлевает блокировку в фоне, пока она не снята.
+
+        Args:
+            interval: Период продления в секундах, по умолчанию треть TTL
+        """
+        if self._renewal is not None and not self._renewal.done():
+            return
+        self._renewal = asyncio.create_task(
+            self._renew(interval or self.ttl_ms / 3000)
+        )
+
+    async def _renew(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.extend():
+                    logger.warning(f"Блокировка {self .key } потеряна, продление остановлено")
+                    return
+            except Exception as e:
+                logger.warning(f"Не удалось продлить блокировку {self .key }: {e }")
+
+    def stop_keep_alive(self) -> None:
+        if self._renewal is not None:
+            self._renewal.cancel()
+            self._renewal = None
+
+    async def release(self) -> bool:
+        self.stop_keep_alive()
+        if self.token is None:
+            return False
+        try:
+            result = await redis_client.eval(
+                _RELEASE_SCRIPT, 1, self.key, str(self.token)
+            )
+            return bool(result)
+        except Exception as e:
+            logger.error(f"Не удалось снять блокировку {self .key }: {e }")
+            return False
+        finally:
+            self.token = None
@@ -0,0 +1,138 @@
+"""
+Профили кодирования изображений отчета перед отправкой в Telegram.
+
+Telegram все равно пережимает фотографии, поэтому полноразмерный RGBA PNG
+только увеличивает время кодирования и объем загрузки для каждого получателя.
+Профиль уменьшает изображение до заданных размеров, убирает прозрачность
+и кодирует его один раз в выбранный формат.
+"""
+
+import io
+from typing import Tuple
+
+from PIL import Image
+
+from app.core.config import (
+    REPORT_IMAGE_COMPRESS_LEVEL,
+    REPORT_IMAGE_FORMAT,
+    REPORT_IMAGE_MAX_HEIGHT,
+    REPORT_IMAGE_MAX_WIDTH,
+    REPORT_IMAGE_QUALITY,
+)
+
+_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+
+class EncodingProfile:
+    """
+    Параметры кодирования изображения.
+
+    Args:
+        format: Формат PIL: PNG, JPEG или WEBP
+        quality: Качество для JPEG/WEBP (1-100)
+        compress_level: Уровень сжатия zlib для PNG (0-9)
+        max_width: Максимальная ширина, 0 — без ограничения
+        max_height: Максимальная высота, 0 — без ограничения
+        flatten: Накладывать изображение на непрозрачный фон
+        background: Цвет фона для изображений с прозрачностью
+    """
+
+    def __init__(
+        self,
+        format: str = "PNG",
+        quality: int = 85,
+        compress_level: int = 6,
+        max_width: int = 0,
+        max_height: int = 0,
+        flatten: bool = True,
+        background: Tuple[int, int, int] = (250, 250, 250),
+    ):
+        self.format = format.upper()
+        if self.format == "JPG":
+            self.format = "JPEG"
+        if self.format not in _EXTENSIONS:
+            raise ValueError(f"Неподдерживаемый формат изображения: {format }")
+
+        self.quality = quality
+        self.compress_level = compress_level
+        self.max_width = max(0, max_width)
+        self.max_height = max(0, max_height)
+        # JPEG не поддерживает прозрачность
+        self.flatten = flatten or self.format == "JPEG"
+        self.background = background
+
+    def __repr__(self) -> str:
+        return (
+            f"EncodingProfile({self .format }, quality={self .quality }, "
+            f"max={self .max_width }x{self .max_height })"
+        )
+
+    @property
+    def extension(self) -> str:
+        return _EXTENSIONS[self.format]
+
+    def target_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """Размер изображения после вписывания в ограничения профиля"""
+        width, height = size
+        scale = 1.0
+        if self.max_width and width > self.max_width:
+            scale = min(scale, self.max_width / width)
+        if self.max_height and height > self.max_height:
+            scale = min(scale, self.max_height / height)
+        if scale >= 1.0:
+            return size
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def prepare(self, image: Image.Image) -> Image.Image:
+        """Уменьшает изображение и убирает прозрачность перед кодированием"""
+        size = self.target_size(image.size)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+
+        if self.flatten and image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, self.background)
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA")
+        return image
+
+    def encode(self, image: Image.Image) -> io.BytesIO:
+        """
+        Кодирует изображение согласно профилю.
+
+        Args:
+            image: Исходное изображение PIL
+
+        Returns:
+            io.BytesIO: Буфер с закодированным изображением
+        """
+        image = self.prepare(image)
+
+        options = {}
+        if self.format == "PNG":
+            options["compress_level"] = self.compress_level
+            options["optimize"] = False
+        elif self.format == "JPEG":
+            options["quality"] = self.quality
+            options["optimize"] = True
+        elif self.format == "WEBP":
+            options["quality"] = self.quality
+            options["method"] = 4
+
+        buf = io.BytesIO()
+        image.save(buf, format=self.format, **options)
+        buf.seek(0)
+        return buf
+
+
+# Без потерь и без изменения размера — прежнее поведение построителя
+LOSSLESS_PNG = EncodingProfile("PNG", flatten=False)
+
+report_encoding = EncodingProfile(
+    REPORT_IMAGE_FORMAT,
+    quality=REPORT_IMAGE_QUALITY,
+    compress_level=REPORT_IMAGE_COMPRESS_LEVEL,
+    max_width=REPORT_IMAGE_MAX_WIDTH,
+    max_height=REPORT_IMAGE_MAX_HEIGHT,
+)
@@ -1,12 +1,166 @@
+import atexit
 import io
+import math
+import multiprocessing
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from enum import Enum, auto
-from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
-import pyvista as pv
 from PIL import Image, ImageDraw, ImageFont
 
+try:
+    import pyvista as pv
+except ImportError:  # Для 2D-рендера по шаблону pyvista/VTK не нужны
+    pv = None
+
+from app.core.config import (
+    MATRYOSHKA_FONT_PATH,
+    MATRYOSHKA_GRID_COLUMNS,
+    MATRYOSHKA_GRID_MAX_HEIGHT,
+    MATRYOSHKA_GRID_MAX_WIDTH,
+    MATRYOSHKA_MODEL_CACHE_SIZE,
+    MATRYOSHKA_PLOTTER_MAX_USES,
+    MATRYOSHKA_PLOTTER_POOL_SIZE,
+    MATRYOSHKA_RENDER_WORKERS,
+    MATRYOSHKA_RENDERER,
+    MATRYOSHKA_SPRITE_DIR,
+    MATRYOSHKA_TEMPLATE_PATH,
+)
+from app.utils.image_encoding import LOSSLESS_PNG, EncodingProfile, report_encoding
+from app.utils.matryoshka_sprites import SpriteTable
+
+DEFAULT_FILL_COLOR = (70, 130, 180, 200)
+DEFAULT_RENDER_SIZE = (1000, 1000)
+
+
+class ModelCache:
+    """
+    LRU-кэш загруженных и отцентрированных 3D-моделей.
+
+    Ключ кэша — пара (абсолютный путь, mtime файла), поэтому замена файла
+    модели на диске приводит к повторной загрузке. Наружу отдаются поверхностные
+    копии: `clip` и прочие операции без `inplace` не трогают закэшированную модель.
+    """
+
+    def __init__(self, max_size: int = 4):
+        self.max_size = max(1, max_size)
+        self._models: "OrderedDict[Tuple[str, float], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str):
+        """Возвращает копию модели, загружая и центрируя её при первом обращении"""
+        path = os.path.abspath(file_path)
+        key = (path, os.path.getmtime(path))
+
+        with self._lock:
+            mesh = self._models.get(key)
+            if mesh is not None:
+                self._models.move_to_end(key)
+                return mesh.copy(deep=False)
+
+        mesh = pv.read(path)
+        mesh.translate(-np.array(mesh.center), inplace=True)
+
+        with self._lock:
+            # Устаревшие версии того же файла больше не понадобятся
+            for stale_key in [k for k in self._models if k[0] == path]:
+                del self._models[stale_key]
+            self._models[key] = mesh
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+
+        return mesh.copy(deep=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+model_cache = ModelCache(MATRYOSHKA_MODEL_CACHE_SIZE)
+
+
+class PlotterPool:
+    """
+    Пул «тёплых» off-screen плоттеров.
+
+    Создание pv.Plotter поднимает окно рендеринга VTK и GL-контекст, поэтому
+    плоттеры переиспользуются: между рендерами с них снимаются все акторы, а
+    камера выставляется заново. GL-контекст привязан к потоку, в котором он
+    создан, поэтому свободные плоттеры хранятся отдельно для каждого потока.
+    После max_uses рендеров плоттер закрывается и создается заново, чтобы
+    не копить ресурсы VTK.
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 100):
+        self.size = max(0, size)
+        self.max_uses = max(1, max_uses)
+        self._local = threading.local()
+
+    def _idle(self) -> List[List[Any]]:
+        if not hasattr(self._local, "idle"):
+            self._local.idle = []
+        return self._local.idle
+
+    def _create(self, window_size: Tuple[int, int]):
+        plotter = pv.Plotter(off_screen=True, window_size=window_size, image_scale=1)
+        plotter.background_color = (250, 250, 250, 255)  # Match background of composition
+        return plotter
+
+    @contextmanager
+    def acquire(self, window_size: Tuple[int, int]):
+        """Выдает плоттер нужного размера и возвращает его в пул после рендера"""
+        window_size = tuple(window_size)
+        idle = self._idle()
+        entry = next((e for e in idle if e[0] == window_size), None)
+        if entry is not None:
+            idle.remove(entry)
+        else:
+            entry = [window_size, self._create(window_size), 0]
+
+        try:
+            yield entry[1]
+        except Exception:
+            entry[1].close()
+            raise
+
+        entry[2] += 1
+        if entry[2] >= self.max_uses or len(idle) >= self.size:
+            entry[1].close()
+        else:
+            entry[1].clear_actors()
+            idle.append(entry)
+
+    def close(self) -> None:
+        """Закрывает свободные плоттеры текущего потока"""
+        idle = self._idle()
+        while idle:
+            idle.pop()[1].close()
+
+
+plotter_pool = PlotterPool(MATRYOSHKA_PLOTTER_POOL_SIZE, MATRYOSHKA_PLOTTER_MAX_USES)
+
+
+def _point_count(mesh: Any) -> int:
+    """
+    Число точек сетки. glTF/GLB читаются как MultiBlock, у которого нет
+    n_points, поэтому точки блоков суммируются рекурсивно.
+    """
+    if mesh is None:
+        return 0
+    if isinstance(mesh, pv.MultiBlock):
+        return sum(_point_count(block) for block in mesh)
+    return mesh.n_points
+
 
 # 3D render function (adapted from test.py)
 def render_model_with_fill(
@@ -14,23 +168,23 @@ def render_model_with_fill(
     percentage: float,
     fill_color: Tuple[int, int, int, int],
     window_size: Tuple[int, int] = (1024, 1024),
+    pool: Optional[PlotterPool] = None,
 ) -> Optional[Image.Image]:
     """
     Загружает 3D-модель, заполняет её и возвращает изображение в виде объекта PIL.Image.
+    Плоттер берется из пула (по умолчанию — общего для процесса).
     """
     if not 0 <= percentage <= 100:
         print(f"Ошибка: Процент должен быть в диапазоне от 0 до 100. Меняю на 0/100: {percentage}")
         percentage = max(0, min(percentage, 100))
 
     try:
-        mesh = pv.read(file_path)
+        # Модель уже отцентрирована при загрузке в кэш
+        mesh = model_cache.get(file_path)
     except Exception as e:
         print(f"Не удалось загрузить файл {file_path}: {e}")
         return None
 
-    # Центрируем модель и настраиваем камеру
-    mesh.translate(-np.array(mesh.center), inplace=True)
-
     bounds = mesh.bounds
     y_min, y_max = bounds[2], bounds[3]
     height = y_max - y_min
@@ -46,29 +200,371 @@ def render_model_with_fill(
     filled_part = mesh.clip(normal=clip_normal, origin=clip_origin, invert=True)
     unfilled_part = mesh.clip(normal=clip_normal, origin=clip_origin, invert=False)
 
-    plotter = pv.Plotter(off_screen=True, window_size=window_size, image_scale=1)
-    plotter.background_color = (250, 250, 250, 255)  # Match background of composition
-
     rgb_color = fill_color[:3]
     opacity = fill_color[3] / 255.0 if len(fill_color) == 4 else 1.0
 
-    plotter.add_mesh(filled_part, color=rgb_color, opacity=opacity, style="surface")
-    plotter.add_mesh(unfilled_part, color="beige", style="surface")
+    with (pool or plotter_pool).acquire(window_size) as plotter:
+        # На 0% и 100% одна из частей пустая, а pyvista не рисует пустые сетки
+        if _point_count(filled_part):
+            plotter.add_mesh(
+                filled_part, color=rgb_color, opacity=opacity, style="surface"
+            )
+        if _point_count(unfilled_part):
+            plotter.add_mesh(unfilled_part, color="beige", style="surface")
 
-    plotter.camera_position = "xy"
-    plotter.camera.elevation = 15
-    plotter.camera.azimuth = 15
+        # Установка позиции "xy" полностью сбрасывает камеру переиспользуемого плоттера
+        plotter.camera_position = "xy"
+        plotter.camera.elevation = 15
+        plotter.camera.azimuth = 15
 
-    img_array = plotter.screenshot(
-        return_img=True, transparent_background=True, window_size=window_size
-    )  # Use transparent background
-    plotter.close()
+        img_array = plotter.screenshot(
+            return_img=True, transparent_background=True, window_size=window_size
+        )  # Use transparent background
 
     if img_array is not None:
         return Image.fromarray(img_array)
     return None
 
 
+class DepthBase:
+    """
+    Однократный рендер модели без заливки: цвет, затенение и мировая
+    координата Y для каждого пикселя.
+    """
+
+    def __init__(
+        self,
+        color: np.ndarray,
+        shade: np.ndarray,
+        y_world: np.ndarray,
+        y_min: float,
+        y_max: float,
+    ):
+        self.color = color
+        self.shade = shade
+        self.y_world = y_world
+        self.y_min = y_min
+        self.y_max = y_max
+        for array in (self.color, self.shade, self.y_world):
+            array.flags.writeable = False
+
+
+UNFILLED_COLOR = np.array((245, 245, 220), dtype=np.float32)  # "beige"
+
+
+def _pixel_world_y(plotter, window_size: Tuple[int, int]) -> np.ndarray:
+    """
+    Восстанавливает мировую координату Y каждого пикселя по буферу глубины.
+    Для пикселей фона возвращается NaN.
+    """
+    width, height = window_size
+    z_cam = plotter.get_image_depth(fill_value=np.nan)
+    camera = plotter.camera
+
+    rows, cols = np.mgrid[0:height, 0:width]
+    ndc_x = (cols + 0.5) / width * 2 - 1
+    ndc_y = 1 - (rows + 0.5) / height * 2
+
+    if camera.parallel_projection:
+        half_height = camera.parallel_scale
+        x_cam = ndc_x * half_height * width / height
+        y_cam = ndc_y * half_height
+    else:
+        tan_half = np.tan(np.radians(camera.view_angle) / 2)
+        x_cam = ndc_x * -z_cam * tan_half * width / height
+        y_cam = ndc_y * -z_cam * tan_half
+
+    points = np.stack([x_cam, y_cam, z_cam, np.ones_like(z_cam)], axis=-1)
+    view = pv.array_from_vtkmatrix(camera.GetViewTransformMatrix())
+    world = points @ np.linalg.inv(view).T
+    return world[..., 1].astype(np.float32)
+
+
+@lru_cache(maxsize=MATRYOSHKA_MODEL_CACHE_SIZE)
+def _load_depth_base(
+    path: str, mtime: float, window_size: Tuple[int, int]
+) -> Optional[DepthBase]:
+    mesh = model_cache.get(path)
+    y_min, y_max = mesh.bounds[2], mesh.bounds[3]
+    if y_max - y_min == 0:
+        print("Невозможно определить высоту модели для заливки.")
+        return None
+
+    with plotter_pool.acquire(window_size) as plotter:
+        plotter.add_mesh(mesh, color="beige", style="surface")
+        plotter.camera_position = "xy"
+        plotter.camera.elevation = 15
+        plotter.camera.azimuth = 15
+
+        color = plotter.screenshot(
+            return_img=True, transparent_background=True, window_size=window_size
+        )
+        y_world = _pixel_world_y(plotter, window_size)
+
+    if color is None:
+        return None
+
+    # Затенение — отношение отрендеренного цвета к исходному цвету модели
+    shade = (color[..., :3].astype(np.float32) / UNFILLED_COLOR).mean(
+        axis=-1, keepdims=True
+    )
+    y_world[color[..., 3] == 0] = np.nan
+    return DepthBase(color, shade, y_world, y_min, y_max)
+
+
+def get_depth_base(file_path: str, window_size: Tuple[int, int]) -> Optional[DepthBase]:
+    """Возвращает закэшированный рендер модели для быстрой заливки"""
+    path = os.path.abspath(file_path)
+    return _load_depth_base(path, os.path.getmtime(path), tuple(window_size))
+
+
+def render_model_with_fill_depth(
+    file_path: str,
+    percentage: float,
+    fill_color: Tuple[int, int, int, int],
+    window_size: Tuple[int, int] = (1024, 1024),
+) -> Optional[Image.Image]:
+    """
+    Быстрая заливка без отсечения 3D-модели.
+
+    Модель рендерится один раз (см. get_depth_base), а заливка для любого
+    процента получается порогом по Y-буферу: пиксели ниже уровня заливки
+    перекрашиваются с учетом затенения. Полупрозрачная заливка смешивается
+    как передняя стенка поверх освещенной задней стенки и фона — так же, как
+    это выглядит у рендера с отсечением.
+    """
+    if not 0 <= percentage <= 100:
+        print(f"Ошибка: Процент должен быть в диапазоне от 0 до 100. Меняю на 0/100: {percentage}")
+        percentage = max(0, min(percentage, 100))
+
+    try:
+        base = get_depth_base(file_path, window_size)
+    except Exception as e:
+        print(f"Не удалось загрузить файл {file_path}: {e}")
+        return None
+
+    if base is None:
+        return None
+
+    if percentage >= 100:
+        mask = np.isfinite(base.y_world)
+    else:
+        fill_height = base.y_min + (base.y_max - base.y_min) * percentage / 100.0
+        with np.errstate(invalid="ignore"):
+            mask = base.y_world < fill_height
+
+    opacity = fill_color[3] / 255.0 if len(fill_color) == 4 else 1.0
+    fill_rgb = np.asarray(fill_color[:3], dtype=np.float32)
+    background = 250.0
+
+    front = fill_rgb * base.shade[mask]
+    filled = (
+        opacity * front
+        + (1 - opacity) * opacity * fill_rgb
+        + (1 - opacity) ** 2 * background
+    )
+
+    result = base.color.copy()
+    result[mask, :3] = np.clip(filled, 0, 255).astype(np.uint8)
+    result[mask, 3] = round(255 * (1 - (1 - opacity) ** 2))
+    return Image.fromarray(result)
+
+
+class TemplateBase:
+    """Шаблон, вписанный в размер рендера, и маска силуэта матрешки"""
+
+    def __init__(self, rgb: np.ndarray, mask: np.ndarray, top: int, bottom: int):
+        self.rgb = rgb
+        self.mask = mask
+        self.top = top
+        self.bottom = bottom
+        for array in (self.rgb, self.mask):
+            array.flags.writeable = False
+
+
+def _template_mask(image: Image.Image) -> Image.Image:
+    """
+    Маска силуэта шаблона.
+
+    Если у PNG есть альфа-канал, используется он. Контурный рисунок без
+    прозрачности заливается от углов: все светлые пиксели, достижимые от края
+    изображения, считаются фоном, остальное — фигурой вместе с контуром.
+    """
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        alpha = image.convert("RGBA").getchannel("A")
+        if alpha.getextrema()[0] < 255:
+            return alpha.point(lambda v: 255 if v >= 128 else 0)
+
+    binary = image.convert("L").point(lambda v: 255 if v > 200 else 0)
+    width, height = binary.size
+    for corner in ((0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)):
+        if binary.getpixel(corner) == 255:
+            ImageDraw.floodfill(binary, corner, 128)
+    return binary.point(lambda v: 0 if v == 128 else 255)
+
+
+@lru_cache(maxsize=MATRYOSHKA_MODEL_CACHE_SIZE)
+def _load_template_base(
+    path: str, mtime: float, window_size: Tuple[int, int]
+) -> Optional[TemplateBase]:
+    with Image.open(path) as source:
+        source.load()
+        mask = _template_mask(source)
+        rgb = source.convert("RGB")
+
+    # Вписываем шаблон в кадр с сохранением пропорций, по центру
+    width, height = window_size
+    scale = min(width / rgb.width, height / rgb.height)
+    size = (max(1, round(rgb.width * scale)), max(1, round(rgb.height * scale)))
+    offset = ((width - size[0]) // 2, (height - size[1]) // 2)
+
+    canvas_rgb = Image.new("RGB", window_size, (250, 250, 250))
+    canvas_rgb.paste(rgb.resize(size, Image.LANCZOS), offset)
+    canvas_mask = Image.new("L", window_size, 0)
+    canvas_mask.paste(mask.resize(size, Image.BILINEAR), offset)
+
+    mask_array = np.asarray(canvas_mask) >= 128
+    rows = np.flatnonzero(mask_array.any(axis=1))
+    if rows.size == 0:
+        print(f"В шаблоне {path} не найден силуэт матрешки.")
+        return None
+
+    return TemplateBase(
+        np.asarray(canvas_rgb, dtype=np.float32),
+        mask_array,
+        int(rows[0]),
+        int(rows[-1]),
+    )
+
+
+def get_template_base(
+    file_path: str, window_size: Tuple[int, int]
+) -> Optional[TemplateBase]:
+    path = os.path.abspath(file_path)
+    return _load_template_base(path, os.path.getmtime(path), tuple(window_size))
+
+
+def render_template_with_fill(
+    file_path: str,
+    percentage: float,
+    fill_color: Tuple[int, int, int, int],
+    window_size: Tuple[int, int] = (1024, 1024),
+) -> Optional[Image.Image]:
+    """
+    Заливка 2D-шаблона матрешки средствами PIL/NumPy, без 3D-рендера.
+
+    Строки силуэта ниже уровня заливки окрашиваются цветом заливки,
+    умноженным на яркость шаблона, поэтому контуры рисунка остаются видны.
+    """
+    if not 0 <= percentage <= 100:
+        print(f"Ошибка: Процент должен быть в диапазоне от 0 до 100. Меняю на 0/100: {percentage}")
+        percentage = max(0, min(percentage, 100))
+
+    try:
+        base = get_template_base(file_path, window_size)
+    except Exception as e:
+        print(f"Не удалось загрузить шаблон {file_path}: {e}")
+        return None
+
+    if base is None:
+        return None
+
+    height = base.bottom - base.top + 1
+    fill_row = base.bottom + 1 - round(height * percentage / 100.0)
+    row_filled = np.arange(base.mask.shape[0]) >= fill_row
+    mask = base.mask & row_filled[:, None]
+
+    opacity = fill_color[3] / 255.0 if len(fill_color) == 4 else 1.0
+    fill_rgb = np.asarray(fill_color[:3], dtype=np.float32)
+
+    rgb = base.rgb.copy()
+    lightness = base.rgb[mask] / 255.0
+    rgb[mask] = opacity * fill_rgb * lightness + (1 - opacity) * base.rgb[mask]
+
+    result = np.zeros(base.mask.shape + (4,), dtype=np.uint8)
+    result[..., :3] = np.clip(rgb, 0, 255).astype(np.uint8)
+    result[..., 3] = np.where(base.mask, 255, 0)
+    return Image.fromarray(result)
+
+
+def get_renderer(name: str) -> Callable[..., Optional[Image.Image]]:
+    """
+    Возвращает функцию рендера по имени:
+    "depth" — быстрая заливка по буферу глубины, "mesh" — отсечение 3D-модели,
+    "template" — 2D-шаблон без GL. Без pyvista доступен только "template".
+    """
+    renderers = {
+        "depth": render_model_with_fill_depth,
+        "mesh": render_model_with_fill,
+        "template": render_template_with_fill,
+    }
+    if name not in renderers:
+        print(f"Неизвестный рендер матрешки '{name}', используется 'depth'")
+        name = "depth"
+    if pv is None and name != "template":
+        print("pyvista не установлен, используется рендер по 2D-шаблону")
+        name = "template"
+    return renderers[name]
+
+
+def choose_renderer(model_path: str, renderer: str = MATRYOSHKA_RENDERER) -> str:
+    """
+    Выбирает рендер для отчета: 3D-рендер невозможен без файла модели
+    или без pyvista, тогда используется 2D-шаблон.
+    """
+    if renderer != "template" and (pv is None or not os.path.exists(model_path)):
+        return "template"
+    return renderer
+
+
+sprite_table = SpriteTable(MATRYOSHKA_SPRITE_DIR)
+
+
+def precompute_sprites(
+    model_path: str,
+    fill_color: Tuple[int, int, int, int] = DEFAULT_FILL_COLOR,
+    render_size: Tuple[int, int] = DEFAULT_RENDER_SIZE,
+    force: bool = False,
+    renderer: str = MATRYOSHKA_RENDERER,
+) -> bool:
+    """
+    Рендерит все 101 уровень заливки модели и сохраняет их в таблицу спрайтов.
+    После этого построитель не обращается к 3D-рендеру для этой модели,
+    цвета, размера и способа рендера.
+    """
+    try:
+        return sprite_table.precompute(
+            get_renderer(renderer),
+            model_path,
+            fill_color,
+            render_size,
+            force=force,
+            variant=renderer,
+        )
+    except OSError as e:
+        print(f"Не удалось построить спрайты для {model_path}: {e}")
+        return False
+
+
+@lru_cache(maxsize=32)
+def get_font(path: str, size: int) -> ImageFont.ImageFont:
+    """
+    Шрифт по пути и размеру, загруженный один раз на процесс.
+    Если файл шрифта недоступен, используется встроенный шрифт PIL.
+    """
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        print(f"Шрифт {path} не найден, используется шрифт по умолчанию")
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1024)
+def get_text_bbox(path: str, size: int, text: str) -> Tuple[int, int, int, int]:
+    """Размеры текста относительно точки вывода (как у ImageDraw.textbbox)"""
+    return tuple(int(v) for v in get_font(path, size).getbbox(text))
+
+
 class MatryoshkaFillBuilder:
     """
     Построитель (Builder) для создания изображений с заливкой 3D-модели.
@@ -80,9 +576,10 @@ class MatryoshkaFillBuilder:
         self.result: Optional[Image.Image] = None
         self.config = {
             "fill_percent": 40,
-            "fill_color": (70, 130, 180, 200),
+            "fill_color": DEFAULT_FILL_COLOR,
             "show_percent": True,
             "font_size": 50,
+            "font_path": MATRYOSHKA_FONT_PATH,
             "show_info": False,
             "title": "Название",
             "daily_amount": "0",
@@ -92,7 +589,10 @@ class MatryoshkaFillBuilder:
             "info_text_color": (0, 0, 0, 255),
             "info_font_size": 36,
             "info_x_offset": 50,
-            "render_size": (1000, 1000),
+            "render_size": DEFAULT_RENDER_SIZE,
+            "renderer": MATRYOSHKA_RENDERER,
+            "template_path": MATRYOSHKA_TEMPLATE_PATH,
+            "use_sprites": True,
         }
 
     def configure(self, **kwargs):
@@ -101,9 +601,25 @@ class MatryoshkaFillBuilder:
         return self
 
     def render_model(self):
-        """Рендеринг 3D-модели"""
-        self.result = render_model_with_fill(
-            self.model_path,
+        """Рендеринг 3D-модели (или готовый спрайт, если таблица уже построена)"""
+        renderer = self.config.get("renderer", MATRYOSHKA_RENDERER)
+        source_path = (
+            self.config["template_path"] if renderer == "template" else self.model_path
+        )
+
+        if self.config.get("use_sprites", True):
+            self.result = sprite_table.get(
+                source_path,
+                self.config["fill_percent"],
+                self.config["fill_color"],
+                self.config["render_size"],
+                variant=renderer,
+            )
+            if self.result is not None:
+                return self
+
+        self.result = get_renderer(renderer)(
+            source_path,
             self.config["fill_percent"],
             self.config["fill_color"],
             self.config["render_size"],
@@ -115,37 +631,30 @@ class MatryoshkaFillBuilder:
         if not self.config["show_percent"] or self.result is None:
             return self
 
-        draw = ImageDraw.Draw(self.result)
         percent_text = f"{round(self.config['fill_percent'])}%"
-
-        try:
-            font = ImageFont.truetype("resources/arialmt.ttf", self.config["font_size"])
-        except IOError:
-            font = ImageFont.load_default()
+        font_path = self.config["font_path"]
+        font_size = self.config["font_size"]
+        font = get_font(font_path, font_size)
 
         text_x, text_y = 20, 20
         text_color = self.config["fill_color"][:3] + (255,)
         padding = 5
 
-        text_bbox = draw.textbbox((text_x, text_y), percent_text, font=font)
-        bg_bbox = (
-            text_bbox[0] - padding,
-            text_bbox[1] - padding,
-            text_bbox[2] + padding,
-            text_bbox[3] + padding,
+        left, top, right, bottom = get_text_bbox(font_path, font_size, percent_text)
+        bg_x = max(0, text_x + left - padding)
+        bg_y = max(0, text_y + top - padding)
+        bg_size = (
+            text_x + right + padding - bg_x + 1,
+            text_y + bottom + padding - bg_y + 1,
         )
 
-        # Create a temporary layer for the text background
-        bg_layer = Image.new("RGBA", self.result.size, (255, 255, 255, 0))
-        bg_draw = ImageDraw.Draw(bg_layer)
-        bg_draw.rectangle(bg_bbox, fill=(250, 250, 250, 180))
-
-        # Composite the background layer with the result
-        self.result = Image.alpha_composite(self.result, bg_layer)
+        # Полупрозрачная подложка смешивается только в области текста
+        self.result.alpha_composite(
+            Image.new("RGBA", bg_size, (250, 250, 250, 180)), dest=(bg_x, bg_y)
+        )
 
-        # Draw the text on top of the composited image
-        final_draw = ImageDraw.Draw(self.result)
-        final_draw.text((text_x, text_y), percent_text, font=font, fill=text_color)
+        draw = ImageDraw.Draw(self.result)
+        draw.text((text_x, text_y), percent_text, font=font, fill=text_color)
 
         return self
 
@@ -168,16 +677,9 @@ class MatryoshkaFillBuilder:
 
         draw = ImageDraw.Draw(self.result)
 
-        try:
-            title_font = ImageFont.truetype(
-                "resources/arialmt.ttf", self.config["info_font_size"] + 4
-            )
-            normal_font = ImageFont.truetype("resources/arialmt.ttf", self.config["info_font_size"])
-            bold_font = ImageFont.truetype(
-                "resources/arialmt.ttf", self.config["info_font_size"]
-            )
-        except IOError:
-            title_font = normal_font = bold_font = ImageFont.load_default()
+        font_path = self.config["font_path"]
+        title_font = get_font(font_path, self.config["info_font_size"] + 4)
+        normal_font = bold_font = get_font(font_path, self.config["info_font_size"])
 
         text_x = original_width + self.config["info_x_offset"]
         text_y = 50
@@ -200,11 +702,16 @@ class MatryoshkaFillBuilder:
 
         return self
 
-    def build(self, output_path: Optional[str] = None) -> io.BytesIO:
-        """Финальная сборка и возврат результата"""
+    def build_image(self) -> Optional[Image.Image]:
+        """
+        Финальная сборка без кодирования.
+
+        Returns:
+            Optional[Image.Image]: RGBA-изображение или None, если рендер не удался
+        """
         self.render_model()
         if self.result is None:
-            return io.BytesIO()
+            return None
 
         if self.config.get("show_info", False):
             self.add_info_text()
@@ -213,13 +720,31 @@ class MatryoshkaFillBuilder:
         if self.config.get("show_percent", True):
             self.add_percentage_text()
 
+        return self.result
+
+    def build(
+        self,
+        output_path: Optional[str] = None,
+        encoding: Optional[EncodingProfile] = None,
+    ) -> io.BytesIO:
+        """
+        Финальная сборка и возврат результата.
+
+        Args:
+            output_path: Путь для сохранения изображения (необязательно)
+            encoding: Профиль кодирования, по умолчанию PNG без потерь
+
+        Returns:
+            io.BytesIO: Буфер с закодированным изображением
+        """
+        image = self.build_image()
+        if image is None:
+            return io.BytesIO()
+
         if output_path:
-            self.result.save(output_path)
+            image.save(output_path)
 
-        img_buffer = io.BytesIO()
-        self.result.save(img_buffer, format="PNG")
-        img_buffer.seek(0)
-        return img_buffer
+        return (encoding or LOSSLESS_PNG).encode(image)
 
 
 class LayoutStrategy(Enum):
@@ -237,7 +762,7 @@ class MatryoshkaData:
         day: str = "01",
         total_amount: str = "0",
         plan_amount: str = "0",
-        fill_color: Tuple[int, int, int, int] = (70, 130, 180, 200),
+        fill_color: Tuple[int, int, int, int] = DEFAULT_FILL_COLOR,
     ):
         self.fill_percent = fill_percent
         self.title = title
@@ -248,6 +773,181 @@ class MatryoshkaData:
         self.fill_color = fill_color
 
 
+_render_executor: Optional[ProcessPoolExecutor] = None
+_render_executor_workers = 0
+_render_executor_lock = threading.Lock()
+
+
+def get_render_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Возвращает общий для процесса пул рабочих процессов рендеринга.
+
+    Пул создается лениво и переиспользуется между отчетами, чтобы в каждом
+    рабочем процессе оставались «теплыми» кэш моделей и пул плоттеров.
+    Используется spawn: форк процесса с уже поднятым GL-контекстом VTK небезопасен.
+    """
+    global _render_executor, _render_executor_workers
+    with _render_executor_lock:
+        if _render_executor is None or _render_executor_workers != workers:
+            if _render_executor is not None:
+                _render_executor.shutdown(wait=False)
+            _render_executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _render_executor_workers = workers
+        return _render_executor
+
+
+@atexit.register
+def shutdown_render_executor() -> None:
+    global _render_executor, _render_executor_workers
+    with _render_executor_lock:
+        if _render_executor is not None:
+            _render_executor.shutdown(wait=True)
+        _render_executor = None
+        _render_executor_workers = 0
+
+
+def _render_store_image(
+    template_path: str, config: Dict[str, Any]
+) -> Optional[Image.Image]:
+    """Рендер одной матрешки с подписями (выполняется и в рабочих процессах)"""
+    return MatryoshkaFillBuilder(template_path).configure(**config).build_image()
+
+
+# Плитки магазинов из рабочих процессов: PNG без потерь с быстрым сжатием,
+# чтобы в родительский процесс не передавались несжатые RGBA-изображения
+TILE_ENCODING = EncodingProfile("PNG", compress_level=1, flatten=False)
+
+
+def _render_store_tile(template_path: str, config: Dict[str, Any]) -> Optional[bytes]:
+    """Рендер одной матрешки в рабочем процессе; возвращает закодированную плитку"""
+    image = _render_store_image(template_path, config)
+    if image is None:
+        return None
+    return TILE_ENCODING.encode(image).getvalue()
+
+
+def _decode_tile(tile: Optional[bytes]) -> Optional[Image.Image]:
+    if not tile:
+        return None
+    image = Image.open(io.BytesIO(tile))
+    image.load()
+    return image
+
+
+def _compose_images(
+    images: List[Optional[Image.Image]],
+    is_vertical: bool,
+    padding: int,
+    encoding: EncodingProfile = LOSSLESS_PNG,
+) -> bytes:
+    """
+    Склеивает изображения магазинов одной группы в композицию.
+    Кодирование выполняется один раз — для итоговой композиции.
+    """
+    images = [image for image in images if image is not None]
+    if not images:
+        return b""
+
+    widths, heights = zip(*(i.size for i in images))
+    if is_vertical:
+        total_width = max(widths)
+        total_height = sum(heights) + padding * (len(images) - 1)
+    else:
+        total_width = sum(widths) + padding * (len(images) - 1)
+        total_height = max(heights)
+
+    comp = Image.new("RGBA", (total_width, total_height), (250, 250, 250, 255))
+    current_pos = 0
+    for img in images:
+        if is_vertical:
+            comp.paste(img, (0, current_pos))
+            current_pos += img.height + padding
+        else:
+            comp.paste(img, (current_pos, 0))
+            current_pos += img.width + padding
+
+    return encoding.encode(comp).getvalue()
+
+
+def _compose_grid(
+    images: List[Optional[Image.Image]],
+    columns: int,
+    padding: int,
+    max_size: Tuple[int, int],
+    encoding: EncodingProfile = LOSSLESS_PNG,
+) -> bytes:
+    """
+    Раскладывает изображения магазинов по сетке rows×cols на одном холсте.
+
+    Холст выделяется один раз; если сетка не помещается в max_size,
+    ячейки пропорционально уменьшаются.
+    """
+    images = [image for image in images if image is not None]
+    if not images:
+        return b""
+
+    if columns <= 0:
+        columns = math.ceil(math.sqrt(len(images)))
+    columns = min(columns, len(images))
+    rows = math.ceil(len(images) / columns)
+
+    cell_width = max(image.width for image in images)
+    cell_height = max(image.height for image in images)
+    full_width = cell_width * columns + padding * (columns - 1)
+    full_height = cell_height * rows + padding * (rows - 1)
+
+    max_width, max_height = max_size
+    scale = 1.0
+    if max_width and full_width > max_width:
+        scale = min(scale, (max_width - padding * (columns - 1)) / (cell_width * columns))
+    if max_height and full_height > max_height:
+        scale = min(scale, (max_height - padding * (rows - 1)) / (cell_height * rows))
+
+    cell_width = max(1, int(cell_width * scale))
+    cell_height = max(1, int(cell_height * scale))
+    comp = Image.new(
+        "RGBA",
+        (
+            cell_width * columns + padding * (columns - 1),
+            cell_height * rows + padding * (rows - 1),
+        ),
+        (250, 250, 250, 255),
+    )
+
+    for index, image in enumerate(images):
+        if scale < 1.0:
+            size = (
+                max(1, int(image.width * scale)),
+                max(1, int(image.height * scale)),
+            )
+            image = image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+        row, col = divmod(index, columns)
+        comp.paste(
+            image,
+            (col * (cell_width + padding), row * (cell_height + padding)),
+        )
+
+    return encoding.encode(comp).getvalue()
+
+
+def _compose_group(
+    images: List[Optional[Image.Image]],
+    layout: "LayoutStrategy",
+    padding: int,
+    grid_columns: int,
+    grid_max_size: Tuple[int, int],
+    encoding: EncodingProfile = LOSSLESS_PNG,
+) -> bytes:
+    """Собирает и кодирует композицию группы по стратегии раскладки"""
+    if layout == LayoutStrategy.GRID:
+        return _compose_grid(images, grid_columns, padding, grid_max_size, encoding)
+    return _compose_images(
+        images, layout == LayoutStrategy.VERTICAL, padding, encoding
+    )
+
+
 class MatryoshkaCompositionBuilder:
     def __init__(self, template_model_path: str):
         self.template_path = template_model_path
@@ -255,12 +955,16 @@ class MatryoshkaCompositionBuilder:
         self.layout_strategy = LayoutStrategy.VERTICAL
         self.max_per_image = 2
         self.padding = 10
+        self.workers = 1
+        self.encoding = report_encoding
+        self.grid_columns = MATRYOSHKA_GRID_COLUMNS
+        self.grid_max_size = (MATRYOSHKA_GRID_MAX_WIDTH, MATRYOSHKA_GRID_MAX_HEIGHT)
         self.global_config = {
             "show_percent": True,
             "font_size": 50,
             "info_font_size": 40,
             "info_x_offset": 50,
-            "render_size": (1000, 1000),
+            "render_size": DEFAULT_RENDER_SIZE,
         }
 
     def add_matryoshka(self, data: MatryoshkaData) -> "MatryoshkaCompositionBuilder":
@@ -275,6 +979,35 @@ class MatryoshkaCompositionBuilder:
         self.max_per_image = count
         return self
 
+    def set_grid(
+        self,
+        columns: Optional[int] = None,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+    ) -> "MatryoshkaCompositionBuilder":
+        """
+        Параметры сетки: число столбцов (0 — автоматически)
+        и предельный размер холста в пикселях (0 — без ограничения).
+        """
+        if columns is not None:
+            self.grid_columns = columns
+        width, height = self.grid_max_size
+        self.grid_max_size = (
+            width if max_width is None else max_width,
+            height if max_height is None else max_height,
+        )
+        return self
+
+    def set_workers(self, workers: int) -> "MatryoshkaCompositionBuilder":
+        """Число рабочих процессов рендеринга; 1 — рендер в текущем процессе"""
+        self.workers = max(1, workers)
+        return self
+
+    def set_encoding(self, encoding: EncodingProfile) -> "MatryoshkaCompositionBuilder":
+        """Профиль кодирования итоговых композиций"""
+        self.encoding = encoding
+        return self
+
     def configure(self, **kwargs) -> "MatryoshkaCompositionBuilder":
         self.global_config.update(kwargs)
         return self
@@ -288,87 +1021,80 @@ class MatryoshkaCompositionBuilder:
             for i in range(0, len(self.matryoshkas), self.max_per_image)
         ]
 
-        result_buffers = []
-        layout_map = {
-            LayoutStrategy.VERTICAL: self._create_vertical_layout,
-            LayoutStrategy.HORIZONTAL: self._create_horizontal_layout,
-            LayoutStrategy.GRID: self._create_grid_layout,
-        }
-        layout_func = layout_map.get(self.layout_strategy, self._create_vertical_layout)
+        buffers = None
+        if self.workers > 1 and len(self.matryoshkas) > 1:
+            try:
+                buffers = self._build_parallel(groups)
+            except Exception as e:
+                print(f"Параллельный рендер не удался, рендерим последовательно: {e}")
+
+        if buffers is None:
+            buffers = [self._build_group(group) for group in groups]
 
-        for idx, group in enumerate(groups):
-            buffer = layout_func(group)
+        result_buffers = []
+        for idx, buffer in enumerate(buffers):
             if buffer.getbuffer().nbytes > 0:
                 result_buffers.append(buffer)
                 if output_dir:
                     if not os.path.exists(output_dir):
                         os.makedirs(output_dir)
-                    file_path = os.path.join(output_dir, f"composition_{idx + 1}.png")
+                    file_path = os.path.join(output_dir, f"composition_{idx + 1}.{self.encoding.extension}")
                     with open(file_path, "wb") as f:
                         f.write(buffer.getvalue())
         return result_buffers
 
-    def _create_layout(
-        self, matryoshkas: List[MatryoshkaData], is_vertical: bool
-    ) -> io.BytesIO:
-        images = []
-        for data in matryoshkas:
-            builder = MatryoshkaFillBuilder(self.template_path)
-            config = self.global_config.copy()
-            config.update(
-                {
-                    "fill_percent": data.fill_percent,
-                    "title": data.title,
-                    "daily_amount": data.daily_amount,
-                    "day": data.day,
-                    "total_amount": data.total_amount,
-                    "plan_amount": data.plan_amount,
-                    "fill_color": data.fill_color,
-                    "show_info": True,
-                }
-            )
-            img_buffer = builder.configure(**config).build()
-            if img_buffer.getbuffer().nbytes > 0:
-                images.append(Image.open(img_buffer))
-
-        if not images:
-            return io.BytesIO()
+    def _build_parallel(self, groups: List[List[MatryoshkaData]]) -> List[io.BytesIO]:
+        """
+        Рендерит магазины в пуле процессов — одна задача на магазин, —
+        а композиции собирает в текущем процессе из закодированных плиток.
+        executor.map сохраняет порядок, поэтому результат совпадает с
+        последовательной сборкой.
+        """
+        executor = get_render_executor(self.workers)
+
+        configs = [self._store_config(data) for data in self.matryoshkas]
+        tiles = iter(
+            executor.map(_render_store_tile, repeat(self.template_path), configs)
+        )
 
-        widths, heights = zip(*(i.size for i in images))
-        if is_vertical:
-            total_width = max(widths)
-            total_height = sum(heights) + self.padding * (len(images) - 1)
-        else:
-            total_width = sum(widths) + self.padding * (len(images) - 1)
-            total_height = max(heights)
-
-        comp = Image.new("RGBA", (total_width, total_height), (250, 250, 250, 255))
-        current_pos = 0
-        for img in images:
-            if is_vertical:
-                comp.paste(img, (0, current_pos))
-                current_pos += img.height + self.padding
-            else:
-                comp.paste(img, (current_pos, 0))
-                current_pos += img.width + self.padding
-
-        buf = io.BytesIO()
-        comp.save(buf, format="PNG")
-        buf.seek(0)
-        return buf
-
-    def _create_vertical_layout(self, matryoshkas: List[MatryoshkaData]) -> io.BytesIO:
-        return self._create_layout(matryoshkas, is_vertical=True)
-
-    def _create_horizontal_layout(
-        self, matryoshkas: List[MatryoshkaData]
-    ) -> io.BytesIO:
-        return self._create_layout(matryoshkas, is_vertical=False)
+        buffers = []
+        for group in groups:
+            images = [_decode_tile(next(tiles)) for _ in group]
+            buffers.append(io.BytesIO(self._compose(images)))
+        return buffers
+
+    def _store_config(self, data: MatryoshkaData) -> Dict[str, Any]:
+        config = self.global_config.copy()
+        config.update(
+            {
+                "fill_percent": data.fill_percent,
+                "title": data.title,
+                "daily_amount": data.daily_amount,
+                "day": data.day,
+                "total_amount": data.total_amount,
+                "plan_amount": data.plan_amount,
+                "fill_color": data.fill_color,
+                "show_info": True,
+            }
+        )
+        return config
+
+    def _compose(self, images: List[Optional[Image.Image]]) -> bytes:
+        return _compose_group(
+            images,
+            self.layout_strategy,
+            self.padding,
+            self.grid_columns,
+            self.grid_max_size,
+            self.encoding,
+        )
 
-    def _create_grid_layout(self, matryoshkas: List[MatryoshkaData]) -> io.BytesIO:
-        # Placeholder for grid layout implementation
-        print("Grid layout is not yet implemented.")
-        return self._create_vertical_layout(matryoshkas)
+    def _build_group(self, matryoshkas: List[MatryoshkaData]) -> io.BytesIO:
+        images = [
+            _render_store_image(self.template_path, self._store_config(data))
+            for data in matryoshkas
+        ]
+        return io.BytesIO(self._compose(images))
 
 
 def create_matryoshka_collection(
@@ -377,6 +1103,9 @@ def create_matryoshka_collection(
     layout: str = "vertical",
     max_per_image: int = 2,
     output_dir: str = "",
+    workers: Optional[int] = None,
+    renderer: Optional[str] = None,
+    encoding: Optional[EncodingProfile] = None,
 ) -> List[io.BytesIO]:
     strategy_map = {
         "vertical": LayoutStrategy.VERTICAL,
@@ -388,11 +1117,18 @@ def create_matryoshka_collection(
     matryoshkas_data = [MatryoshkaData(**shop) for shop in shops_data]
 
     builder = MatryoshkaCompositionBuilder(template_path)
+    if renderer:
+        builder.configure(renderer=renderer)
+    if encoding:
+        builder.set_encoding(encoding)
     for data in matryoshkas_data:
         builder.add_matryoshka(data)
 
     buffers = (
-        builder.set_layout(strategy).set_max_per_image(max_per_image).build(output_dir)
+        builder.set_layout(strategy)
+        .set_max_per_image(max_per_image)
+        .set_workers(workers or MATRYOSHKA_RENDER_WORKERS)
+        .build(output_dir)
     )
     return buffers
 
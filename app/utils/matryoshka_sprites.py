@@ -0,0 +1,217 @@
+"""
+Таблица заранее отрендеренных уровней заливки матрешки (спрайтов).
+
+Процент заливки — целое число от 0 до 100, а цвет заливки фиксирован, поэтому
+для одной модели и одного размера рендера существует всего 101 различное
+изображение. Таблица хранит их в PNG внутри zip-архива на диске и в памяти,
+так что построителю остается только наложить текст на готовую основу.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+import zipfile
+from typing import Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+FILL_LEVELS = range(0, 101)
+
+_hash_cache: Dict[Tuple[str, float, int], str] = {}
+
+
+def get_model_hash(model_path: str) -> str:
+    """
+    Возвращает хеш содержимого файла модели.
+
+    Хеш кэшируется по (путь, mtime, размер), чтобы не перечитывать файл
+    при каждом обращении к таблице.
+    """
+    path = os.path.abspath(model_path)
+    stat = os.stat(path)
+    cache_key = (path, stat.st_mtime, stat.st_size)
+    if cache_key not in _hash_cache:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        _hash_cache[cache_key] = digest.hexdigest()[:16]
+    return _hash_cache[cache_key]
+
+
+class SpriteTable:
+    """
+    Набор спрайтов уровней заливки, ключ — (хеш модели, цвет, размер рендера).
+
+    В памяти спрайты хранятся в виде PNG-байтов: это на порядок компактнее
+    декодированных RGBA-массивов, а декодирование много дешевле 3D-рендера.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self._sets: Dict[str, Dict[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def make_key(
+        self,
+        model_path: str,
+        fill_color: Tuple[int, ...],
+        render_size: Tuple[int, int],
+        variant: str = "",
+    ) -> str:
+        color = "-".join(str(c) for c in fill_color)
+        width, height = render_size
+        key = f"{get_model_hash(model_path)}_{color}_{width}x{height}"
+        return f"{key}_{variant}" if variant else key
+
+    def _archive_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.zip")
+
+    def _load_set(self, key: str) -> Optional[Dict[int, bytes]]:
+        with self._lock:
+            if key in self._sets:
+                return self._sets[key]
+
+        archive_path = self._archive_path(key)
+        if not archive_path or not os.path.exists(archive_path):
+            return None
+
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                sprites = {
+                    int(name.split(".")[0]): archive.read(name)
+                    for name in archive.namelist()
+                }
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            logger.warning(f"Не удалось прочитать набор спрайтов {archive_path}: {e}")
+            return None
+
+        if len(sprites) != len(FILL_LEVELS):
+            logger.warning(f"Неполный набор спрайтов {archive_path}, пропускаем")
+            return None
+
+        with self._lock:
+            self._sets[key] = sprites
+        return sprites
+
+    def has(
+        self,
+        model_path: str,
+        fill_color: Tuple[int, ...],
+        render_size: Tuple[int, int],
+        variant: str = "",
+    ) -> bool:
+        try:
+            key = self.make_key(model_path, fill_color, render_size, variant)
+        except OSError:
+            return False
+        return self._load_set(key) is not None
+
+    def get(
+        self,
+        model_path: str,
+        fill_percent: float,
+        fill_color: Tuple[int, ...],
+        render_size: Tuple[int, int],
+        variant: str = "",
+    ) -> Optional[Image.Image]:
+        """
+        Возвращает новое RGBA-изображение для уровня заливки или None,
+        если набор для этой модели, цвета, размера и варианта рендера еще не построен.
+        """
+        try:
+            key = self.make_key(model_path, fill_color, render_size, variant)
+        except OSError:
+            return None
+
+        sprites = self._load_set(key)
+        if sprites is None:
+            return None
+
+        level = int(round(max(0, min(fill_percent, 100))))
+        image = Image.open(io.BytesIO(sprites[level]))
+        return image.convert("RGBA")
+
+    def precompute(
+        self,
+        render: Callable[..., Optional[Image.Image]],
+        model_path: str,
+        fill_color: Tuple[int, ...],
+        render_size: Tuple[int, int],
+        force: bool = False,
+        variant: str = "",
+    ) -> bool:
+        """
+        Рендерит все уровни заливки функцией render(model_path, percent, color, size)
+        и сохраняет набор в память и на диск.
+
+        Returns:
+            bool: True если набор доступен после вызова
+        """
+        key = self.make_key(model_path, fill_color, render_size, variant)
+        if not force and self._load_set(key) is not None:
+            return True
+
+        sprites = {}
+        for level in FILL_LEVELS:
+            image = render(model_path, level, fill_color, render_size)
+            if image is None:
+                logger.error(f"Не удалось отрендерить уровень {level}% для {model_path}")
+                return False
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            sprites[level] = buffer.getvalue()
+
+        with self._lock:
+            self._sets[key] = sprites
+
+        archive_path = self._archive_path(key)
+        if archive_path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{archive_path}.tmp"
+                with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as archive:
+                    for level, data in sprites.items():
+                        archive.writestr(f"{level:03d}.png", data)
+                os.replace(tmp_path, archive_path)
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить набор спрайтов {archive_path}: {e}")
+
+        logger.info(f"Построен набор спрайтов {key}")
+        return True
+
+    def clear(self) -> None:
+        """Очищает наборы в памяти (файлы на диске не удаляются)"""
+        with self._lock:
+            self._sets.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.utils.matryoshka import DEFAULT_FILL_COLOR, precompute_sprites
+
+    parser = argparse.ArgumentParser(
+        description="Предварительный рендер всех уровней заливки матрешки"
+    )
+    parser.add_argument("--model", default="resources/bear3.glb")
+    parser.add_argument("--size", type=int, nargs=2, default=(1000, 1000))
+    parser.add_argument(
+        "--color", type=int, nargs=4, default=DEFAULT_FILL_COLOR, help="RGBA"
+    )
+    parser.add_argument("--renderer", choices=("depth", "mesh", "template"), default=None)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    options = {"renderer": args.renderer} if args.renderer else {}
+    ok = precompute_sprites(
+        args.model, tuple(args.color), tuple(args.size), force=args.force, **options
+    )
+    print("Готово" if ok else "Не удалось построить набор спрайтов")
@@ -5,7 +5,8 @@ ADMIN_MENU_TEXT = """
 📊 <b>Меню администратора</b>
 
 Доступные команды:
-/report - Выгрузить отчет в Excel с показателями выполнения плана
+/report [период] - Выгрузить отчет в Excel с показателями выполнения плана (по умолчанию за текущий месяц)
+/export csv|parquet [период] - Выгрузить выручку по дням для BI-инструментов
 /setplan - Установить план для магазина
 /assign - Привязать менеджера к магазину
 /addstore - Добавить новый магазин
@@ -0,0 +1,129 @@
+"""
+Ограничение частоты запросов к Bot API.
+
+Telegram допускает около 30 сообщений в секунду от бота в целом
+и около одного сообщения в секунду в один чат. Превышение приводит
+к ошибке 429 (TelegramRetryAfter) и временной блокировке рассылки.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Асинхронное «ведро токенов»: rate токенов в секунду, не больше capacity подряд.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = max(1.0, capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated: Optional[float] = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        """Приостанавливает выдачу токенов (после ответа 429 от Telegram)"""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        tokens = min(tokens, self.capacity)
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class TelegramRateLimiter:
+    """
+    Общий лимит бота плюс отдельный лимит на каждый чат.
+
+    Args:
+        rate: Сообщений в секунду для бота в целом
+        chat_rate: Сообщений в секунду в один чат
+        chat_burst: Сколько сообщений можно отправить в чат подряд без ожидания
+        max_retries: Сколько раз повторять запрос после TelegramRetryAfter
+    """
+
+    def __init__(
+        self,
+        rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 3,
+    ):
+        self.global_bucket = TokenBucket(rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def acquire(self, chat_id: int, messages: int = 1) -> None:
+        # Сначала ждем свою очередь в чате, чтобы не занимать общий лимит зря
+        await self._chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire(messages)
+
+    async def call(
+        self,
+        chat_id: int,
+        request: Callable[[], Awaitable[T]],
+        messages: int = 1,
+    ) -> T:
+        """
+        Выполняет запрос к Bot API с учетом лимитов.
+
+        Args:
+            chat_id: Чат, в который отправляется сообщение
+            request: Фабрика корутины запроса (вызывается на каждую попытку)
+            messages: Сколько сообщений создает запрос (для альбома — число фото)
+
+        Returns:
+            Результат запроса
+        """
+        attempt = 0
+        while True:
+            await self.acquire(chat_id, messages)
+            try:
+                return await request()
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(
+                    f"Telegram просит подождать {e .retry_after } с (chat_id: {chat_id }), "
+                    f"попытка {attempt } из {self .max_retries }"
+                )
+                self.global_bucket.pause(e.retry_after)
+                self._chat_bucket(chat_id).pause(e.retry_after)
@@ -0,0 +1,322 @@
+"""
+Доставка файлов отчета в Telegram.
+
+Изображения матрешек отправляются альбомами (media group) до 10 фотографий,
+поэтому на каждого получателя приходится в разы меньше запросов к Bot API.
+Каждый файл загружается на серверы Telegram один раз: после первой отправки
+запоминается его file_id, и остальным получателям уходит только идентификатор.
+Рассылка идет параллельно для нескольких получателей в пределах лимитов Bot API.
+"""
+
+import asyncio
+import logging
+from typing import (
+    IO,
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from aiogram import Bot, types
+from aiogram.types import BufferedInputFile, InputFile, InputMediaPhoto
+
+from app.core.config import REPORT_SEND_CONCURRENCY
+from app.utils.rate_limit import TelegramRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Ограничение Telegram на число элементов в одном альбоме
+MEDIA_GROUP_LIMIT = 10
+
+
+class SpooledInputFile(InputFile):
+    """
+    Файл для загрузки в Telegram из файлового объекта (например,
+    SpooledTemporaryFile) без чтения его целиком в память.
+
+    Каждая загрузка читает файл с начала, поэтому объект можно отправлять
+    повторно. Закрывает файл вызывающий код.
+    """
+
+    def __init__(self, file: IO[bytes], filename: str, **kwargs: Any):
+        super().__init__(filename=filename, **kwargs)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+class ReportArtifact:
+    """
+    Файл отчета с подписью.
+
+    После первой успешной отправки хранит file_id, выданный Telegram,
+    и дальше отправляется по нему без повторной загрузки содержимого.
+    """
+
+    def __init__(self, data: bytes, filename: str, caption: str):
+        self.data = data
+        self.filename = filename
+        self.caption = caption
+        self.file_id: Optional[str] = None
+
+    def input_file(self) -> Union[str, BufferedInputFile]:
+        if self.file_id:
+            return self.file_id
+        return BufferedInputFile(self.data, filename=self.filename)
+
+    def remember(self, file_id: Any) -> None:
+        if isinstance(file_id, str) and file_id:
+            self.file_id = file_id
+
+
+class ReportPhoto(ReportArtifact):
+    """Изображение отчета"""
+
+    def capture(self, sent: Any) -> None:
+        photo_sizes = getattr(sent, "photo", None)
+        if isinstance(photo_sizes, list) and photo_sizes:
+            self.remember(getattr(photo_sizes[-1], "file_id", None))
+
+
+class ReportDocument(ReportArtifact):
+    """Документ отчета (Excel)"""
+
+    def capture(self, sent: Any) -> None:
+        self.remember(getattr(getattr(sent, "document", None), "file_id", None))
+
+
+def build_report_photos(
+    buffers: Sequence[Any],
+    shops_data: List[Dict[str, Any]],
+    stores_per_image: int,
+    extension: str,
+) -> List[ReportPhoto]:
+    """
+    Собирает изображения отчета с подписями из списка магазинов.
+
+    Args:
+        buffers: Буферы изображений композиций в порядке магазинов
+        shops_data: Данные магазинов в том же порядке, что и при рендере
+        stores_per_image: Число магазинов на одном изображении
+        extension: Расширение файла изображения
+
+    Returns:
+        List[ReportPhoto]: Изображения с подписями
+    """
+    photos = []
+    for i, buf in enumerate(buffers, 1):
+        stores_in_image = shops_data[(i - 1) * stores_per_image : i * stores_per_image]
+        stores_names = ", ".join([s["title"] for s in stores_in_image])
+        photos.append(
+            ReportPhoto(
+                buf.getvalue(),
+                f"report_matryoshka_{i }.{extension }",
+                f"📊 Выполнение плана: {stores_names }",
+            )
+        )
+    return photos
+
+
+def build_chart_photos(charts: Dict[str, bytes]) -> List[ReportPhoto]:
+    """
+    Изображения графиков выручки с подписями.
+
+    Args:
+        charts: Название магазина (или сводного графика) -> изображение PNG
+
+    Returns:
+        List[ReportPhoto]: Изображения в порядке словаря
+    """
+    return [
+        ReportPhoto(image, f"report_chart_{i }.png", f"📈 Динамика выручки: {name }")
+        for i, (name, image) in enumerate(charts.items(), 1)
+    ]
+
+
+def split_albums(photos: List[ReportPhoto]) -> List[List[ReportPhoto]]:
+    return [
+        photos[i : i + MEDIA_GROUP_LIMIT]
+        for i in range(0, len(photos), MEDIA_GROUP_LIMIT)
+    ]
+
+
+def _album_media(album: List[ReportPhoto]) -> List[InputMediaPhoto]:
+    return [
+        InputMediaPhoto(media=photo.input_file(), caption=photo.caption)
+        for photo in album
+    ]
+
+
+def _capture_album(album: List[ReportPhoto], sent: Any) -> None:
+    if isinstance(sent, list):
+        for photo, message in zip(album, sent):
+            photo.capture(message)
+
+
+async def _request(
+    limiter: Optional[TelegramRateLimiter],
+    chat_id: int,
+    request: Callable[[], Awaitable[Any]],
+    messages: int = 1,
+) -> Any:
+    if limiter is None:
+        return await request()
+    return await limiter.call(chat_id, request, messages)
+
+
+async def send_report_photos(
+    bot: Bot,
+    chat_id: int,
+    photos: List[ReportPhoto],
+    limiter: Optional[TelegramRateLimiter] = None,
+) -> None:
+    """
+    Отправляет изображения отчета в чат альбомами по 10 фотографий.
+    Одиночное изображение отправляется обычным send_photo.
+    """
+    for album in split_albums(photos):
+        if len(album) == 1:
+            photo = album[0]
+            sent = await _request(
+                limiter,
+                chat_id,
+                lambda: bot.send_photo(
+                    chat_id, photo.input_file(), caption=photo.caption
+                ),
+            )
+            photo.capture(sent)
+        else:
+            sent = await _request(
+                limiter,
+                chat_id,
+                lambda: bot.send_media_group(chat_id, _album_media(album)),
+                messages=len(album),
+            )
+            _capture_album(album, sent)
+
+
+async def send_report_document(
+    bot: Bot,
+    chat_id: int,
+    document: ReportDocument,
+    limiter: Optional[TelegramRateLimiter] = None,
+) -> None:
+    sent = await _request(
+        limiter,
+        chat_id,
+        lambda: bot.send_document(
+            chat_id, document.input_file(), caption=document.caption
+        ),
+    )
+    document.capture(sent)
+
+
+class DeliveryError(Exception):
+    """
+    Доставка отчета получателю прервалась.
+
+    Хранит исходную ошибку и части отчета, которые получатель еще не получил,
+    чтобы повтор не отправлял уже доставленное.
+    """
+
+    def __init__(
+        self,
+        error: Exception,
+        document: Optional[ReportDocument],
+        photos: List[ReportPhoto],
+    ):
+        super().__init__(str(error))
+        self.error = error
+        self.document = document
+        self.photos = photos
+
+
+async def deliver_report(
+    bot: Bot,
+    chat_id: int,
+    document: Optional[ReportDocument],
+    photos: List[ReportPhoto],
+    limiter: Optional[TelegramRateLimiter] = None,
+) -> None:
+    """
+    Отправляет получателю документ и изображения отчета.
+
+    Raises:
+        DeliveryError: Если отправка прервалась; в ошибке — недоставленные части
+    """
+    if document is not None:
+        try:
+            await send_report_document(bot, chat_id, document, limiter)
+        except Exception as e:
+            raise DeliveryError(e, document, photos) from e
+
+    sent = 0
+    for album in split_albums(photos):
+        try:
+            await send_report_photos(bot, chat_id, album, limiter)
+        except Exception as e:
+            raise DeliveryError(e, None, photos[sent:]) from e
+        sent += len(album)
+
+
+async def fan_out(
+    chat_ids: Iterable[int],
+    deliver: Callable[[int], Awaitable[bool]],
+    concurrency: int = REPORT_SEND_CONCURRENCY,
+) -> None:
+    """
+    Рассылает отчет получателям с ограниченной параллельностью.
+
+    Получатели обслуживаются по одному, пока доставка не удастся хотя бы
+    один раз: так файлы загружаются в Telegram единожды, а остальные
+    получатели уже получают их по file_id.
+
+    Args:
+        chat_ids: Получатели в порядке рассылки
+        deliver: Доставка одному получателю, возвращает признак успеха
+        concurrency: Сколько получателей обслуживается одновременно
+    """
+    pending = list(chat_ids)
+    while pending:
+        if await deliver(pending.pop(0)):
+            break
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def deliver_bounded(chat_id: int) -> bool:
+        async with semaphore:
+            return await deliver(chat_id)
+
+    results = await asyncio.gather(
+        *(deliver_bounded(chat_id) for chat_id in pending), return_exceptions=True
+    )
+    for chat_id, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.error(
+                f"Необработанная ошибка доставки отчета в чат {chat_id }: {result }"
+            )
+
+
+async def answer_report_photos(
+    message: types.Message, photos: List[ReportPhoto]
+) -> None:
+    """То же, что send_report_photos, но ответом на сообщение"""
+    for album in split_albums(photos):
+        if len(album) == 1:
+            sent = await message.answer_photo(
+                album[0].input_file(), caption=album[0].caption
+            )
+            album[0].capture(sent)
+        else:
+            sent = await message.answer_media_group(_album_media(album))
+            _capture_album(album, sent)
@@ -0,0 +1,97 @@
+"""
+Выполнение тяжелых этапов построения отчетов вне цикла событий.
+
+Pandas, openpyxl, matplotlib и рендер матрешек занимают процессор на секунды.
+Если выполнять их прямо в корутине, бот перестает отвечать всем пользователям.
+Здесь такие этапы отправляются в отдельный пул потоков, а число одновременно
+строящихся отчетов ограничивается семафором.
+"""
+
+import asyncio
+import functools
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from aiogram import types
+
+from app.core.config import REPORT_JOB_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+_report_executor = ThreadPoolExecutor(
+    max_workers=max(1, REPORT_JOB_CONCURRENCY), thread_name_prefix="report"
+)
+
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, REPORT_JOB_CONCURRENCY))
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def run_report_stage(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Выполняет синхронную CPU-функцию в пуле потоков отчетов.
+
+    Args:
+        func: Функция этапа отчета
+        *args, **kwargs: Аргументы функции
+
+    Returns:
+        Any: Результат функции
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _report_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+class ReportProgress:
+    """Обновляет служебное сообщение о ходе построения отчета"""
+
+    def __init__(self, message: Optional[types.Message] = None):
+        self.message = message
+        self._last_text: Optional[str] = None
+
+    async def update(self, text: str) -> None:
+        if self.message is None or text == self._last_text:
+            return
+        try:
+            await self.message.edit_text(text)
+            self._last_text = text
+        except Exception as e:
+            logger.debug(f"Не удалось обновить сообщение о прогрессе: {e }")
+
+    async def delete(self) -> None:
+        if self.message is None:
+            return
+        try:
+            await self.message.delete()
+        except Exception as e:
+            logger.debug(f"Не удалось удалить сообщение о прогрессе: {e }")
+
+
+@asynccontextmanager
+async def report_job(progress: Optional[ReportProgress] = None):
+    """
+    Ограничивает число одновременно строящихся отчетов.
+
+    Пока отчет ждет своей очереди, цикл событий свободен и бот продолжает
+    отвечать остальным пользователям.
+    """
+    semaphore = _get_semaphore()
+    if semaphore.locked() and progress is not None:
+        await progress.update("Отчет поставлен в очередь, подождите...")
+
+    async with semaphore:
+        yield
@@ -0,0 +1,137 @@
+import datetime
+from typing import List, Optional, Tuple
+
+from app.utils.date_utils import (
+    format_date_for_display,
+    get_month_range,
+    validate_date_format,
+)
+
+REPORT_PERIOD_HELP = (
+    "Укажите период отчета:\n"
+    "/report — текущий месяц\n"
+    "/report 2024-05 или /report 05.2024 — указанный месяц\n"
+    "/report 01.05.2024 15.05.2024 — диапазон дат\n"
+    "/report all — вся история\n\n"
+    "Для неполных месяцев план берется пропорционально числу дней периода"
+)
+
+
+class ReportPeriod:
+    """
+    Период выгрузки отчета. Границы включительные; None — без ограничения.
+
+    Args:
+        start: Первый день периода
+        end: Последний день периода
+    """
+
+    def __init__(
+        self, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None
+    ):
+        if start and end and start > end:
+            raise ValueError("Начало периода позже его конца")
+        self.start = start
+        self.end = end
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, ReportPeriod)
+            and self.start == other.start
+            and self.end == other.end
+        )
+
+    def __repr__(self) -> str:
+        return f"ReportPeriod({self .start }, {self .end })"
+
+    @classmethod
+    def month(cls, year: int, month: int) -> "ReportPeriod":
+        return cls(*get_month_range(datetime.date(year, month, 1)))
+
+    @classmethod
+    def current_month(cls, today: Optional[datetime.date] = None) -> "ReportPeriod":
+        today = today or datetime.date.today()
+        return cls.month(today.year, today.month)
+
+    @classmethod
+    def all_time(cls) -> "ReportPeriod":
+        return cls()
+
+    @classmethod
+    def parse(cls, text: Optional[str]) -> "ReportPeriod":
+        """
+        Разбирает период из аргументов команды /report.
+
+        Args:
+            text: Пусто, "all", месяц (YYYY-MM или MM.YYYY) или две даты
+
+        Returns:
+            ReportPeriod: Период отчета
+
+        Raises:
+            ValueError: Если период не удалось разобрать
+        """
+        parts = (text or "").split()
+        if not parts:
+            return cls.current_month()
+
+        if len(parts) == 1:
+            value = parts[0].lower()
+            if value in ("all", "все"):
+                return cls.all_time()
+
+            for fmt in ("%Y-%m", "%m.%Y"):
+                try:
+                    month_date = datetime.datetime.strptime(value, fmt).date()
+                    return cls.month(month_date.year, month_date.month)
+                except ValueError:
+                    continue
+
+            day = validate_date_format(value)
+            return cls(day, day)
+
+        if len(parts) == 2:
+            return cls(validate_date_format(parts[0]), validate_date_format(parts[1]))
+
+        raise ValueError(f"Неверный период: {text }")
+
+    @property
+    def is_bounded(self) -> bool:
+        return self.start is not None and self.end is not None
+
+    def months(self) -> List[datetime.date]:
+        """Первые дни месяцев, которые затрагивает ограниченный период"""
+        if not self.is_bounded:
+            raise ValueError("Период без границ")
+
+        months = []
+        current = self.start.replace(day=1)
+        while current <= self.end:
+            months.append(current)
+            current = get_month_range(current)[1] + datetime.timedelta(days=1)
+        return months
+
+    def month_weights(self) -> List[Tuple[datetime.date, float]]:
+        """
+        Месяцы периода с долей дней месяца, попавших в период.
+
+        Returns:
+            List[Tuple[datetime.date, float]]: Первый день месяца и доля (0; 1]
+        """
+        weights = []
+        for month_start in self.months():
+            month_end = get_month_range(month_start)[1]
+            covered = (min(self.end, month_end) - max(self.start, month_start)).days + 1
+            weights.append((month_start, covered / month_end.day))
+        return weights
+
+    @property
+    def title(self) -> str:
+        if not self.is_bounded:
+            return "за все время"
+        if (self.start, self.end) == get_month_range(self.start):
+            return format_date_for_display(self.start, "month_year")
+        return (
+            f"{format_date_for_display (self .start , 'short')} – "
+            f"{format_date_for_display (self .end , 'short')}"
+        )
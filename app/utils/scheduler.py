@@ -1,7 +1,9 @@
 import asyncio
+import datetime
 import io
 import pytz
 import logging
+from typing import Any, Dict, List, Optional, Tuple
 
 if __name__ == "__main__":
     import sys
@@ -10,76 +12,205 @@ if __name__ == "__main__":
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from aiogram import Bot
-from aiogram.types import BufferedInputFile
-from app.core.config import ADMIN_CHAT_IDS
+from app.core.config import (
+    ADMIN_CHAT_IDS,
+    MATRYOSHKA_LAYOUT,
+    MATRYOSHKA_MODEL_PATH,
+    MATRYOSHKA_STORES_PER_IMAGE,
+    REPORT_INCLUDE_CHARTS,
+    REPORT_LOCK_TTL,
+    REPORT_PREPARE_LEAD_MINUTES,
+    REPORT_PREPARE_WAIT,
+    REPORT_SENT_MARKER_TTL,
+    REPORT_SEND_CHAT_BURST,
+    REPORT_SEND_CHAT_RATE,
+    REPORT_SEND_CONCURRENCY,
+    REPORT_SEND_RATE,
+)
 from app.core.database import get_session
 from app.services.revenue_service import RevenueService
 from app.services.user_service import UserService
-from app.utils.matryoshka import create_matryoshka_collection
-from pathlib import Path
-import os
+from app.utils.cache import redis_client
+from app.utils.image_encoding import report_encoding
+from app.utils.matryoshka import choose_renderer, create_matryoshka_collection
+from app.utils.delivery_queue import enqueue_failed_deliveries
+from app.utils.distributed_lock import RedisLock
+from app.utils.rate_limit import TelegramRateLimiter
+from app.utils.report_delivery import (
+    DeliveryError,
+    ReportDocument,
+    build_chart_photos,
+    build_report_photos,
+    deliver_report,
+    fan_out,
+)
+from app.utils.report_jobs import report_job, run_report_stage
 
 logger = logging.getLogger(__name__)
 
+DAILY_REPORT_JOB_ID = "daily_report"
+PREPARE_REPORT_JOB_ID = "prepare_daily_report"
+# Один счетчик fencing-токенов на все дни, чтобы не копить по ключу в сутки
+DAILY_REPORT_FENCE_KEY = "lock:daily_report:fence"
+# Отметка об отправленном за день отчете; защищает от повторной рассылки
+DAILY_REPORT_SENT_KEY = "report:daily_sent"
+
+
+class PreparedReport:
+    """Готовые файлы ежедневного отчета"""
+
+    def __init__(
+        self,
+        excel_bytes: bytes,
+        shops_data: List[Dict[str, Any]],
+        matryoshka_buffers: List[io.BytesIO],
+        stores_per_image: int,
+        charts: Optional[Dict[str, bytes]] = None,
+    ):
+        self.excel_bytes = excel_bytes
+        self.shops_data = shops_data
+        self.matryoshka_buffers = matryoshka_buffers
+        self.stores_per_image = stores_per_image
+        self.charts = charts or {}
+        self.fingerprint: Optional[Tuple[Any, ...]] = None
+        self.prepared_on = _report_date()
+
+
+# Отчет, подготовленный заранее этапом prepare для ближайшей рассылки
+_prepared_report: Optional[PreparedReport] = None
+
+# Идущий этап prepare этой реплики: рассылка дожидается его, а не строит
+# отчет параллельно второй раз
+_prepare_task: Optional[asyncio.Task] = None
+
+# Блокировка дня, взятая этапом prepare. Хранится отдельно от отчета:
+# если подготовка не удалась, рассылка все равно идет под этой блокировкой
+_prepare_lease: Optional[RedisLock] = None
+
+
+async def build_daily_report() -> Optional[PreparedReport]:
+    """
+    Строит Excel-отчет и изображения матрешек.
+
+    Returns:
+        Optional[PreparedReport]: Файлы отчета или None, если данных нет
+    """
+    template_path = MATRYOSHKA_MODEL_PATH
+    renderer = choose_renderer(template_path)
+
+    if renderer == "template":
+        logger.warning(
+            f"3D-модель матрешки недоступна ({template_path }), используется 2D-шаблон"
+        )
 
-async def send_daily_report(bot: Bot):
-    """Генерирует отчет и отправляет его всем администраторам"""
-    try:
-
-        resources_dir = Path(__file__).parent.parent.parent / "resources"
-        resources_dir.mkdir(exist_ok=True)
-        template_path = str(resources_dir / "bear3.glb")
-
-        if not os.path.exists(template_path):
-            from PIL import Image, ImageDraw
-
-            img = Image.new("RGBA", (300, 500), (255, 255, 255, 0))
-            draw = ImageDraw.Draw(img)
-
-            draw.ellipse((50, 100, 250, 450), outline=(0, 0, 0), width=3)
-            img.save(template_path)
-
+    # Весь этап генерации занимает один слот очереди отчетов
+    async with report_job():
         async with get_session() as session:
             rev_svc = RevenueService(session)
-            excel_bytes, images = await rev_svc.export_report()
+            # Excel пишется потоково во временный файл, без DataFrame
+            with await rev_svc.export_report_stream() as excel_file:
+                excel_bytes = excel_file.read()
 
             shops_data = await rev_svc.get_matryoshka_data()
             shops_data.sort(key=lambda x: x["fill_percent"], reverse=True)
 
-            user_svc = UserService(session)
-            all_users = await user_svc.get_all_users()
-
-            recipients_info = {}
-
-            for chat_id in ADMIN_CHAT_IDS:
-                recipients_info[chat_id] = {
-                    "role": "config_admin",
-                    "name": f"Config Admin {chat_id }",
-                }
-
-            for u in all_users:
-                if u.chat_id:
-                    if u.role == "admin":
-                        recipients_info[u.chat_id] = {
-                            "role": "db_admin",
-                            "name": f"{u .first_name } {u .last_name }",
-                        }
-                    elif u.role == "subscriber":
-                        recipients_info[u.chat_id] = {
-                            "role": "subscriber",
-                            "name": f"{u .first_name } {u .last_name }",
-                        }
+            charts = {}
+            if shops_data and REPORT_INCLUDE_CHARTS:
+                charts = await rev_svc.render_report_charts()
 
         if not shops_data:
-            logger.info("Нет данных для отчета - отправка пропущена")
-            return
+            return None
 
-        stores_per_image = 3
+        stores_per_image = MATRYOSHKA_STORES_PER_IMAGE
 
-        matryoshka_buffers = create_matryoshka_collection(
-            template_path, shops_data, layout="vertical", max_per_image=stores_per_image
+        matryoshka_buffers = await run_report_stage(
+            create_matryoshka_collection,
+            template_path,
+            shops_data,
+            layout=MATRYOSHKA_LAYOUT,
+            max_per_image=stores_per_image,
+            renderer=renderer,
         )
 
+    return PreparedReport(
+        excel_bytes, shops_data, matryoshka_buffers, stores_per_image, charts
+    )
+
+
+async def _get_data_fingerprint() -> Tuple[Any, ...]:
+    async with get_session() as session:
+        return await RevenueService(session).get_data_fingerprint()
+
+
+async def prepare_daily_report() -> Optional[PreparedReport]:
+    """
+    Этап prepare: строит отчет заранее и запоминает отпечаток данных,
+    чтобы в момент рассылки оставалось только отправить файлы.
+    """
+    global _prepared_report
+
+    fingerprint = await _get_data_fingerprint()
+    report = await build_daily_report()
+    if report is not None:
+        report.fingerprint = fingerprint
+    _prepared_report = report
+    return report
+
+
+async def _take_prepared_report() -> Optional[PreparedReport]:
+    """
+    Забирает заранее подготовленный отчет, если данные с тех пор не менялись.
+    """
+    global _prepared_report
+
+    report, _prepared_report = _prepared_report, None
+    if report is None or report.prepared_on != _report_date():
+        return None
+
+    try:
+        fingerprint = await _get_data_fingerprint()
+    except Exception as e:
+        logger.warning(f"Не удалось проверить актуальность отчета: {e }")
+        return None
+
+    if fingerprint != report.fingerprint:
+        logger.info("Данные изменились после подготовки отчета - строим заново")
+        return None
+
+    logger.info("Используем заранее подготовленный отчет")
+    return report
+
+
+async def send_daily_report(bot: Bot, lease: Optional[RedisLock] = None) -> bool:
+    """
+    Генерирует отчет и отправляет его всем администраторам.
+
+    Если этап prepare уже построил отчет и данные с тех пор не менялись,
+    отправляются готовые файлы.
+
+    Args:
+        bot: Экземпляр бота
+        lease: Блокировка реплики; если она истекла и перешла другой реплике,
+            рассылка не начинается
+
+    Returns:
+        bool: True, если рассылка состоялась (или отправлять нечего);
+        недоставленные части к этому моменту уже в очереди повторов
+    """
+    try:
+
+        report = await _take_prepared_report()
+        if report is None:
+            report = await build_daily_report()
+
+        if report is None:
+            logger.info("Нет данных для отчета - отправка пропущена")
+            return True
+
+        async with get_session() as session:
+            user_svc = UserService(session)
+            recipients_info = await user_svc.get_report_recipients(ADMIN_CHAT_IDS)
+
         config_admins = sum(
             1 for info in recipients_info.values() if info["role"] == "config_admin"
         )
@@ -95,48 +226,76 @@ async def send_daily_report(bot: Bot):
             f"админы из конфига: {config_admins }, админы из БД: {db_admins }, подписчики: {subscribers }"
         )
 
+        # Файлы загружаются один раз, дальше отправляются по file_id
+        document = ReportDocument(
+            report.excel_bytes,
+            "revenue_report.xlsx",
+            "Подробный отчет по выручке магазинов",
+        )
+        photos = build_report_photos(
+            report.matryoshka_buffers,
+            report.shops_data,
+            report.stores_per_image,
+            report_encoding.extension,
+        ) + build_chart_photos(report.charts)
+
+        limiter = TelegramRateLimiter(
+            REPORT_SEND_RATE, REPORT_SEND_CHAT_RATE, REPORT_SEND_CHAT_BURST
+        )
         successful_sends = 0
         failed_sends = 0
+        failed_deliveries: List[Tuple[int, DeliveryError]] = []
 
-        for chat_id in sorted(recipients_info.keys()):
+        async def deliver(chat_id: int) -> bool:
+            nonlocal successful_sends, failed_sends
             recipient_info = recipients_info[chat_id]
             role = recipient_info["role"]
             name = recipient_info["name"]
 
             try:
-                await bot.send_document(
-                    chat_id,
-                    BufferedInputFile(excel_bytes, filename="revenue_report.xlsx"),
-                    caption="Подробный отчет по выручке магазинов",
-                )
-
-                for i, matryoshka_buf in enumerate(matryoshka_buffers, 1):
-                    stores_in_image = shops_data[(i - 1) * stores_per_image : i * stores_per_image]
-                    stores_names = ", ".join([s["title"] for s in stores_in_image])
-
-                    await bot.send_photo(
-                        chat_id,
-                        BufferedInputFile(
-                            matryoshka_buf.getvalue(),
-                            filename=f"report_matryoshka_{i }.png",
-                        ),
-                        caption=f"📊 Выполнение плана: {stores_names }",
-                    )
+                await deliver_report(bot, chat_id, document, photos, limiter)
 
                 logger.info(
                     f"✅ Отчет отправлен: {name } (роль: {role }, chat_id: {chat_id })"
                 )
                 successful_sends += 1
+                return True
 
-            except Exception as send_error:
+            except DeliveryError as delivery_error:
                 logger.error(
-                    f"❌ Ошибка отправки отчета: {name } (роль: {role }, chat_id: {chat_id }): {send_error }"
+                    f"❌ Ошибка отправки отчета: {name } (роль: {role }, chat_id: {chat_id }): {delivery_error .error }"
                 )
                 failed_sends += 1
+                failed_deliveries.append((chat_id, delivery_error))
+                return False
+
+        if lease is not None and not await _lease_is_held(lease):
+            logger.warning(
+                "Блокировка отчета перешла другой реплике, рассылка отменена"
+            )
+            return False
+
+        await fan_out(sorted(recipients_info.keys()), deliver, REPORT_SEND_CONCURRENCY)
+
+        # В очередь ставим после рассылки: к этому моменту файлы, как правило,
+        # уже загружены и задания хранят только file_id недоставленных частей
+        if failed_deliveries:
+            await enqueue_failed_deliveries(
+                [
+                    (
+                        chat_id,
+                        delivery_error.document,
+                        delivery_error.photos,
+                        str(delivery_error.error),
+                    )
+                    for chat_id, delivery_error in failed_deliveries
+                ]
+            )
 
         logger.info(
             f"Отправка завершена. Успешно: {successful_sends }, с ошибками: {failed_sends }"
         )
+        return True
 
     except Exception as e:
         logger.error(
@@ -157,12 +316,168 @@ async def send_daily_report(bot: Bot):
                 print(
                     f"Не удалось отправить сообщение администратору {chat_id }: {error_message }"
                 )
+        return False
+
+
+async def _lease_is_held(lease: RedisLock) -> bool:
+    try:
+        return await lease.is_held()
+    except Exception as e:
+        logger.warning(f"Не удалось проверить блокировку отчета: {e }")
+        return True
+
+
+def _report_date() -> datetime.date:
+    """День отчета по Москве — в этом часовом поясе работает расписание"""
+    return datetime.datetime.now(pytz.timezone("Europe/Moscow")).date()
+
+
+def _daily_report_lock(day: datetime.date) -> RedisLock:
+    return RedisLock(
+        f"lock:daily_report:{day .isoformat ()}",
+        REPORT_LOCK_TTL * 1000,
+        fence_key=DAILY_REPORT_FENCE_KEY,
+    )
+
+
+async def _report_already_sent(day: datetime.date) -> bool:
+    try:
+        return bool(await redis_client.get(f"{DAILY_REPORT_SENT_KEY }:{day .isoformat ()}"))
+    except Exception as e:
+        logger.warning(f"Не удалось проверить отметку об отправке отчета: {e }")
+        return False
+
+
+async def _mark_report_sent(day: datetime.date) -> None:
+    try:
+        await redis_client.set(
+            f"{DAILY_REPORT_SENT_KEY }:{day .isoformat ()}",
+            "1",
+            ex=REPORT_SENT_MARKER_TTL,
+        )
+    except Exception as e:
+        logger.error(f"Не удалось сохранить отметку об отправке отчета: {e }")
+
+
+async def run_prepare_report_job():
+    """
+    Этап prepare по расписанию. Берет блокировку дня, поэтому отчет готовит
+    и затем рассылает только одна реплика.
+    """
+    global _prepare_lease, _prepare_task
+
+    day = _report_date()
+    lock = _daily_report_lock(day)
+    try:
+        token = await lock.acquire()
+    except Exception as e:
+        logger.warning(f"Redis недоступен, отчет готовится без блокировки: {e }")
+    else:
+        if token is None:
+            logger.info("Ежедневный отчет уже готовит другая реплика - пропускаем")
+            return
+        if await _report_already_sent(day):
+            logger.info("Ежедневный отчет уже отправлен - подготовка не нужна")
+            await lock.release()
+            return
+        # Блокировка остается за этой репликой, даже если подготовка упадет,
+        # и продлевается до рассылки
+        lock.keep_alive()
+        _prepare_lease = lock
+
+    task = asyncio.create_task(prepare_daily_report())
+    _prepare_task = task
+    try:
+        await asyncio.shield(task)
+        logger.info("Ежедневный отчет подготовлен заранее")
+    except asyncio.CancelledError:
+        if not task.cancelled():
+            raise
+        logger.warning("Подготовка ежедневного отчета отменена: рассылка не дождалась ее")
+    except Exception as e:
+        # Отчет будет построен заново в момент рассылки
+        logger.error(f"Не удалось подготовить ежедневный отчет: {e }")
+
+
+async def _wait_for_prepare() -> None:
+    """
+    Дожидается этапа prepare этой реплики, если он еще идет. Если подготовка
+    не укладывается в REPORT_PREPARE_WAIT, она отменяется, и рассылка строит
+    отчет сама, а не параллельно с ней.
+    """
+    global _prepare_task
+
+    task, _prepare_task = _prepare_task, None
+    if task is None or task.done():
+        return
+
+    logger.info("Подготовка отчета еще идет - ждем ее вместо повторного построения")
+    try:
+        await asyncio.wait_for(asyncio.shield(task), REPORT_PREPARE_WAIT)
+    except asyncio.TimeoutError:
+        logger.warning("Подготовка отчета не уложилась в срок - строим отчет заново")
+        task.cancel()
+    except Exception:
+        # Ошибку подготовки уже записал этап prepare
+        pass
+
+
+async def run_daily_report_job(bot: Bot):
+    """
+    Запускает ежедневный отчет, если блокировку этого дня взяла текущая реплика.
+
+    Блокировка продлевается, пока отчет строится и рассылается, и снимается
+    по завершении. Повторную рассылку репликой, чей планировщик сработал
+    позже, предотвращает отметка об отправке за день. Если Redis недоступен,
+    отчет строится без блокировки.
+    """
+    global _prepare_lease
+
+    day = _report_date()
+    lease, _prepare_lease = _prepare_lease, None
+    if lease is None or not await _lease_is_held(lease):
+        if lease is not None:
+            lease.stop_keep_alive()
+        lease = _daily_report_lock(day)
+        try:
+            token = await lease.acquire()
+        except Exception as e:
+            logger.warning(f"Redis недоступен, отчет строится без блокировки: {e }")
+            await _wait_for_prepare()
+            await send_daily_report(bot)
+            return
+
+        if token is None:
+            logger.info("Ежедневный отчет уже формирует другая реплика - пропускаем")
+            return
+        logger.info(f"Блокировка ежедневного отчета получена (токен {token })")
+
+    try:
+        # Отметка проверяется под блокировкой: реплика, отправившая отчет,
+        # ставит ее до того, как снять блокировку
+        if await _report_already_sent(day):
+            logger.info("Ежедневный отчет уже отправлен - пропускаем")
+            return
+
+        lease.keep_alive()
+        await _wait_for_prepare()
+        if await send_daily_report(bot, lease=lease):
+            await _mark_report_sent(day)
+    finally:
+        await lease.release()
 
 
 def schedule_daily_report(
-    bot: Bot, hour: int = 22, minute: int = 30, second: int = None
+    bot: Bot,
+    hour: int = 22,
+    minute: int = 30,
+    second: int = None,
+    prepare_lead_minutes: int = REPORT_PREPARE_LEAD_MINUTES,
 ) -> AsyncIOScheduler:
-    """Планирует ежедневную отправку отчета в 22:30 по часовому поясу МСК"""
+    """
+    Планирует ежедневную отправку отчета в 22:30 по часовому поясу МСК
+    и подготовку отчета за prepare_lead_minutes минут до отправки.
+    """
     scheduler = AsyncIOScheduler()
 
     tz = pytz.timezone("Europe/Moscow")
@@ -180,7 +495,21 @@ def schedule_daily_report(
 
     trigger = CronTrigger(**trigger_args)
 
-    scheduler.add_job(send_daily_report, trigger=trigger, args=[bot])
+    scheduler.add_job(
+        run_daily_report_job, trigger=trigger, args=[bot], id=DAILY_REPORT_JOB_ID
+    )
+
+    if second is None and prepare_lead_minutes > 0:
+        prepare_at = (hour * 60 + minute - prepare_lead_minutes) % (24 * 60)
+        prepare_hour, prepare_minute = divmod(prepare_at, 60)
+        scheduler.add_job(
+            run_prepare_report_job,
+            trigger=CronTrigger(hour=prepare_hour, minute=prepare_minute, timezone=tz),
+            id=PREPARE_REPORT_JOB_ID,
+        )
+        logger.info(
+            f"Подготовка отчета запланирована на {prepare_hour :02d}:{prepare_minute :02d} МСК"
+        )
     try:
         scheduler.start()
         logger.info("Планировщик ежедневных отчетов запущен")
@@ -0,0 +1,86 @@
+"""
+Потоковая запись xlsx с постоянным расходом памяти.
+
+Книга openpyxl в режиме write_only не хранит ячейки в памяти: строки
+сразу сериализуются во временные файлы листов. Готовый файл собирается
+в SpooledTemporaryFile, который переходит из памяти на диск, как только
+превышает заданный размер, поэтому выгрузка за несколько лет не упирается
+в оперативную память.
+"""
+
+import tempfile
+from typing import Any, Iterable, Optional, Sequence
+
+from openpyxl import Workbook
+
+from app.core.config import REPORT_SPOOL_MAX_SIZE
+
+
+class StreamingSheet:
+    """Лист книги, в который строки только дописываются"""
+
+    def __init__(self, worksheet: Any):
+        self.worksheet = worksheet
+        self.rows = 0
+
+    def append_rows(self, rows: Iterable[Sequence[Any]]) -> int:
+        """
+        Дописывает строки в лист.
+
+        Returns:
+            int: Сколько строк записано
+        """
+        count = 0
+        for row in rows:
+            self.worksheet.append(list(row))
+            count += 1
+        self.rows += count
+        return count
+
+
+class StreamingWorkbook:
+    """
+    Книга xlsx в режиме write_only, сохраняемая во временный файл.
+
+    Args:
+        spool_max_size: Сколько байт держать в памяти до сброса файла на диск
+    """
+
+    def __init__(self, spool_max_size: int = REPORT_SPOOL_MAX_SIZE):
+        self.spool_max_size = spool_max_size
+        self._workbook: Optional[Workbook] = Workbook(write_only=True)
+
+    def create_sheet(
+        self, title: str, header: Optional[Sequence[str]] = None
+    ) -> StreamingSheet:
+        if self._workbook is None:
+            raise RuntimeError("Книга уже сохранена")
+        sheet = StreamingSheet(self._workbook.create_sheet(title))
+        if header:
+            sheet.worksheet.append(list(header))
+        return sheet
+
+    def save(self) -> tempfile.SpooledTemporaryFile:
+        """
+        Сохраняет книгу. Повторно дописывать строки после этого нельзя.
+
+        Returns:
+            tempfile.SpooledTemporaryFile: Файл xlsx, позиция в начале;
+            закрывает его вызывающий код
+        """
+        if self._workbook is None:
+            raise RuntimeError("Книга уже сохранена")
+
+        output = tempfile.SpooledTemporaryFile(
+            max_size=self.spool_max_size, suffix=".xlsx"
+        )
+        try:
+            self._workbook.save(output)
+        except Exception:
+            output.close()
+            raise
+        finally:
+            self._workbook = None
+
+        output.seek(0)
+        return output
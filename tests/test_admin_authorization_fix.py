@@ -153,3 +153,42 @@ async def test_non_admin_cannot_use_report(create_message, state):
     message.answer.assert_called_once()
     call_args = message.answer.call_args[0][0]
     assert "нет прав администратора" in call_args.lower()
+
+
+@pytest.mark.asyncio
+async def test_admin_report_sends_store_charts_when_enabled(
+    create_message, state, admin_chat_ids
+):
+    """При REPORT_INCLUDE_CHARTS /report присылает графики магазинов после матрешек"""
+    import io
+
+    message = create_message()
+    message.answer_media_group = AsyncMock()
+
+    with patch("app.handlers.admin_handler.get_session"), \
+         patch("app.utils.permissions.get_session"), \
+         patch("app.handlers.admin_handler.REPORT_INCLUDE_CHARTS", True), \
+         patch(
+             "app.handlers.admin_handler.create_matryoshka_collection",
+             return_value=[io.BytesIO(b"img")],
+         ), \
+         patch("app.handlers.admin_handler.RevenueService") as mock_revenue_service:
+        mock_service_instance = AsyncMock()
+        mock_service_instance.get_matryoshka_data.return_value = [
+            {"title": "Store1", "fill_percent": 50}
+        ]
+        mock_service_instance.export_report_stream.return_value = io.BytesIO(b"xlsx")
+        mock_service_instance.render_report_charts.return_value = {
+            "Store1": b"png1",
+            "Store2": b"png2",
+        }
+        mock_revenue_service.return_value = mock_service_instance
+
+        await cmd_report(message, state)
+
+    message.answer_document.assert_called_once()
+    media = message.answer_media_group.call_args.args[0]
+    assert [item.caption for item in media[1:]] == [
+        "📈 Динамика выручки: Store1",
+        "📈 Динамика выручки: Store2",
+    ]
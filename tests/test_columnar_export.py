@@ -0,0 +1,69 @@
+import csv
+import io
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services.store_service import StoreService
+from app.services.user_service import UserService
+from app.services.revenue_service import RevenueService
+from app.utils.report_period import ReportPeriod
+
+
+async def _fill_revenue(session):
+    store_svc = StoreService(session)
+    user_svc = UserService(session)
+    rev_svc = RevenueService(session)
+
+    store = await store_svc.get_or_create("ColumnarStore")
+    manager = await user_svc.get_or_create(
+        "Columnar", "Manager", "manager", store_id=store.id
+    )
+    for day in range(1, 6):
+        await rev_svc.create_revenue(10.0 * day, store.id, manager.id, date(2024, 5, day))
+    await rev_svc.create_revenue(99.0, store.id, manager.id, date(2024, 6, 1))
+    return rev_svc
+
+
+@pytest.mark.asyncio
+async def test_export_report_csv(session):
+    rev_svc = await _fill_revenue(session)
+
+    chunks = [
+        chunk
+        async for chunk in rev_svc.iter_report_csv(ReportPeriod.month(2024, 5), 2)
+    ]
+    assert len(chunks) == 4  # заголовок и три порции
+
+    with await rev_svc.export_report_csv(ReportPeriod.month(2024, 5)) as output:
+        rows = list(csv.reader(io.TextIOWrapper(output, encoding="utf-8")))
+
+    assert rows[0] == ["store_name", "date", "amount", "plan"]
+    assert rows[1] == ["ColumnarStore", "2024-05-01", "10.0", "0.0"]
+    assert len(rows) == 6
+
+
+@pytest.mark.asyncio
+async def test_export_report_parquet(session):
+    pq = pytest.importorskip("pyarrow.parquet")
+    rev_svc = await _fill_revenue(session)
+
+    with await rev_svc.export_report_parquet(ReportPeriod.month(2024, 5), 2) as output:
+        table = pq.read_table(output)
+
+    assert table.column_names == ["store_name", "date", "amount", "plan"]
+    assert table.column("amount").to_pylist() == [10.0, 20.0, 30.0, 40.0, 50.0]
+
+
+@pytest.mark.asyncio
+async def test_cmd_export_requires_format():
+    from app.handlers.admin_handler import cmd_export
+
+    message = MagicMock()
+    message.answer = AsyncMock()
+    state = AsyncMock()
+    command = MagicMock(args="xlsx")
+
+    with patch("app.handlers.admin_handler.is_admin_chat", return_value=True):
+        await cmd_export(message, state, command)
+
+    assert "/export csv|parquet" in message.answer.call_args[0][0]
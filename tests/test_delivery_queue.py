@@ -0,0 +1,251 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError
+
+from app.utils import delivery_queue
+from app.utils.delivery_queue import (
+    DEAD_KEY,
+    PENDING_KEY,
+    enqueue_failed_deliveries,
+    enqueue_failed_delivery,
+    process_due,
+    retry_delay,
+)
+from app.utils.report_delivery import ReportDocument, ReportPhoto
+
+
+class FakeRedis:
+    """Минимальная реализация отсортированных множеств и списков Redis"""
+
+    def __init__(self):
+        self.zsets = {}
+        self.lists = {}
+        self.strings = {}
+        self.ttls = {}
+
+    async def set(self, key, value, ex=None):
+        self.strings[key] = value
+        self.ttls[key] = ex
+        return True
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def zrangebyscore(self, key, min_score, max_score):
+        items = self.zsets.get(key, {})
+        return sorted(
+            (m for m, s in items.items() if min_score <= s <= max_score),
+            key=items.get,
+        )
+
+    async def zrem(self, key, *members):
+        items = self.zsets.get(key, {})
+        return sum(1 for m in members if items.pop(m, None) is not None)
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+
+def _artifacts(uploaded=True):
+    document = ReportDocument(b"xlsx", "revenue_report.xlsx", "Отчет")
+    photo = ReportPhoto(b"jpg", "report_matryoshka_1.jpg", "📊 Магазин")
+    if uploaded:
+        document.remember("doc-id")
+        photo.remember("photo-id")
+    return document, [photo]
+
+
+def _pending(redis):
+    return [json.loads(m) for m in redis.zsets.get(PENDING_KEY, {})]
+
+
+def test_retry_delay_is_exponential_and_capped():
+    with (
+        patch("app.utils.delivery_queue.REPORT_RETRY_BASE_DELAY", 10),
+        patch("app.utils.delivery_queue.REPORT_RETRY_MAX_DELAY", 50),
+    ):
+        assert [retry_delay(a) for a in range(4)] == [10, 20, 40, 50]
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_enqueued_with_file_ids():
+    redis = FakeRedis()
+    document, photos = _artifacts()
+
+    with patch("app.utils.delivery_queue.redis_client", redis):
+        assert await enqueue_failed_delivery(42, document, photos, "timeout")
+
+    (item,) = _pending(redis)
+    assert item["chat_id"] == 42
+    assert item["document"]["file_id"] == "doc-id"
+    assert item["photos"] == [{"file_id": "photo-id", "caption": "📊 Магазин"}]
+    assert item["attempt"] == 0
+
+
+@pytest.mark.asyncio
+async def test_not_uploaded_files_enqueued_with_content():
+    """Если Telegram был недоступен всю рассылку, в задании хранится содержимое файлов"""
+    redis = FakeRedis()
+    bot = AsyncMock()
+    document, photos = _artifacts(uploaded=False)
+
+    with patch("app.utils.delivery_queue.redis_client", redis):
+        assert await enqueue_failed_delivery(42, document, photos)
+        (item,) = _pending(redis)
+        assert "file_id" not in item["document"]
+        assert item["document"]["filename"] == "revenue_report.xlsx"
+        assert item["document"]["blob"] in redis.strings
+
+        assert await process_due(bot, now=10**10) == (1, 0)
+
+    uploaded = bot.send_document.call_args.args[1]
+    assert uploaded.filename == "revenue_report.xlsx"
+    assert uploaded.data == b"xlsx"
+    assert bot.send_photo.call_args.args[1].data == b"jpg"
+
+
+@pytest.mark.asyncio
+async def test_retry_sends_only_missing_parts():
+    """Документ уже доставлен — повтор отправляет только изображения"""
+    redis = FakeRedis()
+    bot = AsyncMock()
+    bot.send_photo.side_effect = [Exception("timeout"), MagicMock()]
+    document, photos = _artifacts()
+
+    with patch("app.utils.delivery_queue.redis_client", redis):
+        await enqueue_failed_delivery(42, document, photos)
+
+        assert await process_due(bot, now=10**10) == (0, 1)
+        (item,) = _pending(redis)
+        assert item["document"] is None
+        assert item["photos"] == [{"file_id": "photo-id", "caption": "📊 Магазин"}]
+
+        assert await process_due(bot, now=10**12) == (1, 0)
+
+    assert bot.send_document.call_count == 1
+    assert bot.send_photo.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_due_item_resent_by_file_id():
+    redis = FakeRedis()
+    bot = AsyncMock()
+    document, photos = _artifacts()
+
+    with patch("app.utils.delivery_queue.redis_client", redis):
+        await enqueue_failed_delivery(42, document, photos)
+
+        # Срок еще не наступил
+        assert await process_due(bot, now=0) == (0, 0)
+        bot.send_document.assert_not_called()
+
+        assert await process_due(bot, now=10**10) == (1, 0)
+
+    assert bot.send_document.call_args.args[:2] == (42, "doc-id")
+    assert bot.send_photo.call_args.args[:2] == (42, "photo-id")
+    assert _pending(redis) == []
+
+
+@pytest.mark.asyncio
+async def test_retries_back_off_then_dead_letter():
+    redis = FakeRedis()
+    bot = AsyncMock()
+    bot.send_document.side_effect = Exception("Telegram API Error")
+    document, photos = _artifacts()
+
+    with (
+        patch("app.utils.delivery_queue.redis_client", redis),
+        patch("app.utils.delivery_queue.REPORT_RETRY_MAX_ATTEMPTS", 3),
+    ):
+        await enqueue_failed_delivery(42, document, photos)
+
+        await process_due(bot, now=10**10)
+        (item,) = _pending(redis)
+        assert item["attempt"] == 1
+        assert item["error"] == "Telegram API Error"
+
+        await process_due(bot, now=10**11)
+        await process_due(bot, now=10**12)
+
+    assert _pending(redis) == []
+    (dead,) = redis.lists[DEAD_KEY]
+    assert json.loads(dead)["attempt"] == 3
+
+
+@pytest.mark.asyncio
+async def test_blocked_chat_goes_straight_to_dead_letter():
+    redis = FakeRedis()
+    bot = AsyncMock()
+    bot.send_document.side_effect = TelegramForbiddenError(
+        MagicMock(), "bot was blocked"
+    )
+    document, photos = _artifacts()
+
+    with patch("app.utils.delivery_queue.redis_client", redis):
+        await enqueue_failed_delivery(42, document, photos)
+        assert await process_due(bot, now=10**10) == (0, 1)
+
+    assert _pending(redis) == []
+    assert len(redis.lists[DEAD_KEY]) == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_unavailable_does_not_raise():
+    redis = AsyncMock()
+    redis.zadd.side_effect = ConnectionError("redis down")
+    redis.zrangebyscore.side_effect = ConnectionError("redis down")
+    document, photos = _artifacts()
+
+    with patch.object(delivery_queue, "redis_client", redis):
+        assert not await enqueue_failed_delivery(42, document, photos)
+        assert await process_due(AsyncMock()) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_not_uploaded_files_stored_once_for_all_recipients():
+    """Содержимое файлов хранится один раз, задания содержат только ключи"""
+    redis = FakeRedis()
+    bot = AsyncMock()
+    document, photos = _artifacts(uploaded=False)
+    failures = [(chat_id, document, photos, "timeout") for chat_id in (1, 2, 3)]
+    bot.send_document.return_value = MagicMock(document=MagicMock(file_id="doc-id"))
+
+    with patch("app.utils.delivery_queue.redis_client", redis):
+        assert await enqueue_failed_deliveries(failures) == 3
+        assert len(redis.strings) == 2
+        assert all(ttl > 0 for ttl in redis.ttls.values())
+        for member in redis.zsets[PENDING_KEY]:
+            assert "eGxzeA" not in member  # base64 от b"xlsx"
+
+        assert await process_due(bot, now=10**10) == (3, 0)
+
+    # Загружается только первый раз, дальше файл уходит по file_id
+    uploads = [call.args[1] for call in bot.send_document.call_args_list]
+    assert uploads[0].data == b"xlsx"
+    assert uploads[1:] == ["doc-id", "doc-id"]
+
+
+@pytest.mark.asyncio
+async def test_malformed_or_expired_item_goes_to_dead_letter():
+    redis = FakeRedis()
+    bot = AsyncMock()
+    document, photos = _artifacts(uploaded=False)
+
+    with patch("app.utils.delivery_queue.redis_client", redis):
+        await enqueue_failed_delivery(42, document, photos)
+        redis.strings.clear()  # истек TTL содержимого
+        await redis.zadd(PENDING_KEY, {"not json": 0})
+
+        assert await process_due(bot, now=10**10) == (0, 2)
+
+    bot.send_document.assert_not_called()
+    assert _pending(redis) == []
+    assert "not json" in redis.lists[DEAD_KEY]
+    assert len(redis.lists[DEAD_KEY]) == 2
@@ -0,0 +1,213 @@
+import asyncio
+import datetime
+from contextlib import contextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.utils.cache import RedisMock
+from app.utils.distributed_lock import _EXTEND_SCRIPT, _RELEASE_SCRIPT, RedisLock
+from app.utils.scheduler import (
+    DAILY_REPORT_FENCE_KEY,
+    DAILY_REPORT_SENT_KEY,
+    run_daily_report_job,
+    run_prepare_report_job,
+)
+
+
+class FakeRedis:
+    """Строки, INCR, SET NX и два Lua-скрипта блокировки"""
+
+    def __init__(self):
+        self.data = {}
+        self.extended = 0
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self.data.get(key) != token:
+            return 0
+        if script == _RELEASE_SCRIPT:
+            del self.data[key]
+        else:
+            assert script == _EXTEND_SCRIPT
+            self.extended += 1
+        return 1
+
+
+@contextmanager
+def use_redis(redis):
+    with (
+        patch("app.utils.distributed_lock.redis_client", redis),
+        patch("app.utils.scheduler.redis_client", redis),
+    ):
+        yield
+
+
+@pytest.mark.asyncio
+async def test_lock_is_exclusive_with_increasing_tokens():
+    redis = FakeRedis()
+    with patch("app.utils.distributed_lock.redis_client", redis):
+        first = RedisLock("lock:test", 1000)
+        second = RedisLock("lock:test", 1000)
+
+        assert await first.acquire() == 1
+        assert await second.acquire() is None
+        assert await first.is_held()
+        assert await first.extend()
+
+        assert await first.release()
+        assert await second.acquire() == 3
+        assert await second.is_held()
+
+
+@pytest.mark.asyncio
+async def test_stale_holder_cannot_release_foreign_lock():
+    """После истечения блокировки старый держатель не снимает чужую"""
+    redis = FakeRedis()
+    with patch("app.utils.distributed_lock.redis_client", redis):
+        stale = RedisLock("lock:test", 1000)
+        await stale.acquire()
+
+        del redis.data["lock:test"]  # истек TTL
+        fresh = RedisLock("lock:test", 1000)
+        assert await fresh.acquire() == 2
+
+        assert not await stale.is_held()
+        assert not await stale.release()
+        assert await fresh.is_held()
+
+
+@pytest.mark.asyncio
+async def test_daily_locks_share_one_fence_counter():
+    """Ежедневные блокировки не оставляют в Redis по счетчику на каждый день"""
+    redis = FakeRedis()
+    days = [datetime.datetime(2024, 5, day, 22, 30) for day in (1, 2, 3)]
+    with (
+        use_redis(redis),
+        patch("app.utils.scheduler.send_daily_report", AsyncMock()),
+        patch("app.utils.scheduler.datetime.datetime") as datetime_mock,
+    ):
+        for day in days:
+            datetime_mock.now.return_value = day
+            await run_daily_report_job("bot")
+
+    fence_keys = [key for key in redis.data if key.endswith(":fence")]
+    assert fence_keys == [DAILY_REPORT_FENCE_KEY]
+    assert redis.data[DAILY_REPORT_FENCE_KEY] == 3
+
+
+@pytest.mark.asyncio
+async def test_only_one_replica_sends_daily_report():
+    redis = FakeRedis()
+    send = AsyncMock(return_value=True)
+    with (
+        use_redis(redis),
+        patch("app.utils.scheduler.send_daily_report", send),
+    ):
+        await run_daily_report_job("bot-1")
+        await run_daily_report_job("bot-2")
+
+    send.assert_called_once()
+    assert send.call_args.args == ("bot-1",)
+    assert isinstance(send.call_args.kwargs["lease"], RedisLock)
+
+
+@pytest.mark.asyncio
+async def test_daily_report_is_sent_when_prepare_failed():
+    """Неудачный prepare не мешает рассылке: реплика шлет отчет под своей блокировкой"""
+    redis = FakeRedis()
+    send = AsyncMock(return_value=True)
+    with (
+        use_redis(redis),
+        patch(
+            "app.utils.scheduler.prepare_daily_report",
+            AsyncMock(side_effect=RuntimeError("db down")),
+        ),
+        patch("app.utils.scheduler.send_daily_report", send),
+        patch("app.utils.scheduler._prepare_lease", None),
+    ):
+        await run_prepare_report_job()
+        await run_daily_report_job("bot-1")
+        # Другая реплика блокировку не получает
+        await run_daily_report_job("bot-2")
+
+    send.assert_called_once()
+    assert send.call_args.args == ("bot-1",)
+    lease = send.call_args.kwargs["lease"]
+    # После рассылки блокировка снята, повтор останавливает отметка дня
+    assert lease.key not in redis.data
+    assert any(key.startswith(DAILY_REPORT_SENT_KEY) for key in redis.data)
+
+
+@pytest.mark.asyncio
+async def test_daily_report_runs_without_redis():
+    redis = AsyncMock()
+    redis.incr.side_effect = ConnectionError("redis down")
+    send = AsyncMock(return_value=True)
+    with (
+        use_redis(redis),
+        patch("app.utils.scheduler.send_daily_report", send),
+    ):
+        await run_daily_report_job("bot")
+
+    send.assert_called_once_with("bot")
+
+
+@pytest.mark.asyncio
+async def test_failed_send_releases_lock_without_marker():
+    """Если рассылка сорвалась, блокировка снимается и отчет можно отправить снова"""
+    redis = FakeRedis()
+    send = AsyncMock(side_effect=[False, True])
+    with use_redis(redis), patch("app.utils.scheduler.send_daily_report", send):
+        await run_daily_report_job("bot")
+        assert not any(key.startswith(DAILY_REPORT_SENT_KEY) for key in redis.data)
+
+        await run_daily_report_job("bot")
+        await run_daily_report_job("bot")
+
+    assert send.call_count == 2
+    assert not any(key.startswith("lock:daily_report:2") for key in redis.data)
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_extends_lock_until_release():
+    redis = FakeRedis()
+    with patch("app.utils.distributed_lock.redis_client", redis):
+        lock = RedisLock("lock:test", 1000)
+        await lock.acquire()
+        lock.keep_alive(interval=0.01)
+        await asyncio.sleep(0.05)
+        await lock.release()
+
+        extended = redis.extended
+        await asyncio.sleep(0.03)
+
+    assert extended >= 2
+    assert redis.extended == extended
+
+
+@pytest.mark.asyncio
+async def test_lock_works_on_redis_mock():
+    """Без Redis блокировка на заглушке держится и снимается как обычно"""
+    redis = RedisMock()
+    with patch("app.utils.distributed_lock.redis_client", redis):
+        first = RedisLock("lock:test", 1000)
+        assert await first.acquire() == 1
+        assert await first.is_held()
+        assert await first.extend()
+        assert await RedisLock("lock:test", 1000).acquire() is None
+
+        assert await first.release()
+        assert await redis.get("lock:test") is None
@@ -0,0 +1,55 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.utils.image_encoding import LOSSLESS_PNG, EncodingProfile
+
+
+def _image(size=(400, 200), color=(70, 130, 180, 128)):
+    return Image.new("RGBA", size, color)
+
+
+def test_profile_downscales_to_max_dimensions():
+    profile = EncodingProfile("JPEG", max_width=100, max_height=80)
+
+    assert profile.target_size((400, 200)) == (100, 50)
+    assert profile.target_size((100, 400)) == (20, 80)
+    assert profile.target_size((50, 40)) == (50, 40)
+
+    encoded = Image.open(profile.encode(_image()))
+    assert encoded.format == "JPEG"
+    assert encoded.size == (100, 50)
+
+
+def test_profile_flattens_alpha():
+    """Прозрачность накладывается на фон профиля"""
+    profile = EncodingProfile("PNG", background=(255, 255, 255))
+    encoded = Image.open(profile.encode(_image(color=(0, 0, 0, 0))))
+
+    assert encoded.mode == "RGB"
+    assert encoded.getpixel((0, 0)) == (255, 255, 255)
+
+
+def test_lossless_png_keeps_image():
+    image = _image()
+    encoded = Image.open(LOSSLESS_PNG.encode(image))
+
+    assert encoded.mode == "RGBA"
+    assert encoded.size == image.size
+    assert encoded.getpixel((0, 0)) == (70, 130, 180, 128)
+
+
+@pytest.mark.parametrize("fmt,ext", [("jpg", "jpg"), ("webp", "webp"), ("png", "png")])
+def test_profile_formats(fmt, ext):
+    profile = EncodingProfile(fmt, quality=70)
+    assert profile.extension == ext
+
+    buf = profile.encode(_image())
+    assert isinstance(buf, io.BytesIO)
+    assert Image.open(buf).format == profile.format
+
+
+def test_unknown_format_rejected():
+    with pytest.raises(ValueError):
+        EncodingProfile("BMP")
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import numpy as np
+
+from app.utils.matryoshka import (
+    DepthBase,
+    get_renderer,
+    render_model_with_fill,
+    render_model_with_fill_depth,
+)
+
+
+def _synthetic_base(size=10):
+    """Квадратная «модель» во весь кадр, Y растет снизу вверх от 0 до 1"""
+    color = np.zeros((size, size, 4), dtype=np.uint8)
+    color[..., :3] = (245, 245, 220)
+    color[..., 3] = 255
+    color[:, 0, 3] = 0  # левый столбец — фон
+
+    rows = np.arange(size, dtype=np.float32)
+    y_world = np.repeat((size - 1 - rows)[:, None] / (size - 1), size, axis=1)
+    y_world[:, 0] = np.nan
+
+    shade = np.ones((size, size, 1), dtype=np.float32)
+    return DepthBase(color, shade, y_world, 0.0, 1.0)
+
+
+def test_depth_fill_thresholds_rows():
+    """Пиксели ниже уровня заливки перекрашиваются, выше — остаются как есть"""
+    base = _synthetic_base()
+
+    with patch("app.utils.matryoshka.get_depth_base", return_value=base):
+        image = render_model_with_fill_depth(
+            "model.glb", 50, (70, 130, 180, 255), (10, 10)
+        )
+
+    pixels = np.asarray(image)
+    assert tuple(pixels[9, 5]) == (70, 130, 180, 255)
+    assert tuple(pixels[0, 5]) == (245, 245, 220, 255)
+    assert pixels[:, 0, 3].max() == 0
+
+    filled_rows = [row for row in range(10) if tuple(pixels[row, 5, :3]) == (70, 130, 180)]
+    assert filled_rows == [5, 6, 7, 8, 9]
+
+    # Базовый рендер не изменяется
+    assert tuple(base.color[9, 5, :3]) == (245, 245, 220)
+
+
+def test_depth_fill_blends_translucent_color():
+    """Полупрозрачная заливка смешивается с фоном и задней стенкой"""
+    base = _synthetic_base()
+
+    with patch("app.utils.matryoshka.get_depth_base", return_value=base):
+        image = render_model_with_fill_depth(
+            "model.glb", 100, (70, 130, 180, 128), (10, 10)
+        )
+
+    pixel = np.asarray(image)[5, 5]
+    assert 70 < pixel[0] < 250
+    assert pixel[3] == round(255 * (1 - (1 - 128 / 255) ** 2))
+
+
+def test_depth_fill_clamps_percentage():
+    base = _synthetic_base()
+
+    with patch("app.utils.matryoshka.get_depth_base", return_value=base):
+        empty = np.asarray(render_model_with_fill_depth("m", -10, (1, 2, 3, 255), (10, 10)))
+        full = np.asarray(render_model_with_fill_depth("m", 150, (1, 2, 3, 255), (10, 10)))
+
+    assert np.array_equal(empty, base.color)
+    assert tuple(full[0, 5, :3]) == (1, 2, 3)
+
+
+def test_depth_fill_missing_model():
+    assert render_model_with_fill_depth("/nonexistent/model.glb", 10, (1, 2, 3, 4)) is None
+
+
+def test_get_renderer():
+    assert get_renderer("depth") is render_model_with_fill_depth
+    assert get_renderer("mesh") is render_model_with_fill
+    assert get_renderer("unknown") is render_model_with_fill_depth
@@ -0,0 +1,80 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from PIL import Image
+
+from app.utils.image_encoding import LOSSLESS_PNG
+from app.utils.matryoshka import _compose_grid, create_matryoshka_collection
+
+
+def _cells(count, size=(200, 100)):
+    return [Image.new("RGBA", size, (i * 10, 0, 0, 255)) for i in range(count)]
+
+
+def _open(data):
+    return Image.open(io.BytesIO(data))
+
+
+def test_grid_packs_rows_and_columns():
+    """5 ячеек при 2 столбцах — сетка 3×2 с отступами"""
+    comp = _open(_compose_grid(_cells(5), 2, 10, (0, 0), LOSSLESS_PNG))
+
+    assert comp.size == (200 * 2 + 10, 100 * 3 + 10 * 2)
+    assert comp.getpixel((5, 5))[0] == 0
+    assert comp.getpixel((215, 5))[0] == 10
+    assert comp.getpixel((5, 225))[0] == 40
+    # Пустая ячейка последней строки остается фоном
+    assert comp.getpixel((300, 250)) == (250, 250, 250, 255)
+
+
+def test_grid_auto_columns():
+    comp = _open(_compose_grid(_cells(9), 0, 0, (0, 0), LOSSLESS_PNG))
+    assert comp.size == (600, 300)
+
+
+def test_grid_fits_max_dimensions():
+    """Ячейки уменьшаются пропорционально, чтобы холст влез в ограничения"""
+    comp = _open(_compose_grid(_cells(4), 2, 0, (200, 1000), LOSSLESS_PNG))
+
+    assert comp.width <= 200
+    assert comp.size == (200, 100)
+
+
+def test_grid_skips_failed_renders():
+    assert _compose_grid([None, None], 2, 10, (0, 0), LOSSLESS_PNG) == b""
+
+
+def fake_render(file_path, percentage, fill_color, window_size, pool=None):
+    return Image.new("RGBA", window_size, (int(percentage), 0, 0, 255))
+
+
+def test_grid_collection_parallel_matches_sequential():
+    shops = [{"title": f"Магазин {i }", "fill_percent": i} for i in range(10)]
+
+    with (
+        patch("app.utils.matryoshka.MATRYOSHKA_RENDERER", "mesh"),
+        patch("app.utils.matryoshka.render_model_with_fill", side_effect=fake_render),
+        patch("app.utils.matryoshka.sprite_table.get", return_value=None),
+        patch(
+            "app.utils.matryoshka.get_render_executor",
+            return_value=ThreadPoolExecutor(max_workers=2),
+        ),
+    ):
+        sequential, parallel = (
+            create_matryoshka_collection(
+                "model.glb",
+                shops,
+                layout="grid",
+                max_per_image=8,
+                workers=workers,
+                encoding=LOSSLESS_PNG,
+            )
+            for workers in (1, 2)
+        )
+
+    assert len(sequential) == 2
+    assert [b.getvalue() for b in sequential] == [b.getvalue() for b in parallel]
+
+    first = _open(sequential[0].getvalue())
+    assert first.width <= 2560 and first.height <= 2560
@@ -0,0 +1,92 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+import pyvista as pv
+
+from app.utils.matryoshka import ModelCache, PlotterPool, render_model_with_fill
+
+
+def _save_model(tmp_path, name, center=(5.0, 5.0, 5.0)):
+    path = str(tmp_path / name)
+    pv.Sphere(center=center).save(path)
+    return path
+
+
+def test_model_loaded_once_and_centered(tmp_path):
+    """Повторные обращения к модели не перечитывают файл"""
+    path = _save_model(tmp_path, "model.vtk")
+    cache = ModelCache(max_size=2)
+
+    with patch("app.utils.matryoshka.pv.read", wraps=pv.read) as read_mock:
+        first = cache.get(path)
+        second = cache.get(path)
+
+    assert read_mock.call_count == 1
+    assert np.allclose(first.center, (0.0, 0.0, 0.0), atol=1e-6)
+
+    # Выдаются копии: изменение одной не затрагивает кэш
+    first.translate((10.0, 0.0, 0.0), inplace=True)
+    assert np.allclose(cache.get(path).center, (0.0, 0.0, 0.0), atol=1e-6)
+    assert second is not first
+
+
+def test_model_reloaded_after_file_change(tmp_path):
+    """Изменение mtime файла приводит к перезагрузке модели"""
+    path = _save_model(tmp_path, "model.vtk")
+    cache = ModelCache(max_size=2)
+
+    with patch("app.utils.matryoshka.pv.read", wraps=pv.read) as read_mock:
+        cache.get(path)
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        cache.get(path)
+
+    assert read_mock.call_count == 2
+    assert len(cache) == 1
+
+
+def test_model_cache_lru_bound(tmp_path):
+    """Кэш не хранит больше max_size моделей и вытесняет самые старые"""
+    paths = [_save_model(tmp_path, f"model_{i }.vtk") for i in range(3)]
+    cache = ModelCache(max_size=2)
+
+    with patch("app.utils.matryoshka.pv.read", wraps=pv.read) as read_mock:
+        cache.get(paths[0])
+        cache.get(paths[1])
+        cache.get(paths[0])
+        cache.get(paths[2])
+        assert len(cache) == 2
+
+        cache.get(paths[0])
+        assert read_mock.call_count == 3
+
+        cache.get(paths[1])
+        assert read_mock.call_count == 4
+
+
+@pytest.mark.parametrize("percentage", [0, 50, 100])
+def test_render_multiblock_model(tmp_path, percentage):
+    """glTF/GLB читаются как MultiBlock — рендер с отсечением должен их поддерживать"""
+    path = str(tmp_path / "model.vtm")
+    pv.MultiBlock([pv.Sphere(), pv.Cube(center=(0.0, 1.0, 0.0))]).save(path)
+
+    with patch("app.utils.matryoshka.pv.Plotter") as plotter_cls:
+        plotter = MagicMock()
+        plotter.screenshot.return_value = np.zeros((10, 10, 4), dtype=np.uint8)
+        plotter_cls.return_value = plotter
+
+        image = render_model_with_fill(
+            path,
+            percentage,
+            (70, 130, 180, 200),
+            window_size=(10, 10),
+            pool=PlotterPool(size=1, max_uses=10),
+        )
+
+    assert image is not None
+    meshes = [call.args[0] for call in plotter.add_mesh.call_args_list]
+    assert meshes and all(isinstance(m, pv.MultiBlock) for m in meshes)
+    if percentage == 50:
+        assert len(meshes) == 2
@@ -0,0 +1,132 @@
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest.mock import patch
+
+from PIL import Image
+
+from app.utils import matryoshka
+from app.utils.image_encoding import EncodingProfile
+from app.utils.matryoshka import create_matryoshka_collection
+
+
+def fake_render(file_path, percentage, fill_color, window_size, pool=None):
+    """Рендер с разной задержкой, чтобы результаты приходили вперемешку"""
+    time.sleep(random.uniform(0, 0.02))
+    return Image.new("RGBA", window_size, (int(percentage), 0, 0, 255))
+
+
+SHOPS = [{"title": f"Магазин {i }", "fill_percent": i * 10} for i in range(7)]
+
+
+def _build(workers):
+    return create_matryoshka_collection(
+        "model.glb", SHOPS, layout="vertical", max_per_image=3, workers=workers
+    )
+
+
+def test_parallel_build_matches_sequential():
+    """Параллельная сборка дает те же изображения в том же порядке"""
+    with (
+        patch("app.utils.matryoshka.MATRYOSHKA_RENDERER", "mesh"),
+        patch("app.utils.matryoshka.render_model_with_fill", side_effect=fake_render),
+        patch("app.utils.matryoshka.sprite_table.get", return_value=None),
+        patch(
+            "app.utils.matryoshka.get_render_executor",
+            return_value=ThreadPoolExecutor(max_workers=4),
+        ) as executor_mock,
+    ):
+        sequential = _build(workers=1)
+        executor_mock.assert_not_called()
+
+        parallel = _build(workers=4)
+        executor_mock.assert_called_once_with(4)
+
+    assert len(parallel) == len(sequential) == 3
+    for par_buf, seq_buf in zip(parallel, sequential):
+        assert par_buf.getvalue() == seq_buf.getvalue()
+
+    first = Image.open(io.BytesIO(parallel[0].getvalue()))
+    assert first.getpixel((5, 5))[0] == 0
+    last = Image.open(io.BytesIO(parallel[-1].getvalue()))
+    assert last.getpixel((5, 5))[0] == 60
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Пул потоков, запоминающий задачи и типы их результатов"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+        self.results = []
+
+    def map(self, fn, *iterables, **kwargs):
+        results = list(super().map(fn, *iterables, **kwargs))
+        self.calls.append((fn, len(results)))
+        self.results.extend(results)
+        return iter(results)
+
+
+def test_parallel_build_submits_one_task_per_store():
+    """Число задач растет с числом магазинов, а из процессов приходят сжатые плитки"""
+    executor = RecordingExecutor(max_workers=4)
+    with (
+        patch("app.utils.matryoshka.MATRYOSHKA_RENDERER", "mesh"),
+        patch("app.utils.matryoshka.render_model_with_fill", side_effect=fake_render),
+        patch("app.utils.matryoshka.sprite_table.get", return_value=None),
+        patch("app.utils.matryoshka.get_render_executor", return_value=executor),
+    ):
+        buffers = _build(workers=4)
+
+    assert executor.calls == [(matryoshka._render_store_tile, len(SHOPS))]
+    assert all(isinstance(result, bytes) for result in executor.results)
+    assert len(buffers) == 3
+
+
+def test_parallel_build_falls_back_to_sequential():
+    """Если пул процессов недоступен, композиции собираются последовательно"""
+    with (
+        patch("app.utils.matryoshka.MATRYOSHKA_RENDERER", "mesh"),
+        patch("app.utils.matryoshka.render_model_with_fill", side_effect=fake_render),
+        patch("app.utils.matryoshka.sprite_table.get", return_value=None),
+        patch(
+            "app.utils.matryoshka.get_render_executor",
+            side_effect=OSError("no processes"),
+        ),
+    ):
+        buffers = _build(workers=4)
+
+    assert len(buffers) == 3
+
+
+def test_render_executor_is_reused():
+    """Пул процессов создается один раз для одинакового числа воркеров"""
+    try:
+        first = matryoshka.get_render_executor(2)
+        assert isinstance(first, ProcessPoolExecutor)
+        assert matryoshka.get_render_executor(2) is first
+        assert matryoshka.get_render_executor(3) is not first
+    finally:
+        matryoshka.shutdown_render_executor()
+
+
+def test_composition_encodes_once_without_png_round_trip():
+    """Изображения магазинов вставляются в композицию без кодирования в PNG"""
+    encoding = EncodingProfile("PNG")
+
+    with (
+        patch("app.utils.matryoshka.MATRYOSHKA_RENDERER", "mesh"),
+        patch("app.utils.matryoshka.render_model_with_fill", side_effect=fake_render),
+        patch("app.utils.matryoshka.sprite_table.get", return_value=None),
+        patch("app.utils.matryoshka.Image.open", side_effect=AssertionError("decode")),
+        patch.object(
+            EncodingProfile, "encode", autospec=True, side_effect=EncodingProfile.encode
+        ) as encode_mock,
+    ):
+        buffers = create_matryoshka_collection(
+            "model.glb", SHOPS, max_per_image=3, workers=1, encoding=encoding
+        )
+
+    assert len(buffers) == 3
+    assert encode_mock.call_count == 3
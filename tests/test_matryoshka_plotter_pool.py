@@ -0,0 +1,92 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.utils.matryoshka import PlotterPool
+
+
+@pytest.fixture
+def plotter_factory():
+    with patch("app.utils.matryoshka.pv.Plotter") as plotter_cls:
+        plotter_cls.side_effect = lambda *args, **kwargs: MagicMock()
+        yield plotter_cls
+
+
+def test_plotter_reused_between_renders(plotter_factory):
+    """Плоттер создается один раз и переиспользуется"""
+    pool = PlotterPool(size=2, max_uses=10)
+
+    with pool.acquire((100, 100)) as first:
+        pass
+    with pool.acquire((100, 100)) as second:
+        pass
+
+    assert first is second
+    assert plotter_factory.call_count == 1
+    first.clear_actors.assert_called()
+    first.close.assert_not_called()
+
+
+def test_plotter_recycled_after_max_uses(plotter_factory):
+    """После max_uses рендеров плоттер закрывается и создается новый"""
+    pool = PlotterPool(size=2, max_uses=2)
+
+    plotters = []
+    for _ in range(3):
+        with pool.acquire((100, 100)) as plotter:
+            plotters.append(plotter)
+
+    assert plotters[0] is plotters[1]
+    assert plotters[2] is not plotters[0]
+    plotters[0].close.assert_called_once()
+    assert plotter_factory.call_count == 2
+
+
+def test_plotter_pool_size_and_window_size(plotter_factory):
+    """Пул хранит не больше size плоттеров и учитывает размер окна"""
+    pool = PlotterPool(size=1, max_uses=10)
+
+    with pool.acquire((100, 100)) as small:
+        with pool.acquire((200, 200)) as large:
+            pass
+
+    assert small is not large
+    large.close.assert_not_called()
+    small.close.assert_called_once()
+
+    with pool.acquire((200, 200)) as plotter:
+        assert plotter is large
+
+
+def test_plotter_closed_on_render_error(plotter_factory):
+    """Плоттер, на котором упал рендер, не возвращается в пул"""
+    pool = PlotterPool(size=2, max_uses=10)
+
+    with pytest.raises(RuntimeError):
+        with pool.acquire((100, 100)) as broken:
+            raise RuntimeError("render failed")
+
+    broken.close.assert_called_once()
+    with pool.acquire((100, 100)) as plotter:
+        assert plotter is not broken
+
+
+def test_plotters_are_not_shared_between_threads(plotter_factory):
+    """Каждый поток получает собственные плоттеры"""
+    pool = PlotterPool(size=2, max_uses=10)
+
+    with pool.acquire((100, 100)) as main_plotter:
+        pass
+
+    other = {}
+
+    def worker():
+        with pool.acquire((100, 100)) as plotter:
+            other["plotter"] = plotter
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    assert other["plotter"] is not main_plotter
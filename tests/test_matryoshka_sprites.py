@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from PIL import Image
+
+from app.utils.matryoshka import MatryoshkaFillBuilder
+from app.utils.matryoshka_sprites import SpriteTable
+
+COLOR = (70, 130, 180, 200)
+SIZE = (40, 30)
+
+
+def fake_render(model_path, percentage, fill_color, window_size):
+    """Вместо 3D-рендера кодирует уровень заливки в цвет пикселей"""
+    return Image.new("RGBA", window_size, (percentage, 0, 0, 255))
+
+
+def _model(tmp_path, content=b"model-v1"):
+    path = tmp_path / "model.glb"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_precompute_and_get(tmp_path):
+    """Все уровни заливки доступны после предрендера"""
+    model_path = _model(tmp_path)
+    table = SpriteTable(str(tmp_path / "sprites"))
+
+    assert table.get(model_path, 50, COLOR, SIZE) is None
+    assert table.precompute(fake_render, model_path, COLOR, SIZE)
+
+    sprite = table.get(model_path, 42, COLOR, SIZE)
+    assert sprite.mode == "RGBA"
+    assert sprite.size == SIZE
+    assert sprite.getpixel((0, 0)) == (42, 0, 0, 255)
+
+    assert table.get(model_path, 150, COLOR, SIZE).getpixel((0, 0))[0] == 100
+    assert table.get(model_path, 42, COLOR, (80, 60)) is None
+    assert table.get(model_path, 42, (1, 2, 3, 4), SIZE) is None
+    assert table.get(model_path, 42, COLOR, SIZE, variant="mesh") is None
+
+
+def test_sprites_loaded_from_disk(tmp_path):
+    """Набор, сохраненный на диск, используется новым экземпляром таблицы"""
+    model_path = _model(tmp_path)
+    cache_dir = str(tmp_path / "sprites")
+    SpriteTable(cache_dir).precompute(fake_render, model_path, COLOR, SIZE)
+
+    table = SpriteTable(cache_dir)
+    assert table.has(model_path, COLOR, SIZE)
+    assert table.get(model_path, 7, COLOR, SIZE).getpixel((0, 0)) == (7, 0, 0, 255)
+
+
+def test_sprites_invalidated_by_model_change(tmp_path):
+    """Изменение файла модели меняет ключ набора"""
+    model_path = _model(tmp_path)
+    table = SpriteTable(str(tmp_path / "sprites"))
+    table.precompute(fake_render, model_path, COLOR, SIZE)
+
+    _model(tmp_path, b"model-v2-with-other-size")
+    assert table.get(model_path, 10, COLOR, SIZE) is None
+
+
+def test_builder_uses_sprite_instead_of_render(tmp_path):
+    """Построитель не рендерит 3D-модель, если спрайт уже есть"""
+    model_path = _model(tmp_path)
+    table = SpriteTable(None)
+    table.precompute(fake_render, model_path, COLOR, SIZE, variant="depth")
+
+    with (
+        patch("app.utils.matryoshka.sprite_table", table),
+        patch("app.utils.matryoshka.render_model_with_fill_depth") as render_mock,
+    ):
+        builder = MatryoshkaFillBuilder(model_path).configure(
+            fill_percent=33,
+            fill_color=COLOR,
+            render_size=SIZE,
+            renderer="depth",
+            show_percent=False,
+        )
+        builder.render_model()
+
+    render_mock.assert_not_called()
+    assert builder.result.getpixel((0, 0)) == (33, 0, 0, 255)
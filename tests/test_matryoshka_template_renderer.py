@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.utils.matryoshka import (
+    MatryoshkaFillBuilder,
+    choose_renderer,
+    get_renderer,
+    render_template_with_fill,
+)
+
+FILL = (70, 130, 180, 255)
+
+
+def _outline_template(tmp_path):
+    """Контурный рисунок без прозрачности: черный прямоугольник на белом фоне"""
+    image = Image.new("RGB", (20, 20), (255, 255, 255))
+    ImageDraw.Draw(image).rectangle((5, 0, 14, 19), outline=(0, 0, 0))
+    path = tmp_path / "template.png"
+    image.save(path)
+    return str(path)
+
+
+def _alpha_template(tmp_path):
+    """Шаблон с альфа-каналом: непрозрачна только правая половина"""
+    image = Image.new("RGBA", (20, 20), (0, 0, 0, 0))
+    image.paste((255, 255, 255, 255), (10, 0, 20, 20))
+    path = tmp_path / "template_alpha.png"
+    image.save(path)
+    return str(path)
+
+
+def test_template_fill_thresholds_rows(tmp_path):
+    """Строки силуэта ниже уровня заливки окрашиваются, фон прозрачен"""
+    image = render_template_with_fill(_outline_template(tmp_path), 50, FILL, (20, 20))
+    pixels = np.asarray(image)
+
+    assert image.mode == "RGBA"
+    assert pixels[:, :5, 3].max() == 0
+    assert pixels[:, 5:15, 3].min() == 255
+
+    # Верхняя и нижняя строки — контур прямоугольника
+    filled_rows = [row for row in range(20) if tuple(pixels[row, 10, :3]) == FILL[:3]]
+    assert filled_rows == list(range(10, 19))
+    assert tuple(pixels[5, 10, :3]) == (255, 255, 255)
+
+    # Контур остается темным и под заливкой
+    assert tuple(pixels[15, 5, :3]) == (0, 0, 0)
+
+
+def test_template_fill_uses_alpha_channel(tmp_path):
+    image = render_template_with_fill(_alpha_template(tmp_path), 100, FILL, (20, 20))
+    pixels = np.asarray(image)
+
+    assert pixels[:, :10, 3].max() == 0
+    assert tuple(pixels[0, 15]) == FILL
+    assert tuple(pixels[19, 15]) == FILL
+
+
+def test_template_fill_empty_and_full(tmp_path):
+    path = _outline_template(tmp_path)
+    empty = np.asarray(render_template_with_fill(path, -5, FILL, (20, 20)))
+    full = np.asarray(render_template_with_fill(path, 100, FILL, (20, 20)))
+
+    assert not (empty[:, 6:14, :3] == FILL[:3]).all(axis=-1).any()
+    assert (full[1:19, 6:14, :3] == FILL[:3]).all()
+
+
+def test_template_keeps_aspect_ratio(tmp_path):
+    image = render_template_with_fill(_outline_template(tmp_path), 50, FILL, (40, 20))
+    pixels = np.asarray(image)
+
+    assert image.size == (40, 20)
+    assert pixels[:, :10, 3].max() == 0
+    assert pixels[:, 30:, 3].max() == 0
+
+
+def test_template_missing_file():
+    assert render_template_with_fill("/nonexistent/template.png", 10, FILL) is None
+
+
+def test_builder_renders_template(tmp_path):
+    """Построитель рендерит 2D-шаблон, не обращаясь к 3D-модели"""
+    template_path = _outline_template(tmp_path)
+
+    with patch("app.utils.matryoshka.render_model_with_fill_depth") as depth_mock:
+        builder = MatryoshkaFillBuilder("/nonexistent/model.glb").configure(
+            fill_percent=50,
+            fill_color=FILL,
+            render_size=(20, 20),
+            renderer="template",
+            template_path=template_path,
+            use_sprites=False,
+            show_percent=False,
+        )
+        builder.render_model()
+
+    depth_mock.assert_not_called()
+    assert builder.result.getpixel((10, 15)) == FILL
+
+
+def test_choose_renderer(tmp_path):
+    model_path = tmp_path / "model.glb"
+    assert choose_renderer(str(model_path), "depth") == "template"
+
+    model_path.write_bytes(b"glb")
+    assert choose_renderer(str(model_path), "depth") == "depth"
+
+    with patch("app.utils.matryoshka.pv", None):
+        assert choose_renderer(str(model_path), "mesh") == "template"
+        assert get_renderer("depth") is render_template_with_fill
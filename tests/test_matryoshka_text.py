@@ -0,0 +1,48 @@
+import os
+
+from PIL import Image
+
+from app.utils.matryoshka import MatryoshkaFillBuilder, get_font, get_text_bbox
+
+
+def test_font_loaded_once_and_independent_of_cwd(tmp_path):
+    """Шрифт ищется в каталоге ресурсов пакета и кэшируется по (путь, размер)"""
+    builder = MatryoshkaFillBuilder("model.glb")
+    font_path = builder.config["font_path"]
+    assert os.path.isabs(font_path)
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path)
+    try:
+        get_font.cache_clear()
+        font = get_font(font_path, 50)
+    finally:
+        os.chdir(cwd)
+
+    assert get_font(font_path, 50) is font
+    assert get_font(font_path, 36) is not font
+    assert get_font.cache_info().misses == 2
+
+
+def test_missing_font_falls_back_to_default():
+    assert get_font("/nonexistent/font.ttf", 20) is not None
+
+
+def test_text_bbox_cached():
+    font_path = MatryoshkaFillBuilder("model.glb").config["font_path"]
+    get_text_bbox.cache_clear()
+
+    bbox = get_text_bbox(font_path, 50, "57%")
+    assert bbox == get_font(font_path, 50).getbbox("57%")
+    assert get_text_bbox(font_path, 50, "57%") == bbox
+    assert get_text_bbox.cache_info().hits == 1
+
+
+def test_percentage_text_draws_background_in_text_area():
+    builder = MatryoshkaFillBuilder("model.glb").configure(fill_percent=42)
+    builder.result = Image.new("RGBA", (300, 300), (0, 0, 0, 0))
+    builder.add_percentage_text()
+
+    assert builder.result.size == (300, 300)
+    assert builder.result.getpixel((16, 30))[3] > 0
+    assert builder.result.getpixel((299, 299)) == (0, 0, 0, 0)
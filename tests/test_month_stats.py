@@ -0,0 +1,60 @@
+import pytest
+from datetime import date
+from app.services.store_service import StoreService
+from app.services.user_service import UserService
+from app.services.revenue_service import RevenueService
+
+
+@pytest.mark.asyncio
+async def test_get_month_stats_matches_per_store_queries(session):
+    """Пакетная статистика совпадает с расчетом по каждому магазину"""
+
+    store_svc = StoreService(session)
+    user_svc = UserService(session)
+    rev_svc = RevenueService(session)
+
+    today = date.today()
+    prev_month = today.month - 1 if today.month > 1 else 12
+    prev_year = today.year if today.month > 1 else today.year - 1
+
+    with_plan = await store_svc.get_or_create("StatsPlanStore")
+    fallback = await store_svc.get_or_create("StatsFallbackStore")
+    empty = await store_svc.get_or_create("StatsEmptyStore")
+    fallback.plan = 5000.0
+    await session.commit()
+
+    manager = await user_svc.get_or_create(
+        "Stats", "Manager", "manager", store_id=with_plan.id
+    )
+
+    await rev_svc.set_monthly_plan(with_plan.id, today.month, today.year, 3000.0)
+    await rev_svc.set_monthly_plan(fallback.id, prev_month, prev_year, 9999.0)
+
+    await rev_svc.create_revenue(300.0, with_plan.id, manager.id, today)
+    await rev_svc.create_revenue(700.0, with_plan.id, manager.id, today)
+    await rev_svc.create_revenue(
+        400.0, fallback.id, manager.id, date(prev_year, prev_month, 15)
+    )
+
+    stats = {s["store_id"]: s for s in await rev_svc.get_month_stats()}
+
+    assert set(stats) == {with_plan.id, fallback.id, empty.id}
+    for store in (with_plan, fallback, empty):
+        assert stats[store.id]["total"] == await rev_svc.get_month_total(store.id)
+        assert stats[store.id]["plan"] == await rev_svc.get_monthly_plan(
+            store.id, today.month, today.year
+        )
+
+    assert stats[with_plan.id]["plan"] == 3000.0
+    assert stats[fallback.id]["plan"] == 5000.0
+    assert stats[with_plan.id]["last_revenue"] == {
+        "amount": 700.0,
+        "date": today.isoformat(),
+    }
+    assert stats[fallback.id]["last_revenue"] == {"amount": 0.0, "date": None}
+
+    prev_stats = {
+        s["store_id"]: s for s in await rev_svc.get_month_stats(prev_month, prev_year)
+    }
+    assert prev_stats[fallback.id]["total"] == 400.0
+    assert prev_stats[fallback.id]["plan"] == 9999.0
@@ -0,0 +1,91 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.utils.rate_limit import TelegramRateLimiter, TokenBucket
+from app.utils.report_delivery import fan_out
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    """После исчерпания запаса токены выдаются со скоростью rate"""
+    loop = asyncio.get_running_loop()
+    bucket = TokenBucket(rate=20, capacity=2)
+
+    start = loop.time()
+    for _ in range(6):
+        await bucket.acquire()
+    elapsed = loop.time() - start
+
+    # 2 токена сразу, еще 4 — по 1/20 секунды
+    assert 0.18 <= elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_chat_limit_is_per_chat():
+    """Лимит на чат не задерживает отправку в другие чаты"""
+    loop = asyncio.get_running_loop()
+    limiter = TelegramRateLimiter(rate=1000, chat_rate=5, chat_burst=1)
+
+    start = loop.time()
+    await asyncio.gather(*(limiter.acquire(chat_id) for chat_id in range(20)))
+    assert loop.time() - start < 0.1
+
+    start = loop.time()
+    await limiter.acquire(1)
+    assert loop.time() - start >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honored():
+    limiter = TelegramRateLimiter(rate=1000, chat_rate=1000, max_retries=2)
+    calls = 0
+
+    async def request():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise TelegramRetryAfter(MagicMock(), "Flood control", retry_after=0.1)
+        return "ok"
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    assert await limiter.call(42, request) == "ok"
+    assert calls == 2
+    assert loop.time() - start >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_gives_up():
+    limiter = TelegramRateLimiter(rate=1000, chat_rate=1000, max_retries=1)
+
+    async def request():
+        raise TelegramRetryAfter(MagicMock(), "Flood control", retry_after=0)
+
+    with pytest.raises(TelegramRetryAfter):
+        await limiter.call(42, request)
+
+
+@pytest.mark.asyncio
+async def test_fan_out_primes_then_runs_concurrently():
+    """Первые получатели обслуживаются по одному до первой успешной доставки"""
+    order = []
+    running = 0
+    max_running = 0
+
+    async def deliver(chat_id):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        order.append(chat_id)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return chat_id != 1
+
+    await fan_out(range(1, 11), deliver, concurrency=3)
+
+    assert order[:2] == [1, 2]
+    assert sorted(order) == list(range(1, 11))
+    assert max_running == 3
@@ -0,0 +1,106 @@
+import io
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import BufferedInputFile, InputMediaPhoto
+
+from app.utils.report_delivery import (
+    ReportDocument,
+    answer_report_photos,
+    build_report_photos,
+    send_report_document,
+    send_report_photos,
+)
+
+
+def _photos(count, stores_per_image=2):
+    shops = [{"title": f"Магазин {i }"} for i in range(count * stores_per_image)]
+    buffers = [io.BytesIO(b"img%d" % i) for i in range(count)]
+    return build_report_photos(buffers, shops, stores_per_image, "jpg")
+
+
+def test_build_report_photos_captions():
+    photos = _photos(2)
+
+    assert [p.filename for p in photos] == [
+        "report_matryoshka_1.jpg",
+        "report_matryoshka_2.jpg",
+    ]
+    assert photos[1].caption == "📊 Выполнение плана: Магазин 2, Магазин 3"
+    assert photos[0].data == b"img0"
+
+
+@pytest.mark.asyncio
+async def test_send_report_photos_in_albums():
+    """23 изображения уходят тремя запросами: 10 + 10 + 3"""
+    bot = AsyncMock()
+    await send_report_photos(bot, 42, _photos(23))
+
+    assert bot.send_media_group.call_count == 3
+    bot.send_photo.assert_not_called()
+
+    sizes = [len(call.args[1]) for call in bot.send_media_group.call_args_list]
+    assert sizes == [10, 10, 3]
+    first = bot.send_media_group.call_args_list[0].args[1][0]
+    assert isinstance(first, InputMediaPhoto)
+    assert first.caption == "📊 Выполнение плана: Магазин 0, Магазин 1"
+    assert all(call.args[0] == 42 for call in bot.send_media_group.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_single_photo_sent_without_album():
+    bot = AsyncMock()
+    await send_report_photos(bot, 42, _photos(11))
+
+    bot.send_media_group.assert_called_once()
+    bot.send_photo.assert_called_once()
+    assert bot.send_photo.call_args.args[0] == 42
+
+
+@pytest.mark.asyncio
+async def test_answer_report_photos():
+    message = AsyncMock()
+    await answer_report_photos(message, _photos(3))
+
+    message.answer_media_group.assert_called_once()
+    message.answer_photo.assert_not_called()
+
+
+def _sent_photo(file_id):
+    sizes = [SimpleNamespace(file_id="thumb"), SimpleNamespace(file_id=file_id)]
+    return SimpleNamespace(photo=sizes)
+
+
+@pytest.mark.asyncio
+async def test_files_uploaded_once_then_sent_by_file_id():
+    """Первому получателю уходят файлы, остальным — только file_id"""
+    bot = AsyncMock()
+    bot.send_media_group.return_value = [_sent_photo("photo-1"), _sent_photo("photo-2")]
+    bot.send_document.return_value = SimpleNamespace(
+        document=SimpleNamespace(file_id="doc-1")
+    )
+
+    photos = _photos(2)
+    document = ReportDocument(b"xlsx", "revenue_report.xlsx", "Отчет")
+
+    for chat_id in (1, 2):
+        await send_report_document(bot, chat_id, document)
+        await send_report_photos(bot, chat_id, photos)
+
+    first_doc, second_doc = bot.send_document.call_args_list
+    assert isinstance(first_doc.args[1], BufferedInputFile)
+    assert second_doc.args[1] == "doc-1"
+
+    first_album, second_album = bot.send_media_group.call_args_list
+    assert isinstance(first_album.args[1][0].media, BufferedInputFile)
+    assert [m.media for m in second_album.args[1]] == ["photo-1", "photo-2"]
+
+
+@pytest.mark.asyncio
+async def test_file_id_not_captured_from_unexpected_response():
+    bot = AsyncMock()
+    photos = _photos(1)
+
+    await send_report_photos(bot, 1, photos)
+    assert photos[0].file_id is None
@@ -2,6 +2,7 @@ import pytest
 import pandas as pd
 import io
 from unittest.mock import patch
+from app.repositories.revenue_repository import RevenueRepository
 from app.services.revenue_service import RevenueService
 
 
@@ -38,9 +39,20 @@ async def test_excel_report_structure(session):
         },
     ]
 
+    test_summary = [
+        {"store_name": "Магазин №1", "total": 2200.0, "plan": 5000.0},
+        {"store_name": "Магазин №2", "total": 1650.0, "plan": 4000.0},
+    ]
+
+    async def stream_rows(*args, **kwargs):
+        yield [
+            (row["store_name"], row["date"], row["amount"], row["plan"])
+            for row in test_data
+        ]
+
     with patch.object(
-        RevenueService, "_get_revenue_for_report", return_value=test_data
-    ):
+        RevenueRepository, "stream_report_rows", stream_rows
+    ), patch.object(RevenueService, "_get_report_summary", return_value=test_summary):
 
         excel_bytes, _ = await service.export_report()
 
@@ -64,6 +76,7 @@ async def test_excel_report_structure(session):
         assert "План" in df_summary.columns
         assert "% выполнения" in df_summary.columns
         assert len(df_summary) == 2
+        assert df_summary["% выполнения"].tolist() == [44.0, 41.2]
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.utils.report_jobs import ReportProgress, report_job, run_report_stage
+
+
+@pytest.mark.asyncio
+async def test_report_stage_does_not_block_event_loop():
+    """CPU-этап выполняется в отдельном потоке, цикл событий продолжает работать"""
+    ticks = 0
+    stop = asyncio.Event()
+
+    async def ticker():
+        nonlocal ticks
+        while not stop.is_set():
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    def slow_stage(value):
+        time.sleep(0.2)
+        return value * 2, threading.current_thread().name
+
+    ticker_task = asyncio.create_task(ticker())
+    result, thread_name = await run_report_stage(slow_stage, 21)
+    stop.set()
+    await ticker_task
+
+    assert result == 42
+    assert thread_name.startswith("report")
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_report_jobs_are_bounded():
+    """Одновременно строится не больше REPORT_JOB_CONCURRENCY отчетов"""
+    running = 0
+    max_running = 0
+
+    async def job(progress):
+        nonlocal running, max_running
+        async with report_job(progress):
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+
+    first = ReportProgress(AsyncMock())
+    second = ReportProgress(AsyncMock())
+
+    with patch("app.utils.report_jobs.REPORT_JOB_CONCURRENCY", 1):
+        await asyncio.gather(job(first), job(second))
+
+    assert max_running == 1
+    first.message.edit_text.assert_not_called()
+    second.message.edit_text.assert_called_once()
+    assert "очередь" in second.message.edit_text.call_args[0][0]
+
+
+@pytest.mark.asyncio
+async def test_report_progress_updates_message():
+    """Прогресс редактирует сообщение только при смене текста и не падает на ошибках"""
+    message = AsyncMock()
+    progress = ReportProgress(message)
+
+    await progress.update("Этап 1")
+    await progress.update("Этап 1")
+    await progress.update("Этап 2")
+    assert message.edit_text.call_count == 2
+
+    message.delete.side_effect = Exception("message to delete not found")
+    await progress.delete()
+
+    await ReportProgress(None).update("Без сообщения")
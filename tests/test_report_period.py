@@ -0,0 +1,85 @@
+import io
+import pytest
+import pandas as pd
+from datetime import date
+from app.services.store_service import StoreService
+from app.services.user_service import UserService
+from app.services.revenue_service import RevenueService
+from app.utils.report_period import ReportPeriod
+
+
+def test_parse_report_period():
+    today = date.today()
+    assert ReportPeriod.parse(None) == ReportPeriod.current_month(today)
+    assert ReportPeriod.parse("all") == ReportPeriod.all_time()
+    assert ReportPeriod.parse("2024-02") == ReportPeriod(date(2024, 2, 1), date(2024, 2, 29))
+    assert ReportPeriod.parse("05.2024") == ReportPeriod.month(2024, 5)
+    assert ReportPeriod.parse("01.05.2024 2024-06-15") == ReportPeriod(
+        date(2024, 5, 1), date(2024, 6, 15)
+    )
+    assert ReportPeriod.parse("01.05.2024 2024-06-15").months() == [
+        date(2024, 5, 1),
+        date(2024, 6, 1),
+    ]
+    assert ReportPeriod.parse("01.05.2024 2024-06-15").month_weights() == [
+        (date(2024, 5, 1), 1.0),
+        (date(2024, 6, 1), 0.5),
+    ]
+
+    with pytest.raises(ValueError):
+        ReportPeriod.parse("вчера")
+    with pytest.raises(ValueError):
+        ReportPeriod.parse("2024-06-15 01.05.2024")
+
+
+@pytest.mark.asyncio
+async def test_export_report_is_scoped_to_period(session):
+    """Детали и сводка ограничены периодом, план берется из планов месяцев"""
+
+    store_svc = StoreService(session)
+    user_svc = UserService(session)
+    rev_svc = RevenueService(session)
+
+    store = await store_svc.get_or_create("PeriodStore")
+    store.plan = 1000.0
+    await session.commit()
+    manager = await user_svc.get_or_create(
+        "Period", "Manager", "manager", store_id=store.id
+    )
+
+    await rev_svc.set_monthly_plan(store.id, 5, 2024, 4000.0)
+    await rev_svc.create_revenue(300.0, store.id, manager.id, date(2024, 4, 30))
+    await rev_svc.create_revenue(500.0, store.id, manager.id, date(2024, 5, 10))
+    await rev_svc.create_revenue(700.0, store.id, manager.id, date(2024, 6, 1))
+
+    excel_bytes, _ = await rev_svc.export_report(ReportPeriod.month(2024, 5))
+    excel_file = pd.ExcelFile(io.BytesIO(excel_bytes))
+    details = pd.read_excel(excel_file, "Выручка по дням")
+    summary = pd.read_excel(excel_file, "Сводка по магазинам")
+
+    assert details["Выручка"].tolist() == [500.0]
+    assert summary.to_dict("records") == [
+        {
+            "Магазин": "PeriodStore",
+            "Общая выручка": 500.0,
+            "План": 4000.0,
+            "% выполнения": 12.5,
+        }
+    ]
+
+    # Май с планом месяца и июнь с планом магазина по умолчанию
+    summary_rows = await rev_svc._get_report_summary(
+        ReportPeriod(date(2024, 5, 1), date(2024, 6, 30))
+    )
+    assert summary_rows == [
+        {"store_name": "PeriodStore", "total": 1200.0, "plan": 5000.0}
+    ]
+
+    # Неполные месяцы: план пропорционален дням периода
+    summary_rows = await rev_svc._get_report_summary(
+        ReportPeriod(date(2024, 5, 17), date(2024, 6, 15))
+    )
+    assert summary_rows[0]["plan"] == pytest.approx(4000.0 * 15 / 31 + 1000.0 * 15 / 30)
+
+    period = await rev_svc.resolve_period(ReportPeriod.all_time())
+    assert period == ReportPeriod(date(2024, 4, 30), date(2024, 6, 1))
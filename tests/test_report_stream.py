@@ -0,0 +1,45 @@
+import pytest
+from datetime import date
+from app.services.store_service import StoreService
+from app.services.user_service import UserService
+from app.services.revenue_service import RevenueService
+
+
+@pytest.mark.asyncio
+async def test_iter_revenue_for_report_yields_chunks(session):
+    """Строки отчета читаются порциями одним запросом с JOIN"""
+
+    store_svc = StoreService(session)
+    user_svc = UserService(session)
+    rev_svc = RevenueService(session)
+
+    first = await store_svc.get_or_create("StreamA")
+    second = await store_svc.get_or_create("StreamB")
+    second.plan = 1200.0
+    await session.commit()
+    manager = await user_svc.get_or_create(
+        "Stream", "Manager", "manager", store_id=first.id
+    )
+
+    for day in (1, 2, 3):
+        await rev_svc.create_revenue(100.0 * day, first.id, manager.id, date(2024, 5, day))
+    for day in (1, 2):
+        await rev_svc.create_revenue(50.0 * day, second.id, manager.id, date(2024, 5, day))
+
+    chunks = [chunk async for chunk in rev_svc.iter_revenue_for_report(chunk_size=2)]
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    rows = [row for chunk in chunks for row in chunk]
+    assert rows[0] == {
+        "store_name": "StreamA",
+        "date": "2024-05-01",
+        "amount": 100.0,
+        "plan": 0.0,
+    }
+    assert rows[-1] == {
+        "store_name": "StreamB",
+        "date": "2024-05-02",
+        "amount": 100.0,
+        "plan": 1200.0,
+    }
+    assert await rev_svc._get_revenue_for_report() == rows
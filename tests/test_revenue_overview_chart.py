@@ -0,0 +1,57 @@
+import io
+from datetime import date
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.revenue_service import RevenueService
+from app.services.store_service import StoreService
+from app.services.user_service import UserService
+from app.utils.charts import OVERVIEW_CHART_KEY, pivot_store_series
+
+
+def test_pivot_store_series():
+    data = [
+        {"store_name": "B", "date": "2024-05-03", "amount": 30.0},
+        {"store_name": "A", "date": "2024-05-01", "amount": 10.0},
+        {"store_name": "A", "date": date(2024, 5, 3), "amount": 5.0},
+        {"store_name": "A", "date": "2024-05-03", "amount": 7.0},
+    ]
+
+    stores, days, values = pivot_store_series(data)
+
+    assert stores == ["A", "B"]
+    assert days.tolist() == [date(2024, 5, 1), date(2024, 5, 2), date(2024, 5, 3)]
+    np.testing.assert_array_equal(
+        values, [[10.0, np.nan, 12.0], [np.nan, np.nan, 30.0]]
+    )
+
+
+@pytest.mark.asyncio
+async def test_export_report_overview_chart(session):
+    """Сводный режим дает одно изображение на любое число магазинов"""
+
+    store_svc = StoreService(session)
+    user_svc = UserService(session)
+    rev_svc = RevenueService(session)
+
+    manager = await user_svc.get_or_create("Overview", "Manager", "manager")
+    today = date.today()
+    for i in range(4):
+        store = await store_svc.get_or_create(f"OverviewStore{i }")
+        store.plan = 1000.0
+        await session.commit()
+        await rev_svc.create_revenue(100.0 * (i + 1), store.id, manager.id, today)
+
+    _, images = await rev_svc.export_report(include_charts=True, chart_mode="overview")
+
+    assert list(images) == [OVERVIEW_CHART_KEY]
+    image = Image.open(io.BytesIO(images[OVERVIEW_CHART_KEY]))
+    assert image.format == "PNG"
+
+    # Тот же график строит конвейер отчета при REPORT_CHART_MODE=overview
+    with patch("app.services.revenue_service.REPORT_CHART_MODE", "overview"):
+        charts = await rev_svc.render_report_charts()
+    assert list(charts) == [OVERVIEW_CHART_KEY]
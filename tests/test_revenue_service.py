@@ -2,6 +2,7 @@ import pytest
 from datetime import date
 from openpyxl import load_workbook
 import io
+from unittest.mock import patch
 
 from app.services.user_service import UserService
 from app.services.store_service import StoreService
@@ -26,7 +27,7 @@ async def test_revenue_service(session):
     assert revenue.store_id == store.id
     assert revenue.manager_id == user.id
 
-    excel_bytes, images = await rev_svc.export_report()
+    excel_bytes, images = await rev_svc.export_report(include_charts=True)
     assert isinstance(excel_bytes, (bytes, bytearray))
 
     wb = load_workbook(filename=io.BytesIO(excel_bytes))
@@ -37,3 +38,25 @@ async def test_revenue_service(session):
     assert isinstance(images, dict)
     assert "Store1" in images
     assert isinstance(images["Store1"], (bytes, bytearray))
+
+
+@pytest.mark.asyncio
+async def test_export_report_skips_charts_by_default(session):
+    user_svc = UserService(session)
+    store_svc = StoreService(session)
+    rev_svc = RevenueService(session)
+
+    user = await user_svc.get_or_create("Chart", "Less", "manager")
+    store = await store_svc.get_or_create("ChartlessStore")
+    await rev_svc.create_revenue(150.0, store.id, user.id, date.today())
+
+    with patch("app.services.revenue_service.render_revenue_chart") as render:
+        excel_bytes, images = await rev_svc.export_report()
+
+    assert excel_bytes
+    assert images == {}
+    render.assert_not_called()
+
+    charts = await rev_svc.render_store_charts()
+    assert list(charts) == ["ChartlessStore"]
+    assert charts["ChartlessStore"].startswith(b"\x89PNG")
@@ -7,7 +7,13 @@ from apscheduler.triggers.cron import CronTrigger
 from unittest.mock import AsyncMock, patch
 from aiogram import Bot
 
-from app.utils.scheduler import schedule_daily_report, send_daily_report
+from app.services.user_service import merge_report_recipients
+from app.utils.scheduler import (
+    DAILY_REPORT_JOB_ID,
+    PREPARE_REPORT_JOB_ID,
+    schedule_daily_report,
+    send_daily_report,
+)
 from app.core.config import ADMIN_CHAT_IDS
 
 
@@ -15,9 +21,8 @@ def test_schedule_daily_report_trigger_timezone():
     """Проверка, что задача запланирована на 22:30 по МСК"""
     fake_bot = AsyncMock(spec=Bot)
     scheduler: AsyncIOScheduler = schedule_daily_report(fake_bot)
-    jobs = scheduler.get_jobs()
-    assert len(jobs) == 1
-    job = jobs[0]
+    job = scheduler.get_job(DAILY_REPORT_JOB_ID)
+    assert job is not None
     trigger = job.trigger
 
     assert isinstance(trigger, CronTrigger)
@@ -32,6 +37,19 @@ def test_schedule_daily_report_trigger_timezone():
     assert getattr(tz, "zone", str(tz)) == "Europe/Moscow"
 
 
+def test_schedule_prepare_stage_before_delivery():
+    """Подготовка отчета запланирована за заданное время до рассылки"""
+    fake_bot = AsyncMock(spec=Bot)
+    scheduler = schedule_daily_report(fake_bot, hour=0, minute=10, prepare_lead_minutes=20)
+    trigger_str = str(scheduler.get_job(PREPARE_REPORT_JOB_ID).trigger)
+
+    assert "hour='23'" in trigger_str
+    assert "minute='50'" in trigger_str
+
+    scheduler = schedule_daily_report(fake_bot, prepare_lead_minutes=0)
+    assert scheduler.get_job(PREPARE_REPORT_JOB_ID) is None
+
+
 @pytest.mark.asyncio
 async def test_send_daily_report():
     """Тест отправки отчета админам"""
@@ -42,7 +60,6 @@ async def test_send_daily_report():
     fake_bot.send_message = AsyncMock()
 
     excel_data = b"excelbytes"
-    images_data = {"chart1.png": b"img1", "chart2.png": b"img2"}
     shops_data = [
         {"title": "Магазин 1", "fill_percent": 80},
         {"title": "Магазин 2", "fill_percent": 60},
@@ -51,8 +68,8 @@ async def test_send_daily_report():
     matryoshka_buffer = io.BytesIO(b"matryoshka_data")
 
     class DummyRevService:
-        async def export_report(self):
-            return excel_data, images_data
+        async def export_report_stream(self):
+            return io.BytesIO(excel_data)
 
         async def get_matryoshka_data(self):
             return shops_data
@@ -82,6 +99,9 @@ async def test_send_daily_report():
         async def get_all_users(self):
             return dummy_users
 
+        async def get_report_recipients(self, admin_chat_ids):
+            return merge_report_recipients(admin_chat_ids, dummy_users)
+
     with (
         patch("app.utils.scheduler.get_session", return_value=mock_session_cm),
         patch("app.utils.scheduler.RevenueService", return_value=DummyRevService()),
@@ -91,7 +111,6 @@ async def test_send_daily_report():
             "app.utils.scheduler.create_matryoshka_collection",
             return_value=[matryoshka_buffer],
         ),
-        patch("app.utils.scheduler.os.path.exists", return_value=True),
     ):
         await send_daily_report(fake_bot)
 
@@ -4,6 +4,7 @@ import logging
 from unittest.mock import AsyncMock, patch
 from aiogram import Bot
 from types import SimpleNamespace
+from app.services.user_service import merge_report_recipients
 from app.utils.scheduler import send_daily_report
 
 
@@ -19,7 +20,6 @@ async def test_send_daily_report_detailed_logging(caplog):
     fake_bot.send_message = AsyncMock()
 
     excel_data = b"excelbytes"
-    images_data = {"chart1.png": b"img1", "chart2.png": b"img2"}
     shops_data = [
         {"title": "Магазин А", "fill_percent": 90},
         {"title": "Магазин Б", "fill_percent": 70},
@@ -28,8 +28,8 @@ async def test_send_daily_report_detailed_logging(caplog):
     matryoshka_buffer = io.BytesIO(b"matryoshka_data")
 
     class DummyRevService:
-        async def export_report(self):
-            return excel_data, images_data
+        async def export_report_stream(self):
+            return io.BytesIO(excel_data)
 
         async def get_matryoshka_data(self):
             return shops_data
@@ -72,6 +72,9 @@ async def test_send_daily_report_detailed_logging(caplog):
         async def get_all_users(self):
             return dummy_users
 
+        async def get_report_recipients(self, admin_chat_ids):
+            return merge_report_recipients(admin_chat_ids, dummy_users)
+
     config_admin_ids = [100100, 200200]
 
     with (
@@ -83,7 +86,6 @@ async def test_send_daily_report_detailed_logging(caplog):
             "app.utils.scheduler.create_matryoshka_collection",
             return_value=[matryoshka_buffer],
         ),
-        patch("app.utils.scheduler.os.path.exists", return_value=True),
     ):
         await send_daily_report(fake_bot)
 
@@ -159,13 +161,12 @@ async def test_send_daily_report_error_logging(caplog):
     fake_bot.send_message = AsyncMock()
 
     excel_data = b"excelbytes"
-    images_data = {"chart1.png": b"img1"}
     shops_data = [{"title": "Магазин", "fill_percent": 85}]
     matryoshka_buffer = io.BytesIO(b"matryoshka_data")
 
     class DummyRevService:
-        async def export_report(self):
-            return excel_data, images_data
+        async def export_report_stream(self):
+            return io.BytesIO(excel_data)
 
         async def get_matryoshka_data(self):
             return shops_data
@@ -187,6 +188,9 @@ async def test_send_daily_report_error_logging(caplog):
         async def get_all_users(self):
             return dummy_users
 
+        async def get_report_recipients(self, admin_chat_ids):
+            return merge_report_recipients(admin_chat_ids, dummy_users)
+
     with (
         patch("app.utils.scheduler.get_session", return_value=mock_session_cm),
         patch("app.utils.scheduler.RevenueService", return_value=DummyRevService()),
@@ -196,7 +200,6 @@ async def test_send_daily_report_error_logging(caplog):
             "app.utils.scheduler.create_matryoshka_collection",
             return_value=[matryoshka_buffer],
         ),
-        patch("app.utils.scheduler.os.path.exists", return_value=True),
     ):
         await send_daily_report(fake_bot)
 
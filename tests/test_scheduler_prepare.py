@@ -0,0 +1,202 @@
+import asyncio
+import datetime
+import io
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiogram import Bot
+
+import app.utils.scheduler as scheduler
+from app.services.user_service import merge_report_recipients
+from app.utils.cache import RedisMock
+from app.utils.scheduler import (
+    prepare_daily_report,
+    run_daily_report_job,
+    run_prepare_report_job,
+    send_daily_report,
+)
+
+
+class DummyRevService:
+    """Сервис выручки, считающий обращения и отдающий заданный отпечаток"""
+
+    fingerprint = ("2026-10-17", 1, 100.0)
+    builds = 0
+    # Если задано, первая сборка ждет этого события
+    hold: "asyncio.Event | None" = None
+
+    def __init__(self, session):
+        pass
+
+    async def export_report_stream(self):
+        hold, DummyRevService.hold = DummyRevService.hold, None
+        if hold is not None:
+            await hold.wait()
+        DummyRevService.builds += 1
+        return io.BytesIO(b"excel")
+
+    async def get_matryoshka_data(self):
+        return [{"title": "Магазин 1", "fill_percent": 50}]
+
+    async def get_data_fingerprint(self):
+        return DummyRevService.fingerprint
+
+    async def render_report_charts(self, period=None, chart_mode=None):
+        return {"Все магазины": b"chart"}
+
+
+class DummyUserService:
+    def __init__(self, session):
+        pass
+
+    async def get_report_recipients(self, admin_chat_ids):
+        return merge_report_recipients(admin_chat_ids, [])
+
+
+@pytest.fixture
+def report_env():
+    DummyRevService.builds = 0
+    DummyRevService.hold = None
+    DummyRevService.fingerprint = ("2026-10-17", 1, 100.0)
+    session_cm = AsyncMock()
+    with (
+        patch("app.utils.scheduler.get_session", return_value=session_cm),
+        patch("app.utils.scheduler.RevenueService", DummyRevService),
+        patch("app.utils.scheduler.UserService", DummyUserService),
+        patch(
+            "app.utils.scheduler.create_matryoshka_collection",
+            side_effect=lambda *a, **kw: [io.BytesIO(b"img")],
+        ),
+        patch("app.utils.scheduler.ADMIN_CHAT_IDS", [100]),
+        patch("app.utils.scheduler._prepared_report", None),
+        patch("app.utils.scheduler._prepare_task", None),
+        patch("app.utils.scheduler._prepare_lease", None),
+        patch("app.utils.distributed_lock.redis_client", RedisMock()) as redis,
+        patch("app.utils.scheduler.redis_client", redis),
+    ):
+        yield
+
+
+@pytest.mark.asyncio
+async def test_prepared_report_is_sent_without_rebuilding(report_env):
+    await prepare_daily_report()
+    assert DummyRevService.builds == 1
+
+    bot = AsyncMock(spec=Bot)
+    await send_daily_report(bot)
+
+    assert DummyRevService.builds == 1
+    assert bot.send_document.call_count == 1
+    assert scheduler._prepared_report is None
+
+
+@pytest.mark.asyncio
+async def test_report_is_rebuilt_when_data_changed(report_env):
+    await prepare_daily_report()
+    DummyRevService.fingerprint = ("2026-10-17", 2, 150.0)
+
+    bot = AsyncMock(spec=Bot)
+    await send_daily_report(bot)
+
+    assert DummyRevService.builds == 2
+    assert bot.send_document.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_recipients_enqueued_after_fan_out(report_env):
+    """При недоступном Telegram в очередь попадают все получатели, с документом"""
+    bot = AsyncMock(spec=Bot)
+    bot.send_document.side_effect = Exception("Telegram API Error")
+    enqueue = AsyncMock()
+
+    with (
+        patch("app.utils.scheduler.ADMIN_CHAT_IDS", [100, 200]),
+        patch("app.utils.scheduler.enqueue_failed_deliveries", enqueue),
+    ):
+        await send_daily_report(bot)
+
+    enqueue.assert_called_once()
+    (failures,) = enqueue.call_args.args
+    assert [failure[0] for failure in failures] == [100, 200]
+    for _, document, photos, error in failures:
+        assert document.data == b"excel"
+        assert len(photos) == 1
+        assert error == "Telegram API Error"
+
+
+@pytest.mark.asyncio
+async def test_send_job_waits_for_running_prepare(report_env):
+    """Рассылка дожидается идущей подготовки, а не строит отчет второй раз"""
+    DummyRevService.hold = hold = asyncio.Event()
+    bot = AsyncMock(spec=Bot)
+
+    prepare = asyncio.create_task(run_prepare_report_job())
+    await asyncio.sleep(0.01)
+    send = asyncio.create_task(run_daily_report_job(bot))
+    await asyncio.sleep(0.01)
+    assert not send.done()
+
+    hold.set()
+    await asyncio.gather(prepare, send)
+
+    assert DummyRevService.builds == 1
+    assert bot.send_document.call_count == 1
+    assert scheduler._prepared_report is None
+
+
+@pytest.mark.asyncio
+async def test_send_job_rebuilds_when_prepare_is_too_slow(report_env):
+    """Зависшая подготовка отменяется, и ее поздний результат не остается в памяти"""
+    DummyRevService.hold = asyncio.Event()
+    bot = AsyncMock(spec=Bot)
+
+    with patch("app.utils.scheduler.REPORT_PREPARE_WAIT", 0.01):
+        prepare = asyncio.create_task(run_prepare_report_job())
+        await asyncio.sleep(0.01)
+        await run_daily_report_job(bot)
+        await prepare
+
+    assert DummyRevService.builds == 1
+    assert bot.send_document.call_count == 1
+    assert scheduler._prepared_report is None
+
+
+@pytest.mark.asyncio
+async def test_prepared_report_dated_by_moscow_day(report_env):
+    """Актуальность отчета проверяется по тому же московскому дню, что и блокировка"""
+    with patch(
+        "app.utils.scheduler._report_date", return_value=datetime.date(2026, 10, 17)
+    ):
+        report = await prepare_daily_report()
+    assert report.prepared_on == datetime.date(2026, 10, 17)
+
+    # После полуночи по Москве подготовленный накануне отчет не используется
+    with patch(
+        "app.utils.scheduler._report_date", return_value=datetime.date(2026, 10, 18)
+    ):
+        await send_daily_report(AsyncMock(spec=Bot))
+
+    assert DummyRevService.builds == 2
+
+
+@pytest.mark.asyncio
+async def test_charts_sent_with_report_when_enabled(report_env):
+    bot = AsyncMock(spec=Bot)
+    with patch("app.utils.scheduler.REPORT_INCLUDE_CHARTS", True):
+        await send_daily_report(bot)
+
+    # Матрешки и график уходят одним альбомом
+    media = bot.send_media_group.call_args.args[1]
+    assert len(media) == 2
+    assert "Динамика выручки" in media[1].caption
+    assert media[1].media.data == b"chart"
+
+
+@pytest.mark.asyncio
+async def test_charts_skipped_by_default(report_env):
+    bot = AsyncMock(spec=Bot)
+    with patch.object(DummyRevService, "render_report_charts") as render:
+        await send_daily_report(bot)
+
+    render.assert_not_called()
+    assert bot.send_photo.call_count == 1
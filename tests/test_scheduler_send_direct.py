@@ -17,7 +17,7 @@ async def test_schedule_send_daily_report(monkeypatch):
 
     called = asyncio.Event()
 
-    async def dummy_send(bot):
+    async def dummy_send(bot, lease=None):
         called.set()
 
     monkeypatch.setattr("app.utils.scheduler.send_daily_report", dummy_send)
@@ -16,3 +16,25 @@ async def test_get_or_create(session):
     assert same_user.first_name == "John"
     assert same_user.last_name == "Doe"
     assert same_user.role == "manager"
+
+
+@pytest.mark.asyncio
+async def test_get_report_recipients(session):
+    """Получатели отчета: админы и подписчики с chat_id плюс админы из конфига"""
+    svc = UserService(session)
+
+    admin = await svc.get_or_create("Anna", "Admin", "admin")
+    await svc.update_chat_id(admin, 300)
+    subscriber = await svc.get_or_create("Sam", "Sub", "subscriber")
+    await svc.update_chat_id(subscriber, 400)
+    manager = await svc.get_or_create("Max", "Manager", "manager")
+    await svc.update_chat_id(manager, 500)
+    await svc.get_or_create("No", "Chat", "subscriber")
+
+    recipients = await svc.get_report_recipients([100, 300])
+
+    assert recipients == {
+        100: {"role": "config_admin", "name": "Config Admin 100"},
+        300: {"role": "db_admin", "name": "Anna Admin"},
+        400: {"role": "subscriber", "name": "Sam Sub"},
+    }
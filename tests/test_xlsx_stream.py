@@ -0,0 +1,58 @@
+import pytest
+from datetime import date
+from openpyxl import load_workbook
+from app.services.store_service import StoreService
+from app.services.user_service import UserService
+from app.services.revenue_service import RevenueService
+from app.utils.report_period import ReportPeriod
+from app.utils.xlsx_stream import StreamingWorkbook
+
+
+def test_streaming_workbook_spools_to_disk():
+    workbook = StreamingWorkbook(spool_max_size=1024)
+    sheet = workbook.create_sheet("Data", ["n", "square"])
+    for start in range(0, 3000, 1000):
+        sheet.append_rows((n, n * n) for n in range(start, start + 1000))
+
+    with workbook.save() as output:
+        assert output._rolled  # файл больше порога и сброшен на диск
+        wb = load_workbook(output, read_only=True)
+        rows = list(wb["Data"].values)
+
+    assert sheet.rows == 3000
+    assert rows[0] == ("n", "square")
+    assert rows[-1] == (2999, 2999 * 2999)
+
+    with pytest.raises(RuntimeError):
+        workbook.create_sheet("Late")
+
+
+@pytest.mark.asyncio
+async def test_export_report_stream_matches_export_report(session):
+    store_svc = StoreService(session)
+    user_svc = UserService(session)
+    rev_svc = RevenueService(session)
+
+    store = await store_svc.get_or_create("XlsxStore")
+    store.plan = 2000.0
+    await session.commit()
+    manager = await user_svc.get_or_create(
+        "Xlsx", "Manager", "manager", store_id=store.id
+    )
+    for day in range(1, 6):
+        await rev_svc.create_revenue(
+            100.0 * day, store.id, manager.id, date(2024, 5, day)
+        )
+
+    period = ReportPeriod.month(2024, 5)
+    with await rev_svc.export_report_stream(period, chunk_size=2) as output:
+        wb = load_workbook(output)
+
+    assert wb.sheetnames == ["Выручка по дням", "Сводка по магазинам"]
+    details = list(wb["Выручка по дням"].values)
+    assert details[0] == ("Магазин", "Дата", "Выручка", "План")
+    assert [row[2] for row in details[1:]] == [100.0, 200.0, 300.0, 400.0, 500.0]
+    assert details[1][1].date() == date(2024, 5, 1)
+
+    summary = list(wb["Сводка по магазинам"].values)
+    assert summary[1] == ("XlsxStore", 1500.0, 2000.0, 75.0)